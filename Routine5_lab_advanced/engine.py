@@ -0,0 +1,925 @@
+"""
+Routine5 timetable generation engine.
+
+This module holds the Routine5 scheduling logic behind a plain function API so
+that it can be called in-process by the Routine5 Flask app, the main app and
+``routine5_integration`` alike. Only the standard library, the shared
+``utils.db_utils`` connection layer, ``utils.timetable_snapshots`` and the
+``utils.profiling`` hooks are imported at load time; ReportLab and requests
+are pulled in when PDFs are actually rendered. Each generation also publishes a read-only replica of the
+database and the JSON snapshots that the student timetable API serves. The repository root must be importable (the
+Routine5 app adds it to sys.path).
+
+Usage:
+    from Routine5_lab_advanced.engine import generate
+    result = generate(dept_id, 'Routine5_lab_advanced/timetable.db')
+"""
+
+import os
+import random
+import sqlite3
+from dataclasses import dataclass, field
+from io import BytesIO
+from typing import List, Optional
+
+from utils.db_utils import get_db, publish_replica, replica_path_for
+from utils.profiling import profiled
+from utils.timetable_snapshots import load_sections, publish
+
+try:
+    from .lab_scheduler import check_consecutive_lab_times
+except ImportError:
+    # Imported as a top-level module from inside Routine5_lab_advanced/
+    from lab_scheduler import check_consecutive_lab_times
+
+TIME_SLOTS = ['09:00-10:00', '10:00-11:00', '11:00-12:00', '12:00-13:00', '13:00-14:00', '14:00-15:00', '15:00-16:00', '16:00-17:00']
+DAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday']
+
+
+@dataclass
+class GenerationOptions:
+    generate_pdf: bool = True
+    output_dir: Optional[str] = None  # Defaults to <db directory>/output
+    seed: Optional[int] = None
+    publish_snapshot: bool = True
+    snapshot_dir: Optional[str] = None  # Defaults to <db directory>/snapshots
+    publish_replica: bool = True
+    replica_path: Optional[str] = None  # Defaults to timetable.replica.db next to the database
+
+
+@dataclass
+class GenerationResult:
+    success: bool
+    department_id: Optional[int] = None
+    total_sections: int = 0
+    pdf_files: List[str] = field(default_factory=list)
+    snapshot: Optional[str] = None  # Published snapshot generation
+    error: Optional[str] = None
+
+    @property
+    def pdf_count(self) -> int:
+        return len(self.pdf_files)
+
+    def to_dict(self) -> dict:
+        """Response payload in the shape the /api/generate_timetable route has always returned"""
+        if not self.success:
+            return {'success': False, 'error': self.error}
+        return {
+            'success': True,
+            'total_sections': self.total_sections,
+            'pdf_count': self.pdf_count
+        }
+
+
+def init_db(db_path):
+    """(Re)create the Routine5 schema in db_path, dropping any existing tables"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    
+    cursor.execute('DROP TABLE IF EXISTS generated_schedules')
+    cursor.execute('DROP TABLE IF EXISTS teacher_semester_assignments')
+    cursor.execute('DROP TABLE IF EXISTS primary_assignments')
+    cursor.execute('DROP TABLE IF EXISTS subject_teachers')
+    cursor.execute('DROP TABLE IF EXISTS subjects')
+    cursor.execute('DROP TABLE IF EXISTS semesters')
+    cursor.execute('DROP TABLE IF EXISTS sections')
+    cursor.execute('DROP TABLE IF EXISTS years')
+    cursor.execute('DROP TABLE IF EXISTS departments')
+    cursor.execute('DROP TABLE IF EXISTS theory_rooms')
+    cursor.execute('DROP TABLE IF EXISTS lab_rooms')
+    
+    cursor.executescript('''
+        CREATE TABLE departments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            code TEXT NOT NULL UNIQUE,
+            program_duration INTEGER CHECK (program_duration BETWEEN 2 AND 4)
+        );
+        
+        CREATE TABLE years (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            department_id INTEGER NOT NULL,
+            year_number INTEGER CHECK (year_number BETWEEN 1 AND 4),
+            section_count INTEGER CHECK (section_count >= 1),
+            FOREIGN KEY (department_id) REFERENCES departments(id)
+        );
+        
+        CREATE TABLE sections (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            year_id INTEGER NOT NULL,
+            section_label TEXT NOT NULL,
+            FOREIGN KEY (year_id) REFERENCES years(id)
+        );
+        
+        CREATE TABLE semesters (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            year_id INTEGER NOT NULL,
+            semester_number INTEGER NOT NULL,
+            semester_type TEXT CHECK (semester_type IN ('odd', 'even')),
+            is_active BOOLEAN DEFAULT FALSE,
+            FOREIGN KEY (year_id) REFERENCES years(id)
+        );
+        
+        CREATE TABLE theory_rooms (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE
+        );
+        
+        CREATE TABLE lab_rooms (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE
+        );
+        
+        CREATE TABLE subjects (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            semester_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            type TEXT CHECK (type IN ('theory', 'practical')),
+            credits INTEGER CHECK (credits BETWEEN 1 AND 4),
+            lab_duration INTEGER DEFAULT NULL,
+            FOREIGN KEY (semester_id) REFERENCES semesters(id)
+        );
+        
+        CREATE TABLE subject_teachers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            subject_id INTEGER NOT NULL,
+            teacher_name TEXT NOT NULL,
+            unavailable_day TEXT CHECK (unavailable_day IN ('monday', 'tuesday', 'wednesday', 'thursday', 'friday')),
+            FOREIGN KEY (subject_id) REFERENCES subjects(id)
+        );
+        
+        CREATE TABLE primary_assignments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            subject_id INTEGER NOT NULL,
+            section_id INTEGER NOT NULL,
+            teacher_id INTEGER NOT NULL,
+            assignment_type TEXT CHECK (assignment_type IN ('theory_primary', 'lab_primary')),
+            is_matched_assignment BOOLEAN DEFAULT FALSE,
+            FOREIGN KEY (subject_id) REFERENCES subjects(id),
+            FOREIGN KEY (section_id) REFERENCES sections(id),
+            FOREIGN KEY (teacher_id) REFERENCES subject_teachers(id)
+        );
+        
+        CREATE TABLE teacher_semester_assignments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            teacher_name TEXT NOT NULL,
+            semester_id INTEGER NOT NULL,
+            section_id INTEGER NOT NULL,
+            subject_id INTEGER NOT NULL,
+            subject_type TEXT CHECK (subject_type IN ('theory', 'practical')),
+            is_matched_assignment BOOLEAN DEFAULT FALSE,
+            FOREIGN KEY (semester_id) REFERENCES semesters(id),
+            FOREIGN KEY (section_id) REFERENCES sections(id),
+            FOREIGN KEY (subject_id) REFERENCES subjects(id),
+            UNIQUE (teacher_name, semester_id, section_id)
+        );
+        
+        CREATE TABLE generated_schedules (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            section_id INTEGER NOT NULL,
+            day TEXT,
+            time_slot TEXT,
+            subject_id INTEGER,
+            teacher_id INTEGER,
+            room_id INTEGER,
+            room_type TEXT,
+            FOREIGN KEY (section_id) REFERENCES sections(id)
+        );
+    ''')
+    
+    conn.commit()
+    conn.close()
+
+
+@profiled('routine5.generate')
+def generate(dept_id, db_path='timetable.db', options=None) -> GenerationResult:
+    """Generate timetables for every active semester of a department and optionally build the PDF"""
+    options = options or GenerationOptions()
+    rng = random.Random(options.seed) if options.seed is not None else random
+    output_dir = options.output_dir or os.path.join(os.path.dirname(os.path.abspath(db_path)), 'output')
+    snapshot_dir = options.snapshot_dir or os.path.join(os.path.dirname(os.path.abspath(db_path)), 'snapshots')
+    
+    db = get_db(db_path)
+    try:
+        with db.transaction() as cursor:
+            cursor.execute('DELETE FROM generated_schedules')
+            
+            cursor.execute('''
+                SELECT s.id, s.semester_number, y.year_number
+                FROM semesters s
+                JOIN years y ON s.year_id = y.id
+                WHERE y.department_id = ? AND s.is_active = 1
+            ''', (dept_id,))
+            semesters = cursor.fetchall()
+            
+            total_sections = 0
+            
+            # Initialize GLOBAL room schedule for ALL sections
+            cursor.execute('SELECT id, name FROM theory_rooms')
+            theory_rooms = cursor.fetchall()
+            cursor.execute('SELECT id, name FROM lab_rooms')
+            lab_rooms = cursor.fetchall()
+            
+            global_room_schedule = {}
+            for room_id, room_name in theory_rooms + lab_rooms:
+                global_room_schedule[room_id] = {day: {slot: None for slot in TIME_SLOTS} for day in DAYS}
+            
+            # Room rotation counters for even distribution
+            theory_room_counter = 0
+            lab_room_counter = 0
+            
+            for semester_id, semester_number, year_number in semesters:
+                cursor.execute('''
+                    SELECT sec.id, sec.section_label
+                    FROM sections sec
+                    JOIN years y ON sec.year_id = y.id
+                    JOIN semesters s ON s.year_id = y.id
+                    WHERE s.id = ?
+                ''', (semester_id,))
+                sections = cursor.fetchall()
+                
+                total_sections += len(sections)
+                
+                for section_id, section_label in sections:
+                    theory_room_counter, lab_room_counter = generate_section_schedule_inline(db.connection(), section_id, semester_id, global_room_schedule, theory_room_counter, lab_room_counter, theory_rooms, lab_rooms, rng=rng)
+        
+        # Read-side endpoints open this copy instead of the database being written
+        if options.publish_replica:
+            publish_replica(db.connection(), options.replica_path or replica_path_for(db_path))
+        # Students read these files instead of querying timetable.db
+        snapshot = publish(load_sections(db.connection()), snapshot_dir) if options.publish_snapshot else None
+        pdf_files = generate_pdf_schedules(dept_id, db_path, output_dir) if options.generate_pdf else []
+        
+        return GenerationResult(
+            success=True,
+            department_id=dept_id,
+            total_sections=total_sections,
+            pdf_files=pdf_files,
+            snapshot=snapshot
+        )
+        
+    except Exception as e:
+        return GenerationResult(success=False, department_id=dept_id, error=str(e))
+
+
+def generate_section_schedule_inline(conn, section_id, semester_id, global_room_schedule=None, theory_room_counter=0, lab_room_counter=0, theory_rooms=None, lab_rooms=None, rng=None):
+    rng = rng or random
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        SELECT s.id, s.name, s.type, s.credits, s.lab_duration,
+               pa.teacher_id, st.teacher_name, st.unavailable_day
+        FROM subjects s
+        JOIN primary_assignments pa ON s.id = pa.subject_id
+        JOIN subject_teachers st ON pa.teacher_id = st.id
+        WHERE s.semester_id = ? AND pa.section_id = ?
+    ''', (semester_id, section_id))
+    
+    subjects = cursor.fetchall()
+    
+    cursor.execute('SELECT id, name FROM theory_rooms')
+    theory_rooms = cursor.fetchall()
+    cursor.execute('SELECT id, name FROM lab_rooms')
+    lab_rooms = cursor.fetchall()
+    
+    time_slots = ['09:00-10:00', '10:00-11:00', '11:00-12:00', '12:00-13:00', '13:00-14:00', '14:00-15:00', '15:00-16:00', '16:00-17:00']
+    days = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday']
+    
+    # Initialize tracking structures
+    schedule = {day: {slot: None for slot in time_slots} for day in days}
+    teacher_schedule = {}
+    teacher_weekly_count = {}
+    teacher_lab_sessions = {}
+    section_has_double = False  # Track if section already has a double lecture this week
+    daily_lab_count = {day: 0 for day in days}  # Track labs per day per section
+    section_lab_times = {}  # Track lab time slots used by this section
+    
+    # Use global room schedule if provided, otherwise initialize local one
+    if global_room_schedule is None:
+        all_room_schedule = {}
+        for room_id, room_name in theory_rooms + lab_rooms:
+            all_room_schedule[room_id] = {day: {slot: None for slot in time_slots} for day in days}
+    else:
+        all_room_schedule = global_room_schedule
+    
+    # Get lab schedule for SAME SEMESTER SAME SUBJECT to avoid conflicts within semester
+    cursor.execute('''
+        SELECT gs.subject_id, gs.day 
+        FROM generated_schedules gs
+        JOIN subjects s ON gs.subject_id = s.id
+        WHERE s.type = "practical" AND s.semester_id = ?
+    ''', (semester_id,))
+    existing_lab_schedule = {}
+    for subj_id, day in cursor.fetchall():
+        if subj_id not in existing_lab_schedule:
+            existing_lab_schedule[subj_id] = set()
+        existing_lab_schedule[subj_id].add(day)
+    
+    # Get GLOBAL teacher schedule to prevent teacher conflicts across ALL sections/semesters
+    cursor.execute('''
+        SELECT st.teacher_name, gs.day, gs.time_slot
+        FROM generated_schedules gs
+        JOIN subject_teachers st ON gs.teacher_id = st.id
+    ''')
+    global_teacher_schedule = {}
+    for teacher_name, day, time_slot in cursor.fetchall():
+        if teacher_name not in global_teacher_schedule:
+            global_teacher_schedule[teacher_name] = {}
+        if day not in global_teacher_schedule[teacher_name]:
+            global_teacher_schedule[teacher_name][day] = set()
+        global_teacher_schedule[teacher_name][day].add(time_slot)
+    
+    # Sort subjects: labs first, then theory by credits (distribute evenly)
+    theory_subjects = [s for s in subjects if s[2] == 'theory']
+    lab_subjects = [s for s in subjects if s[2] == 'practical']
+    
+    # Schedule labs first (higher priority)
+    for subject_id, name, subject_type, credits, lab_duration, teacher_id, teacher_name, unavailable_day in lab_subjects:
+        lab_hours = lab_duration or 2
+        scheduled = False
+        
+        # Sort days to enforce morning/afternoon alternation for labs
+        available_days = [d for d in days if d != unavailable_day and daily_lab_count[d] < 1]
+        
+        # Check if we need morning or afternoon based on adjacent days
+        morning_slots = ['09:00-10:00', '10:00-11:00', '11:00-12:00']
+        afternoon_slots = ['13:00-14:00', '14:00-15:00', '15:00-16:00', '16:00-17:00']
+        
+        prefer_morning = True
+        for day in available_days:
+            day_idx = days.index(day)
+            # Check previous day
+            if day_idx > 0:
+                prev_day = days[day_idx - 1]
+                if prev_day in section_lab_times:
+                    prev_is_morning = any(slot in morning_slots for slot in section_lab_times[prev_day])
+                    prefer_morning = not prev_is_morning
+                    break
+            # Check next day
+            if day_idx < len(days) - 1:
+                next_day = days[day_idx + 1]
+                if next_day in section_lab_times:
+                    next_is_morning = any(slot in morning_slots for slot in section_lab_times[next_day])
+                    prefer_morning = not next_is_morning
+                    break
+        
+        # Remove days where this subject already has labs (other sections)
+        if subject_id in existing_lab_schedule:
+            available_days = [d for d in available_days if d not in existing_lab_schedule[subject_id]]
+        
+        # If no unique days available, use any available day
+        if not available_days:
+            available_days = [d for d in days if d != unavailable_day and daily_lab_count[d] < 1]
+        
+        for day in available_days:
+            if scheduled:
+                break
+                
+            # Find CONSECUTIVE slots for lab based on morning/afternoon preference
+            start_range = range(len(time_slots) - lab_hours + 1) if not prefer_morning else range(3 - lab_hours + 1)
+            if not prefer_morning:
+                start_range = range(4, len(time_slots) - lab_hours + 1)  # Start from 13:00
+            
+            for i in start_range:
+                if time_slots[i] == '12:00-13:00':
+                    continue
+                    
+                slots_available = True
+                temp_slots = []
+                
+                # Check consecutive slots
+                for j in range(lab_hours):
+                    slot = time_slots[i + j]
+                    if (slot == '12:00-13:00' or 
+                        schedule[day][slot] is not None or
+                        teacher_schedule.get(teacher_name, {}).get(day, {}).get(slot) or
+                        slot in global_teacher_schedule.get(teacher_name, {}).get(day, set())):
+                        slots_available = False
+                        break
+                    temp_slots.append(slot)
+                
+                # Ensure we have exactly the required consecutive slots
+                if not (slots_available and len(temp_slots) == lab_hours):
+                    continue
+                
+                # Check for consecutive lab times on adjacent days and implement smart scheduling
+                consecutive_conflict = check_consecutive_lab_times(day, temp_slots, section_lab_times, days)
+                
+                # If conflict exists, try to schedule in opposite time slot (morning->afternoon, afternoon->morning)
+                if consecutive_conflict:
+                    # Check if we can schedule in opposite time slot
+                    current_is_morning = any(slot in ['09:00-10:00', '10:00-11:00', '11:00-12:00'] for slot in temp_slots)
+                    
+                    if current_is_morning:
+                        # Try afternoon slots (13:00 onwards)
+                        afternoon_start = next((i for i, slot in enumerate(time_slots) if slot == '13:00-14:00'), -1)
+                        if afternoon_start != -1 and afternoon_start + lab_hours - 1 < len(time_slots):
+                            afternoon_slots = []
+                            slots_available = True
+                            for j in range(lab_hours):
+                                slot = time_slots[afternoon_start + j]
+                                if (schedule[day][slot] is not None or
+                                    teacher_schedule.get(teacher_name, {}).get(day, {}).get(slot) or
+                                    slot in global_teacher_schedule.get(teacher_name, {}).get(day, set())):
+                                    slots_available = False
+                                    break
+                                afternoon_slots.append(slot)
+                            
+                            if slots_available and len(afternoon_slots) == lab_hours:
+                                temp_slots = afternoon_slots
+                            else:
+                                continue  # Skip this day if can't find afternoon slot
+                    else:
+                        # Try morning slots (before 12:00)
+                        morning_slots = []
+                        slots_available = True
+                        for j in range(lab_hours):
+                            if j >= 3:  # Only 3 morning slots available
+                                slots_available = False
+                                break
+                            slot = time_slots[j]
+                            if (schedule[day][slot] is not None or
+                                teacher_schedule.get(teacher_name, {}).get(day, {}).get(slot) or
+                                slot in global_teacher_schedule.get(teacher_name, {}).get(day, set())):
+                                slots_available = False
+                                break
+                            morning_slots.append(slot)
+                        
+                        if slots_available and len(morning_slots) == lab_hours:
+                            temp_slots = morning_slots
+                        else:
+                            continue  # Skip this day if can't find morning slot
+                
+                if slots_available and len(temp_slots) == lab_hours:
+                    # Allocate lab room dynamically (prefer lab rooms, fallback to theory)
+                    room_id = None
+                    room_type = None
+                    
+                    # Use lab rooms only - random selection
+                    room_id = None
+                    room_type = 'lab'
+                    
+                    # Shuffle lab rooms for random selection
+                    shuffled_labs = lab_rooms.copy()
+                    rng.shuffle(shuffled_labs)
+                    
+                    for room in shuffled_labs:
+                        room_available = True
+                        for slot in temp_slots:
+                            if all_room_schedule[room[0]][day][slot] is not None:
+                                room_available = False
+                                break
+                        if room_available:
+                            room_id = room[0]
+                            break
+                    
+                    if room_id:
+                        # Schedule lab
+                        for slot in temp_slots:
+                            schedule[day][slot] = {
+                                'subject_id': subject_id, 'subject_name': name,
+                                'teacher_id': teacher_id, 'teacher_name': teacher_name,
+                                'room_id': room_id, 'type': 'lab'
+                            }
+                            
+                            # Update tracking
+                            if teacher_name not in teacher_schedule:
+                                teacher_schedule[teacher_name] = {}
+                            if day not in teacher_schedule[teacher_name]:
+                                teacher_schedule[teacher_name][day] = {}
+                            teacher_schedule[teacher_name][day][slot] = True
+                            
+                            # Update room schedule
+                            all_room_schedule[room_id][day][slot] = f'{name}_{section_id}'
+                            
+                            cursor.execute('''
+                                INSERT INTO generated_schedules 
+                                (section_id, day, time_slot, subject_id, teacher_id, room_id, room_type)
+                                VALUES (?, ?, ?, ?, ?, ?, ?)
+                            ''', (section_id, day, slot, subject_id, teacher_id, room_id, room_type))
+                        
+                        # Mark teacher lab session and mandatory break
+                        if teacher_name not in teacher_lab_sessions:
+                            teacher_lab_sessions[teacher_name] = {}
+                        teacher_lab_sessions[teacher_name][day] = temp_slots[-1]
+                        
+                        # Block next hour for mandatory break
+                        next_slot_idx = time_slots.index(temp_slots[-1]) + 1
+                        if next_slot_idx < len(time_slots) and time_slots[next_slot_idx] != '12:00-13:00':
+                            if day not in teacher_schedule[teacher_name]:
+                                teacher_schedule[teacher_name][day] = {}
+                            teacher_schedule[teacher_name][day][time_slots[next_slot_idx]] = 'BREAK'
+                        
+                        # Update section lab times tracking
+                        if day not in section_lab_times:
+                            section_lab_times[day] = set()
+                        section_lab_times[day].update(temp_slots)
+                        
+                        # Update global lab tracking
+                        if subject_id not in existing_lab_schedule:
+                            existing_lab_schedule[subject_id] = set()
+                        existing_lab_schedule[subject_id].add(day)
+                        
+                        daily_lab_count[day] += 1
+                        scheduled = True
+                        break
+                
+                if scheduled:
+                    break
+        
+        # If lab still not scheduled, try again without consecutive time restriction
+        if not scheduled:
+            for day in available_days:
+                if scheduled:
+                    break
+                    
+                for i in range(len(time_slots) - lab_hours + 1):
+                    if time_slots[i] == '12:00-13:00':
+                        continue
+                        
+                    slots_available = True
+                    temp_slots = []
+                    
+                    for j in range(lab_hours):
+                        slot = time_slots[i + j]
+                        if (slot == '12:00-13:00' or 
+                            schedule[day][slot] is not None or
+                            teacher_schedule.get(teacher_name, {}).get(day, {}).get(slot) or
+                            slot in global_teacher_schedule.get(teacher_name, {}).get(day, set())):
+                            slots_available = False
+                            break
+                        temp_slots.append(slot)
+                    
+                    if slots_available and len(temp_slots) == lab_hours:
+                        room_id = None
+                        room_type = 'lab'
+                        
+                        shuffled_labs = lab_rooms.copy()
+                        rng.shuffle(shuffled_labs)
+                        
+                        for room in shuffled_labs:
+                            room_available = True
+                            for slot in temp_slots:
+                                if all_room_schedule[room[0]][day][slot] is not None:
+                                    room_available = False
+                                    break
+                            if room_available:
+                                room_id = room[0]
+                                break
+                        
+                        if room_id:
+                            for slot in temp_slots:
+                                schedule[day][slot] = {
+                                    'subject_id': subject_id, 'subject_name': name,
+                                    'teacher_id': teacher_id, 'teacher_name': teacher_name,
+                                    'room_id': room_id, 'type': 'lab'
+                                }
+                                
+                                if teacher_name not in teacher_schedule:
+                                    teacher_schedule[teacher_name] = {}
+                                if day not in teacher_schedule[teacher_name]:
+                                    teacher_schedule[teacher_name][day] = {}
+                                teacher_schedule[teacher_name][day][slot] = True
+                                
+                                all_room_schedule[room_id][day][slot] = f'{name}_{section_id}'
+                                
+                                cursor.execute('''
+                                    INSERT INTO generated_schedules 
+                                    (section_id, day, time_slot, subject_id, teacher_id, room_id, room_type)
+                                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                                ''', (section_id, day, slot, subject_id, teacher_id, room_id, room_type))
+                            
+                            if teacher_name not in teacher_lab_sessions:
+                                teacher_lab_sessions[teacher_name] = {}
+                            teacher_lab_sessions[teacher_name][day] = temp_slots[-1]
+                            
+                            next_slot_idx = time_slots.index(temp_slots[-1]) + 1
+                            if next_slot_idx < len(time_slots) and time_slots[next_slot_idx] != '12:00-13:00':
+                                if day not in teacher_schedule[teacher_name]:
+                                    teacher_schedule[teacher_name][day] = {}
+                                teacher_schedule[teacher_name][day][time_slots[next_slot_idx]] = 'BREAK'
+                            
+                            if day not in section_lab_times:
+                                section_lab_times[day] = set()
+                            section_lab_times[day].update(temp_slots)
+                            
+                            if subject_id not in existing_lab_schedule:
+                                existing_lab_schedule[subject_id] = set()
+                            existing_lab_schedule[subject_id].add(day)
+                            
+                            daily_lab_count[day] += 1
+                            scheduled = True
+                            break
+                    
+                    if scheduled:
+                        break
+    
+    # Schedule theory subjects with proper credit distribution
+    for subject_id, name, subject_type, credits, lab_duration, teacher_id, teacher_name, unavailable_day in theory_subjects:
+        classes_scheduled = 0
+        
+        # Theory subject MUST be taught exactly 'credits' hours per week
+        required_classes = credits  # Always use full credits, no reduction
+        
+        # Only allow double lectures as last resort when absolutely necessary
+        double_scheduled = False
+        # First try to schedule all classes as singles, only use doubles if can't complete required classes
+        
+        # Schedule single classes distributed across the week for better mixing
+        daily_subject_count = {day: 0 for day in days}
+        subject_time_slots = []  # Track which time slots this subject has used
+        
+        while classes_scheduled < required_classes:
+            scheduled_this_round = False
+            
+            # Sort days by daily load for balanced distribution across week
+            sorted_days = sorted(days, key=lambda d: (
+                sum(1 for slot in time_slots if schedule[d].get(slot) and slot != '12:00-13:00'),  # Total classes per day (primary)
+                daily_subject_count[d]  # Prefer days with fewer subjects for this subject
+            ))
+            
+            for day in sorted_days:
+                if day == unavailable_day or classes_scheduled >= required_classes:
+                    continue
+                    
+                # Check if this subject already has a class on this day
+                subject_on_day = any(schedule[day].get(slot) and schedule[day][slot].get('subject_name') == name 
+                                   for slot in time_slots)
+                
+                # Strictly avoid same subject same day
+                if subject_on_day:
+                    continue
+                
+                # Sort time slots for variety - prefer unused time slots for this subject
+                available_slots = [slot for slot in time_slots if slot != '12:00-13:00']
+                sorted_slots = sorted(available_slots, key=lambda s: (
+                    s in subject_time_slots,  # Prefer new time slots
+                    time_slots.index(s)  # Then by time order
+                ))
+                    
+                for slot in sorted_slots:
+                    if (schedule[day][slot] is not None or
+                        teacher_schedule.get(teacher_name, {}).get(day, {}).get(slot) or
+                        slot in global_teacher_schedule.get(teacher_name, {}).get(day, set()) or
+                        classes_scheduled >= required_classes):
+                        continue
+                    
+                    # Check for mandatory break after lab
+                    if (teacher_name in teacher_lab_sessions and 
+                        day in teacher_lab_sessions[teacher_name]):
+                        lab_end_slot = teacher_lab_sessions[teacher_name][day]
+                        lab_end_idx = time_slots.index(lab_end_slot)
+                        current_idx = time_slots.index(slot)
+                        if current_idx == lab_end_idx + 1:
+                            continue
+                    
+                    # PREVENT CONSECUTIVE CLASSES for same subject
+                    current_idx = time_slots.index(slot)
+                    
+                    # Check previous slot
+                    if current_idx > 0:
+                        prev_slot = time_slots[current_idx - 1]
+                        if (schedule[day].get(prev_slot) and 
+                            schedule[day][prev_slot].get('subject_name') == name):
+                            continue
+                    
+                    # Check next slot
+                    if current_idx < len(time_slots) - 1:
+                        next_slot = time_slots[current_idx + 1]
+                        if (schedule[day].get(next_slot) and 
+                            schedule[day][next_slot].get('subject_name') == name):
+                            continue
+                    
+                    # Use theory rooms - random selection
+                    room_id = None
+                    
+                    # Shuffle theory rooms for random selection
+                    shuffled_theory = theory_rooms.copy()
+                    rng.shuffle(shuffled_theory)
+                    
+                    for room in shuffled_theory:
+                        if all_room_schedule[room[0]][day][slot] is None:
+                            room_id = room[0]
+                            break
+                    
+                    if room_id:
+                        schedule[day][slot] = {
+                            'subject_id': subject_id, 'subject_name': name,
+                            'teacher_id': teacher_id, 'teacher_name': teacher_name,
+                            'room_id': room_id, 'type': 'theory'
+                        }
+                        
+                        # Update tracking
+                        if teacher_name not in teacher_schedule:
+                            teacher_schedule[teacher_name] = {}
+                        if day not in teacher_schedule[teacher_name]:
+                            teacher_schedule[teacher_name][day] = {}
+                        teacher_schedule[teacher_name][day][slot] = True
+                        
+                        # Update room schedule
+                        all_room_schedule[room_id][day][slot] = f'{name}_{section_id}'
+                        
+                        classes_scheduled += 1
+                        daily_subject_count[day] += 1
+                        subject_time_slots.append(slot)  # Track time slot usage
+                        scheduled_this_round = True
+                        
+                        cursor.execute('''
+                            INSERT INTO generated_schedules 
+                            (section_id, day, time_slot, subject_id, teacher_id, room_id, room_type)
+                            VALUES (?, ?, ?, ?, ?, ?, ?)
+                        ''', (section_id, day, slot, subject_id, teacher_id, room_id, 'theory'))
+                        
+                        break
+                
+                if scheduled_this_round:
+                    break
+            
+            # If can't schedule more, try relaxing constraints
+            if not scheduled_this_round:
+                # Try scheduling without subject-on-day restriction
+                for day in sorted_days:
+                    if day == unavailable_day or classes_scheduled >= required_classes:
+                        continue
+                        
+                    for slot in time_slots:
+                        if (slot == '12:00-13:00' or
+                            schedule[day][slot] is not None or
+                            teacher_schedule.get(teacher_name, {}).get(day, {}).get(slot) or
+                            slot in global_teacher_schedule.get(teacher_name, {}).get(day, set()) or
+                            classes_scheduled >= required_classes):
+                            continue
+                        
+                        # Find any available room
+                        room_id = None
+                        for room in theory_rooms:
+                            if all_room_schedule[room[0]][day][slot] is None:
+                                room_id = room[0]
+                                break
+                        
+                        if room_id:
+                            schedule[day][slot] = {
+                                'subject_id': subject_id, 'subject_name': name,
+                                'teacher_id': teacher_id, 'teacher_name': teacher_name,
+                                'room_id': room_id, 'type': 'theory'
+                            }
+                            
+                            if teacher_name not in teacher_schedule:
+                                teacher_schedule[teacher_name] = {}
+                            if day not in teacher_schedule[teacher_name]:
+                                teacher_schedule[teacher_name][day] = {}
+                            teacher_schedule[teacher_name][day][slot] = True
+                            
+                            all_room_schedule[room_id][day][slot] = f'{name}_{section_id}'
+                            
+                            classes_scheduled += 1
+                            scheduled_this_round = True
+                            
+                            cursor.execute('''
+                                INSERT INTO generated_schedules 
+                                (section_id, day, time_slot, subject_id, teacher_id, room_id, room_type)
+                                VALUES (?, ?, ?, ?, ?, ?, ?)
+                            ''', (section_id, day, slot, subject_id, teacher_id, room_id, 'theory'))
+                            
+                            break
+                    
+                    if scheduled_this_round:
+                        break
+                
+                # Only allow double periods if absolutely no other option exists
+                if not scheduled_this_round and classes_scheduled < required_classes and classes_scheduled == 0:
+                    # Only create double period if no single periods were scheduled at all
+                    pass  # Remove double period scheduling entirely
+                
+                # Final break if still can't schedule
+                if not scheduled_this_round:
+                    break
+    
+    return theory_room_counter, lab_room_counter
+
+
+@profiled('routine5.pdf')
+def generate_pdf_schedules(dept_id, db_path='timetable.db', output_dir='output'):
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image, PageBreak
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib import colors
+    from reportlab.lib.units import inch
+    import requests
+
+    print("=== GENERATING PDF SCHEDULES ===")
+    cursor = get_db(db_path).connection().cursor()
+    
+    cursor.execute('SELECT name, code FROM departments WHERE id = ?', (dept_id,))
+    result = cursor.fetchone()
+    if not result:
+        cursor.close()
+        return []
+    dept_name, dept_code = result
+    
+    cursor.execute('''
+        SELECT sec.id, sec.section_label, y.year_number, s.semester_number
+        FROM sections sec
+        JOIN years y ON sec.year_id = y.id
+        JOIN semesters s ON s.year_id = y.id
+        WHERE y.department_id = ? AND s.is_active = 1
+        ORDER BY y.year_number, s.semester_number, sec.section_label
+    ''', (dept_id,))
+    sections = cursor.fetchall()
+    
+    os.makedirs(output_dir, exist_ok=True)
+    filename = os.path.join(output_dir, f'All_Timetables_{dept_code}.pdf')
+    
+    doc = SimpleDocTemplate(filename, pagesize=landscape(A4))
+    elements = []
+    styles = getSampleStyleSheet()
+    
+    for i, (section_id, section_label, year_number, semester_number) in enumerate(sections):
+        # Add page break for subsequent sections
+        if i > 0:
+            elements.append(PageBreak())
+        
+        # Header with HITK logo
+        try:
+            logo_url = "https://lh3.googleusercontent.com/d/1LBhx-x_Si1-cmGqsRAVmheoz0tXvJ3UN"
+            response = requests.get(logo_url, timeout=10)
+            if response.status_code == 200:
+                logo_img = Image(BytesIO(response.content), width=60, height=60)
+                logo_img.hAlign = 'CENTER'
+                elements.append(logo_img)
+                elements.append(Spacer(1, 10))
+        except:
+            pass  # Continue without logo if download fails
+        
+        section_info = Paragraph(f'<para align="center"><font size="12">{dept_name} ({dept_code}) - Year {year_number}, Section {section_label}</font></para>', styles['Normal'])
+        elements.extend([section_info, Spacer(1, 20)])
+        
+        cursor.execute('''
+            SELECT gs.day, gs.time_slot, s.name, st.teacher_name, 
+                   CASE WHEN tr.name IS NOT NULL THEN tr.name ELSE lr.name END as room_name
+            FROM generated_schedules gs
+            JOIN subjects s ON gs.subject_id = s.id
+            JOIN subject_teachers st ON gs.teacher_id = st.id
+            LEFT JOIN theory_rooms tr ON gs.room_id = tr.id AND gs.room_type = 'theory'
+            LEFT JOIN lab_rooms lr ON gs.room_id = lr.id AND gs.room_type = 'lab'
+            WHERE gs.section_id = ?
+            ORDER BY 
+                CASE gs.day 
+                    WHEN 'monday' THEN 1 
+                    WHEN 'tuesday' THEN 2 
+                    WHEN 'wednesday' THEN 3 
+                    WHEN 'thursday' THEN 4 
+                    WHEN 'friday' THEN 5 
+                END, gs.time_slot
+        ''', (section_id,))
+        
+        schedule_data = cursor.fetchall()
+        
+        time_slots = ['09:00-10:00', '10:00-11:00', '11:00-12:00', '12:00-13:00', '13:00-14:00', '14:00-15:00', '15:00-16:00', '16:00-17:00']
+        days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
+        
+        schedule_grid = {}
+        for day, time_slot, subject, teacher, room in schedule_data:
+            if day not in schedule_grid:
+                schedule_grid[day] = {}
+            schedule_grid[day][time_slot] = f'{subject}\n{teacher}\n{room}'
+        
+        table_data = [['Day'] + time_slots]
+        
+        for day_name, day_key in zip(days, ['monday', 'tuesday', 'wednesday', 'thursday', 'friday']):
+            row = [day_name]
+            for slot in time_slots:
+                if slot == '12:00-13:00':
+                    cell_content = 'LUNCH BREAK'
+                else:
+                    cell_content = schedule_grid.get(day_key, {}).get(slot, 'Free Period')
+                row.append(cell_content)
+            table_data.append(row)
+        
+        table = Table(table_data, colWidths=[0.8*inch, 1.1*inch, 1.1*inch, 1.1*inch, 1.1*inch, 1.1*inch, 1.1*inch, 1.1*inch, 1.1*inch])
+        table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('FONTSIZE', (0, 1), (-1, -1), 7),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ]))
+        
+        elements.append(table)
+        elements.append(Spacer(1, 20))
+        
+        # Add footer
+        footer_text = "Generated by Timely™ - AI-Powered Timetable Management System"
+        elements.append(Spacer(1, 20))
+        elements.append(Paragraph(f"<i>{footer_text}</i>", styles["Normal"]))
+        elements.append(Spacer(1, 12))
+    
+    doc.build(elements)
+    
+    cursor.close()
+    return [filename]
@@ -92,9 +92,11 @@ def _gemini_parse(nl_constraints: List[str]) -> ConstraintPackage:
             "into a JSON object that validates against this exact Pydantic schema:\n"
             "ConstraintPackage: {hard: HardConstraints, soft: SoftConstraints}\n"
             "HardConstraints: {days: List[str], slots_per_day: int, slot_names: List[str], "
-            "teachers: List[Teacher], subjects: List[Subject], class_name: str, max_periods_per_day: Optional[int]}\n"
+            "teachers: List[Teacher], subjects: List[Subject], rooms: Optional[List[Room]], class_name: str, "
+            "max_periods_per_day: Optional[int]}\n"
             "Teacher: {id: str, name: str, availability: Dict[str, List[str]]}\n"
-            "Subject: {id: str, name: str, teacher_id: str, periods_per_week: int}\n"
+            "Subject: {id: str, name: str, teacher_id: str, periods_per_week: int, students: Optional[int]}\n"
+            "Room: {id: str, name: str, capacity: Optional[int]}\n"
             "SoftConstraints: {minimize_gaps_weight: float, balance_subjects_across_days_weight: float, "
             "prefer_mornings_weight: float, preferred_windows: Dict[str, List[str]]}\n"
             f"Default context: days=[{','.join(settings.DAYS)}], slots_per_day={settings.SLOTS_PER_DAY}, "
@@ -61,6 +61,20 @@ class ConstraintVerifierAgent:
             if a.slot not in teachers[a.teacher_id].availability.get(a.day, []):
                 errors.append(f"Teacher {a.teacher_id} not available on {a.day} {a.slot}.")
 
+        rooms = {r.id: r for r in hard.rooms or []}
+        subjects = {s.id: s for s in hard.subjects}
+        for a in tt.assignments:
+            if a.room_id is None:
+                if rooms:
+                    errors.append(f"No room for {a.subject_id} in {a.day} {a.slot}.")
+                continue
+            room = rooms.get(a.room_id)
+            students = subjects[a.subject_id].students if a.subject_id in subjects else None
+            if room is None:
+                errors.append(f"Unknown room {a.room_id} in {a.day} {a.slot}.")
+            elif students and room.capacity is not None and room.capacity < students:
+                errors.append(f"Room {a.room_id} seats {room.capacity}; {a.subject_id} has {students} students.")
+
         seen = set()
         for a in tt.assignments:
             key = (a.day, a.slot)
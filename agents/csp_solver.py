@@ -1,13 +1,22 @@
+import time
 from typing import List, Dict, Tuple
 from ortools.sat.python import cp_model
-from core.constraint_schema import ConstraintPackage, Timetable, AssignedCell, SolverResult
+from core.constraint_schema import ConstraintPackage, Timetable, AssignedCell, SolverResult, ConstraintGroup
 from utils.logging_utils import get_logger
+from utils.profiling import profiled
 from config.settings import settings
 
 logger = get_logger("CSPSolverAgent")
 
+def _windows(teacher, days) -> str:
+    windows = [f"{day} {','.join(teacher.availability[day])}" for day in days if teacher.availability.get(day)]
+    return "; ".join(windows) or "no slot"
+
 class CSPSolverAgent:
-    def solve(self, constraints: ConstraintPackage, max_solutions: int = 5) -> SolverResult:
+    @profiled("solver.solve")
+    def solve(self, constraints: ConstraintPackage, max_solutions: int = 5, diverse: bool = False) -> SolverResult:
+        """Up to max_solutions timetables; diverse=True spreads them as far apart as the time budget allows"""
+        build_start = time.monotonic()
         hard = constraints.hard
         days = hard.days
         slot_names = hard.slot_names
@@ -27,10 +36,24 @@ class CSPSolverAgent:
             for si, slot in enumerate(slot_names):
                 model.Add(sum(x[(di, si, subi)] for subi, _ in enumerate(subject_ids)) <= 1)
 
+        # Every user-level constraint group is enforced by an assumption literal, so an
+        # infeasible model reports which groups conflict instead of a bare INFEASIBLE
+        groups: Dict[int, Tuple[cp_model.IntVar, ConstraintGroup]] = {}
+
+        def assumption(group: ConstraintGroup) -> cp_model.IntVar:
+            lit = model.NewBoolVar(f"assume_{len(groups)}")
+            groups[lit.Index()] = (lit, group)
+            return lit
+
         for subi, subj in enumerate(subject_ids):
-            req = next(s for s in subjects if s.id == subj).periods_per_week
-            model.Add(sum(x[(di, si, subi)] for di, _ in enumerate(days) for si, _ in enumerate(slot_names)) == req)
+            subj_obj = next(s for s in subjects if s.id == subj)
+            req = subj_obj.periods_per_week
+            lit = assumption(ConstraintGroup(
+                kind="periods", subject_id=subj, teacher_id=subj_obj.teacher_id,
+                description=f"{subj} needs {req} periods per week"))
+            model.Add(sum(x[(di, si, subi)] for di, _ in enumerate(days) for si, _ in enumerate(slot_names)) == req).OnlyEnforceIf(lit)
 
+        teacher_lits: Dict[str, cp_model.IntVar] = {}
         for di, day in enumerate(days):
             for si, slot in enumerate(slot_names):
                 for subi, subj in enumerate(subject_ids):
@@ -38,47 +61,85 @@ class CSPSolverAgent:
                     teacher = teachers[subj_obj.teacher_id]
                     allowed = slot in teacher.availability.get(day, [])
                     if not allowed:
-                        model.Add(x[(di, si, subi)] == 0)
+                        if teacher.id not in teacher_lits:
+                            teacher_lits[teacher.id] = assumption(ConstraintGroup(
+                                kind="availability", teacher_id=teacher.id,
+                                description=f"{teacher.name} is only available in {_windows(teacher, days)}"))
+                        model.Add(x[(di, si, subi)] == 0).OnlyEnforceIf(teacher_lits[teacher.id])
 
         if hard.max_periods_per_day is not None:
+            lit = assumption(ConstraintGroup(
+                kind="max_periods_per_day",
+                description=f"At most {hard.max_periods_per_day} periods per day"))
             for di, _ in enumerate(days):
                 model.Add(
                     sum(x[(di, si, subi)] for si, _ in enumerate(slot_names) for subi, _ in enumerate(subject_ids))
                     <= hard.max_periods_per_day
-                )
+                ).OnlyEnforceIf(lit)
 
-        solver = cp_model.CpSolver()
-        solver.parameters.max_time_in_seconds = settings.CSP_MAX_TIME_SECONDS
-        solutions: List[Timetable] = []
+        # Rooms: each slot picks a room, a decision the solver makes. Rooms are numbered by
+        # capacity (unknown capacities last), so the rooms that seat a subject's group are one
+        # range [fit, len(rooms)] and, with at most one lesson per slot, a slot's room is bounded
+        # by two linear constraints on its x; the model grows with slots x subjects, not
+        # days x slots x subjects x rooms. room_cost counts rooms above the best fit.
+        room_var: Dict[Tuple[int, int], cp_model.IntVar] = {}
+        room_cost = None
+        if hard.rooms:
+            by_size = sorted(hard.rooms, key=lambda r: (r.capacity is None, r.capacity or 0))
+            fit: Dict[int, int] = {}  # subject index -> smallest 1-based room number that seats it
+            for subi, subj in enumerate(subject_ids):
+                subj_obj = next(s for s in subjects if s.id == subj)
+                seats = [n for n, room in enumerate(by_size, 1) if not subj_obj.students
+                         or room.capacity is None or room.capacity >= subj_obj.students]
+                if seats:
+                    fit[subi] = seats[0]
+                    continue
+                lit = assumption(ConstraintGroup(
+                    kind="room", subject_id=subj, teacher_id=subj_obj.teacher_id,
+                    description=f"{subj} needs a room for {subj_obj.students} students"))
+                model.Add(sum(x[(di, si, subi)] for di, _ in enumerate(days) for si, _ in enumerate(slot_names)) == 0).OnlyEnforceIf(lit)
+            best = []
+            for di, day in enumerate(days):
+                for si, slot in enumerate(slot_names):
+                    room = room_var[(di, si)] = model.NewIntVar(0, len(by_size), f"room_{day}_{slot}")
+                    best.append(sum(first * x[(di, si, subi)] for subi, first in fit.items()))
+                    model.Add(room >= best[-1])
+                    model.Add(room <= len(by_size) * sum(x[(di, si, subi)] for subi, _ in enumerate(subject_ids)))
+            room_cost = sum(room_var.values()) - sum(best)
 
-        class Collector(cp_model.CpSolverSolutionCallback):
-            def __init__(self):
-                cp_model.CpSolverSolutionCallback.__init__(self)
-                self.count = 0
-            def on_solution_callback(self):
-                nonlocal solutions
-                self.count += 1
-                assignments = []
-                for di, day in enumerate(days):
-                    for si, slot in enumerate(slot_names):
-                        for subi, subj in enumerate(subject_ids):
-                            if self.Value(x[(di, si, subi)]) == 1:
-                                subj_obj = next(s for s in subjects if s.id == subj)
-                                assignments.append(AssignedCell(
-                                    day=day, slot=slot, subject_id=subj_obj.id, teacher_id=subj_obj.teacher_id
-                                ))
-                tt = Timetable(
-                    class_name=hard.class_name,
-                    days=days,
-                    slot_names=slot_names,
-                    assignments=assignments
-                )
-                solutions.append(tt)
-                if self.count >= max_solutions:
-                    self.StopSearch()
+        model.AddAssumptions([lit for lit, _ in groups.values()])
+
+        build_seconds = time.monotonic() - build_start
+        # Model as built, before a diverse pool adds its distance constraints
+        size = {"variables": len(model.Proto().variables), "constraints": len(model.Proto().constraints)}
+
+        def timetable(value) -> Timetable:
+            assignments = []
+            for di, day in enumerate(days):
+                for si, slot in enumerate(slot_names):
+                    for subi, subj in enumerate(subject_ids):
+                        if value(x[(di, si, subi)]) == 1:
+                            subj_obj = next(s for s in subjects if s.id == subj)
+                            room = value(room_var[(di, si)]) if room_var else 0
+                            assignments.append(AssignedCell(
+                                day=day, slot=slot, subject_id=subj_obj.id, teacher_id=subj_obj.teacher_id,
+                                room_id=by_size[room - 1].id if room else None
+                            ))
+            return Timetable(
+                class_name=hard.class_name,
+                days=days,
+                slot_names=slot_names,
+                assignments=assignments
+            )
 
-        cb = Collector()
-        status = solver.SearchForAllSolutions(model, cb)
+        search_start = time.monotonic()
+        if diverse:
+            status, solutions, stats = self._diverse_pool(model, x, timetable, max_solutions, room_cost, len(room_var) * len(hard.rooms or []))
+        elif room_cost is not None:
+            status, solutions, stats = self._grids(model, x, timetable, max_solutions, room_cost)
+        else:
+            status, solutions, stats = self._enumerate(model, timetable, max_solutions)
+        stats = {"build_seconds": build_seconds, "search_seconds": time.monotonic() - search_start, **size, **stats}
 
         status_map = {
             cp_model.OPTIMAL: "OPTIMAL",
@@ -88,6 +149,138 @@ class CSPSolverAgent:
             cp_model.UNKNOWN: "UNKNOWN",
         }
         label = status_map.get(status, "UNKNOWN")
-        logger.info(f"CSP search done: {label}, solutions={len(solutions)}")
+        core = self._core(model, groups) if status == cp_model.INFEASIBLE else []
+        if core:
+            logger.info(f"Infeasibility core: {[g.description for g in core]}")
+        logger.info(f"CSP search done ({'diverse' if diverse else 'enumerate'}): {label}, solutions={len(solutions)}, "
+                    f"branches={stats['branches']}, conflicts={stats['conflicts']}, wall={stats['wall_time']:.3f}s")
+
+        return SolverResult(feasible_timetables=solutions, status=label, stats=stats, core=core)
+
+    @staticmethod
+    def _enumerate(model: cp_model.CpModel, timetable, max_solutions: int):
+        """The first max_solutions solutions CP-SAT enumerates; neighbours that often differ in a cell or two"""
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = settings.CSP_MAX_TIME_SECONDS
+        solutions: List[Timetable] = []
+
+        class Collector(cp_model.CpSolverSolutionCallback):
+            def __init__(self):
+                cp_model.CpSolverSolutionCallback.__init__(self)
+            def on_solution_callback(self):
+                solutions.append(timetable(self.Value))
+                if len(solutions) >= max_solutions:
+                    self.StopSearch()
+
+        status = solver.SearchForAllSolutions(model, Collector())
+        return status, solutions, {
+            "wall_time": solver.WallTime(),
+            "branches": solver.NumBranches(),
+            "conflicts": solver.NumConflicts(),
+            "solutions": len(solutions),
+        }
+
+    @staticmethod
+    def _grids(model: cp_model.CpModel, x: Dict[Tuple[int, int, int], cp_model.IntVar], timetable,
+               max_solutions: int, room_cost):
+        """Timetables with distinct lesson grids, each with its cheapest rooms.
+
+        Enumerating the model would also count every other room choice for the same lessons as a
+        new solution, so each solve minimises room_cost and then rules out the grid it returned.
+        """
+        deadline = time.monotonic() + settings.CSP_MAX_TIME_SECONDS
+        cells = list(x.values())
+        model.Minimize(room_cost)
+        first_status = None
+        solutions: List[Timetable] = []
+        stats = {"wall_time": 0.0, "branches": 0, "conflicts": 0, "solutions": 0}
+        while len(solutions) < max_solutions:
+            budget = (deadline - time.monotonic()) / (max_solutions - len(solutions))
+            if budget <= 0:
+                break
+            solver = cp_model.CpSolver()
+            solver.parameters.max_time_in_seconds = budget
+            status = solver.Solve(model)
+            stats["wall_time"] += solver.WallTime()
+            stats["branches"] += solver.NumBranches()
+            stats["conflicts"] += solver.NumConflicts()
+            if first_status is None:
+                first_status = status
+            if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+                break  # every grid is taken, or out of time
+            kept = {var.Index(): solver.Value(var) for var in cells}
+            solutions.append(timetable(solver.Value))
+            model.Add(sum(1 - var if kept[var.Index()] else var for var in cells) >= 1)
+        stats["solutions"] = len(solutions)
+        return first_status, solutions, stats
+
+    @staticmethod
+    def _diverse_pool(model: cp_model.CpModel, x: Dict[Tuple[int, int, int], cp_model.IntVar], timetable,
+                      max_solutions: int, room_cost=None, room_bound: int = 0):
+        """Solutions chosen one at a time to maximise the smallest Hamming distance to those already kept.
+
+        Every solve runs on CP-SAT's parallel workers with an equal share of what is left of
+        CSP_MAX_TIME_SECONDS; a solve that runs out of time still contributes its best solution.
+        With rooms, distance comes first and room_cost breaks ties.
+        """
+        deadline = time.monotonic() + settings.CSP_MAX_TIME_SECONDS
+        cells = list(x.values())
+        # Cells that differ from the nearest kept solution; >= 1 makes every solve a new timetable
+        distance = model.NewIntVar(1, len(cells), "min_distance")
+        # room_cost never exceeds room_bound, so one more cell of distance outweighs any room choice
+        weight = room_bound + 1
+        if room_cost is not None:
+            model.Minimize(room_cost)
+        first_status = None
+        solutions: List[Timetable] = []
+        stats = {"wall_time": 0.0, "branches": 0, "conflicts": 0, "solutions": 0}
+        while len(solutions) < max_solutions:
+            budget = (deadline - time.monotonic()) / (max_solutions - len(solutions))
+            if budget <= 0:
+                break
+            solver = cp_model.CpSolver()
+            solver.parameters.max_time_in_seconds = budget
+            status = solver.Solve(model)
+            stats["wall_time"] += solver.WallTime()
+            stats["branches"] += solver.NumBranches()
+            stats["conflicts"] += solver.NumConflicts()
+            if first_status is None:
+                first_status = status
+            if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+                break  # no timetable left that differs from the pool, or out of time
+            if solutions:
+                stats["min_distance"] = min(stats.get("min_distance", len(cells)), solver.Value(distance))
+            kept = {var.Index(): solver.Value(var) for var in cells}
+            solutions.append(timetable(solver.Value))
+            model.Add(distance <= sum(1 - var if kept[var.Index()] else var for var in cells))
+            model.Maximize(distance * weight - room_cost if room_cost is not None else distance)
+        stats["solutions"] = len(solutions)
+        # The first solve has at most the room objective, so its status is the model's feasibility
+        return first_status, solutions, stats
+
+    @staticmethod
+    def _core(model: cp_model.CpModel, groups: Dict[int, Tuple[cp_model.IntVar, ConstraintGroup]]) -> List[ConstraintGroup]:
+        """A minimal set of assumption groups that is infeasible on its own"""
+        def infeasible(indices: List[int]) -> Tuple[bool, List[int]]:
+            model.ClearAssumptions()
+            model.AddAssumptions([groups[i][0] for i in indices])
+            solver = cp_model.CpSolver()
+            solver.parameters.max_time_in_seconds = settings.CSP_MAX_TIME_SECONDS
+            solver.parameters.num_workers = 1  # cores come from the single-worker search
+            status = solver.Solve(model)
+            if status != cp_model.INFEASIBLE:
+                return False, indices
+            return True, list(solver.SufficientAssumptionsForInfeasibility())
 
-        return SolverResult(feasible_timetables=solutions, status=label)
+        # Enumerating solutions reports every assumption; one plain solve gives a small core
+        found, core = infeasible(list(groups))
+        if not found:
+            return []
+        # Drop any group the rest still conflict without (a few more tiny solves)
+        for index in list(core):
+            if len(core) > 1 and index in core:
+                rest = [i for i in core if i != index]
+                still, smaller = infeasible(rest)
+                if still:
+                    core = smaller
+        return [groups[i][1] for i in sorted(core)]
@@ -1,27 +1,72 @@
-from flask import Flask, render_template, request, jsonify, send_file, session, redirect, url_for
+"""
+Timely-Sync web app.
+
+Use ``create_app()`` (``flask --app app:create_app run``); the module-level
+``app`` is built the same way for ``from app import app``. Importing this module
+is kept cheap: the attendance database is opened and migrated on the first
+request that uses it, and the solver (OR-Tools), LLM agents, PDF rendering and
+ngrok tunnel are imported only by the routes that need them.
+"""
+
+from flask import Blueprint, Flask, Response, render_template, request, jsonify, send_file, session, redirect, url_for
 import os
+import re
 import json
-import sqlite3
-from datetime import datetime
-from orchestrator.orchestrator import Orchestrator
+from datetime import datetime, timedelta
 from utils.logging_utils import get_logger
-from attendance_system import LocationBasedAttendanceSystem
+from attendance.live import event_stream
+from attendance.reports import REPORT_FORMATS
+from utils.db_utils import ReadReplica, get_db, replica_path_for
+from utils.http_cache import ResponseCache
+from utils.lazy import Lazy
+from utils.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, metrics
+from utils.profiling import flask_hooks as profiling_hooks
+from utils.timetable_snapshots import INDEX, TIMETABLE, SnapshotStore, load_sections
 from config.email_config import get_email_config
-from ngrok_manager import ensure_ngrok_running
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-import requests
 import io
 
-app = Flask(__name__)
-app.secret_key = 'your-secret-key-change-in-production'
+web = Blueprint('web', __name__)
 logger = get_logger("WebApp")
 
-# Initialize attendance system
-attendance_system = LocationBasedAttendanceSystem()
+# X-Profile: 1 (or ?profile=1) writes cProfile output of the generation pipeline to outputs/profiles
+profiling_hooks(web, allowed=lambda: session.get('role') in ('hod', 'admin'))
+
+ATTENDANCE_DB = 'attendance.db'
+ROUTINE5_DB = 'Routine5_lab_advanced/timetable.db'
+ROUTINE5_SNAPSHOTS = 'Routine5_lab_advanced/snapshots'  # Written by Routine5_lab_advanced.engine
+ROUTINE5_REPLICA = replica_path_for(ROUTINE5_DB)          # Likewise; read-only copy for read endpoints
+
+def _attendance_system():
+    # Imports NumPy and migrates attendance.db, so only when first needed
+    from attendance_system import LocationBasedAttendanceSystem
+    return LocationBasedAttendanceSystem(ATTENDANCE_DB)
+
+# Initialize attendance system (on first use)
+attendance_system = Lazy(_attendance_system, 'attendance_system')
+
+# Shared per-thread connections for the attendance database, once it is migrated
+db = Lazy(lambda: attendance_system.db, 'db')
+
+# CSV / XLSX / PDF attendance exports
+reports = Lazy(lambda: attendance_system.reports, 'reports')
+
+# Notices and the student timetable, served with ETags until their data changes
+responses = ResponseCache()
+
+# Published timetable snapshots, served as files
+timetable_snapshots = SnapshotStore(ROUTINE5_SNAPSHOTS)
+
+# Reads of generated timetables never contend with a generation in progress
+timetable_replica = ReadReplica(ROUTINE5_REPLICA)
+
+# Email configuration - UPDATE THESE VALUES
+ATTENDANCE_SMTP_CONFIG = {
+    'smtp_server': 'smtp.gmail.com',
+    'smtp_port': 587,
+    'email': 'sync.timely@gmail.com',
+    'password': 'zrtw pmwx dlsp jkcf',
+    'use_tls': True
+}
 
 # Ngrok will start on-demand when creating attendance
 
@@ -41,11 +86,11 @@ CONFIGURE_CODES = {
     '069': 'faculty'
 }
 
-@app.route('/')
+@web.route('/')
 def landing():
     return render_template('landing.html')
 
-@app.route('/login', methods=['GET', 'POST'])
+@web.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form['username']
@@ -58,15 +103,15 @@ def login():
             
             # Redirect to configure page for fac users
             if username == 'fac':
-                return redirect(url_for('configure'))
+                return redirect(url_for('.configure'))
             
-            return redirect(url_for('dashboard'))
+            return redirect(url_for('.dashboard'))
         else:
             return render_template('login.html', error='Invalid credentials')
     
     return render_template('login.html')
 
-@app.route('/auth/callback', methods=['POST'])
+@web.route('/auth/callback', methods=['POST'])
 def auth_callback():
     # Supabase authentication callback endpoint
     try:
@@ -101,7 +146,7 @@ def auth_callback():
         logger.error(f"Auth callback error: {e}")
         return jsonify({'success': False, 'error': 'Authentication failed'}), 500
 
-@app.route('/configure', methods=['GET', 'POST'])
+@web.route('/configure', methods=['GET', 'POST'])
 def configure():
     # Allow direct access for fac user or users with pending role
     if 'user' not in session:
@@ -111,32 +156,32 @@ def configure():
         session['name'] = 'Faculty Member'
     
     if session.get('role') != 'pending':
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('.dashboard'))
     
     if request.method == 'POST':
         configure_code = request.form['configure_code']
         
         if configure_code in CONFIGURE_CODES:
             session['role'] = CONFIGURE_CODES[configure_code]
-            return redirect(url_for('dashboard'))
+            return redirect(url_for('.dashboard'))
         else:
             return render_template('configure.html', error='Invalid configure code')
     
     return render_template('configure.html')
 
-@app.route('/logout')
+@web.route('/logout')
 def logout():
     session.clear()
-    return redirect(url_for('landing'))
+    return redirect(url_for('.landing'))
 
-@app.route('/dashboard')
+@web.route('/dashboard')
 def dashboard():
     if 'user' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('.login'))
     
     # Redirect to configure if role is pending
     if session.get('role') == 'pending':
-        return redirect(url_for('configure'))
+        return redirect(url_for('.configure'))
     
     role = session['role']
     if role == 'admin':
@@ -148,15 +193,15 @@ def dashboard():
     elif role == 'student':
         return render_template('student_dashboard.html')
     
-    return redirect(url_for('login'))
+    return redirect(url_for('.login'))
 
-@app.route('/generator')
+@web.route('/generator')
 def generator():
     if 'user' not in session or session['role'] != 'hod':
-        return redirect(url_for('login'))
+        return redirect(url_for('.login'))
     return render_template('generator.html')
 
-@app.route('/api/check_db_status')
+@web.route('/api/check_db_status')
 def check_db_status():
     if 'user' not in session or session['role'] != 'hod':
         return jsonify({'error': 'Unauthorized'}), 403
@@ -169,7 +214,7 @@ def check_db_status():
     except Exception as e:
         return jsonify({'configured': False, 'error': str(e)})
 
-@app.route('/generate', methods=['POST'])
+@web.route('/generate', methods=['POST'])
 def generate_timetable():
     if 'user' not in session or session['role'] != 'hod':
         return jsonify({'error': 'Unauthorized'}), 403
@@ -186,20 +231,31 @@ def generate_timetable():
         
         logger.info(f"Processing {len(nl_constraints)} constraints")
         
+        from orchestrator.orchestrator import Orchestrator, UnsatisfiableConstraints  # OR-Tools and the LLM agents
+        
         orch = Orchestrator()
-        result = orch.run(nl_constraints)
+        try:
+            result = orch.run(nl_constraints)
+        except UnsatisfiableConstraints as e:
+            return jsonify({'error': str(e), 'conflicts': e.conflicts}), 422
         
         return jsonify({
             'success': True,
             'outputs': result['outputs'],
-            'verification': result['verification']
+            'verification': result['verification'],
+            'metrics': result['metrics']
         })
         
     except Exception as e:
         logger.error(f"Error generating timetable: {e}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/generate_from_db', methods=['POST'])
+@web.route('/metrics')
+def prometheus_metrics():
+    # Timetable pipeline stage timings and solver statistics (see utils.metrics)
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+@web.route('/generate_from_db', methods=['POST'])
 def generate_from_db():
     if 'user' not in session or session['role'] != 'hod':
         return jsonify({'error': 'Unauthorized'}), 403
@@ -221,6 +277,7 @@ def generate_from_db():
         result = routine5.generate_timetables()
         
         if result.get('success'):
+            responses.bump('student-timetable')
             output_files = routine5.get_output_files()
             return jsonify({
                 'success': True,
@@ -235,7 +292,7 @@ def generate_from_db():
         logger.error(f"Error generating from database: {e}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/download/<filename>')
+@web.route('/download/<filename>')
 def download_file(filename):
     try:
         file_path = os.path.join('outputs', filename)
@@ -246,7 +303,7 @@ def download_file(filename):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/download_routine5_schedules')
+@web.route('/download_routine5_schedules')
 def download_routine5_schedules():
     try:
         # Find the generated PDF file from Routine5
@@ -266,7 +323,7 @@ def download_routine5_schedules():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/publish_timetable', methods=['POST'])
+@web.route('/publish_timetable', methods=['POST'])
 def publish_timetable():
     if 'user' not in session or session['role'] != 'hod':
         return jsonify({'error': 'Unauthorized'}), 403
@@ -275,37 +332,20 @@ def publish_timetable():
         data = request.get_json()
         title = data.get('title', 'New Timetable Published')
         
-        conn = sqlite3.connect('attendance.db')
-        cursor = conn.cursor()
-        
-        # Create notice board table if not exists
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS notice_board (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                content TEXT NOT NULL,
-                type TEXT DEFAULT 'timetable',
-                published_by TEXT NOT NULL,
-                published_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                is_active BOOLEAN DEFAULT 1,
-                timetable_data TEXT
-            )
-        ''')
-        
-        # Insert notice
-        cursor.execute('''
-            INSERT INTO notice_board (title, content, type, published_by, timetable_data)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (
-            title,
-            'New class timetables have been published and are now available.',
-            'timetable',
-            session['name'],
-            json.dumps({'published_at': datetime.now().isoformat()})
-        ))
-        
-        conn.commit()
-        conn.close()
+        with db.transaction() as cursor:
+            # Insert notice (table is created by attendance.migrations)
+            cursor.execute('''
+                INSERT INTO notice_board (title, content, type, published_by, timetable_data)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (
+                title,
+                'New class timetables have been published and are now available.',
+                'timetable',
+                session['name'],
+                json.dumps({'published_at': datetime.now().isoformat()})
+            ))
+        responses.bump('notices')
+        responses.bump('student-timetable')
         
         return jsonify({'success': True, 'message': 'Timetable published to notice board'})
         
@@ -313,147 +353,138 @@ def publish_timetable():
         logger.error(f"Error publishing timetable: {e}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/notices')
+def _load_notices():
+    cursor = db.connection().cursor()
+    
+    cursor.execute('''
+        SELECT title, content, published_by, published_at, type
+        FROM notice_board 
+        WHERE is_active = 1 
+        ORDER BY published_at DESC 
+        LIMIT 10
+    ''')
+    
+    notices = []
+    for row in cursor.fetchall():
+        notices.append({
+            'title': row[0],
+            'content': row[1],
+            'published_by': row[2],
+            'published_at': row[3],
+            'type': row[4]
+        })
+    
+    cursor.close()
+    return notices
+
+@web.route('/api/notices')
 def get_notices():
     try:
-        conn = sqlite3.connect('attendance.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT title, content, published_by, published_at, type
-            FROM notice_board 
-            WHERE is_active = 1 
-            ORDER BY published_at DESC 
-            LIMIT 10
-        ''')
-        
-        notices = []
-        for row in cursor.fetchall():
-            notices.append({
-                'title': row[0],
-                'content': row[1],
-                'published_by': row[2],
-                'published_at': row[3],
-                'type': row[4]
-            })
-        
-        conn.close()
-        return jsonify(notices)
+        # Polled by every open student dashboard; only re-queried after a publish
+        return responses.respond('notices', _load_notices, request)
         
     except Exception as e:
         logger.error(f"Error fetching notices: {e}")
         return jsonify([])
 
-@app.route('/api/rooms')
+@web.route('/api/rooms')
 def get_rooms():
-    try:
-        conn = sqlite3.connect('attendance.db')
-        cursor = conn.cursor()
-        
-        # Create rooms table if not exists
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS rooms (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                room_number TEXT UNIQUE NOT NULL,
-                latitude REAL,
-                longitude REAL,
-                radius INTEGER DEFAULT 5
-            )
-        ''')
-        
-        # Insert default rooms if table is empty
-        cursor.execute('SELECT COUNT(*) FROM rooms')
-        if cursor.fetchone()[0] == 0:
-            rooms = [('303', 22.5184833, 88.4168668, 5), ('304', 22.5185000, 88.4169000, 5), 
-                    ('305', 22.5185200, 88.4169300, 5), ('306', 22.5185400, 88.4169600, 5)]
-            for room in rooms:
-                cursor.execute('INSERT INTO rooms (room_number, latitude, longitude, radius) VALUES (?, ?, ?, ?)', room)
-        
-        cursor.execute('SELECT room_number FROM rooms ORDER BY room_number')
-        rooms = [row[0] for row in cursor.fetchall()]
-        
-        conn.commit()
-        conn.close()
-        return jsonify(rooms)
-        
-    except Exception as e:
-        logger.error(f"Error fetching rooms: {e}")
-        return jsonify(['303', '304', '305', '306'])  # Fallback
+    # Every dashboard load; served from the in-memory room registry
+    return responses.respond('rooms', attendance_system.rooms.names, request,
+                             version=lambda: attendance_system.rooms.version)
 
-@app.route('/api/student-timetable')
+@web.route('/api/rooms', methods=['POST'])
+def save_room():
+    """Add or move a room: {"room", "lat", "lng", "radius" (optional)}"""
+    if 'user' not in session or session['role'] != 'hod':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    data = request.get_json() or {}
+    try:
+        room = str(data['room']).strip()
+        if not room:
+            raise ValueError('room is required')
+        radius = data.get('radius')
+        saved = attendance_system.save_room(room, float(data['lat']), float(data['lng']),
+                                            float(radius) if radius is not None else None)
+    except KeyError as e:
+        return jsonify({'error': f'{e.args[0]} is required'}), 400
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'success': True, 'room': saved._asdict()})
+
+def _routine5_version():
+    """Changes whenever the timetable data students read changes, including by the Routine5 app"""
+    if timetable_replica.exists():
+        return timetable_replica.version()
+    # Generated before replicas existed: watch timetable.db (and its WAL) itself
+    version = []
+    for path in (ROUTINE5_DB, ROUTINE5_DB + '-wal'):
+        try:
+            stat = os.stat(path)
+            version.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            version.append(None)
+    return tuple(version)
+
+def _load_student_timetable():
+    if timetable_replica.exists():
+        return {'success': True, 'sections': load_sections(timetable_replica.connection())}
+    if not os.path.exists(ROUTINE5_DB):
+        return {'success': False, 'message': 'No generated timetable found'}
+    
+    return {'success': True, 'sections': load_sections(get_db(ROUTINE5_DB).connection())}
+
+def _send_snapshot(name):
+    """A published timetable snapshot file (gzip if the client accepts it), or None"""
+    found = timetable_snapshots.path(name, gzip_ok='gzip' in request.accept_encodings)
+    if found is None:
+        return None
+    path, encoding, etag = found
+    response = send_file(path, mimetype='application/json', etag=etag, conditional=True, max_age=None)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+@web.route('/api/student-timetable')
 def get_student_timetable():
     if 'user' not in session or session['role'] != 'student':
         return jsonify({'error': 'Unauthorized'}), 403
     
     try:
-        routine5_db = 'Routine5_lab_advanced/timetable.db'
-        if os.path.exists(routine5_db):
-            conn = sqlite3.connect(routine5_db)
-            cursor = conn.cursor()
-            
-            # Get all sections with their schedules
-            cursor.execute('''
-                SELECT sec.id, sec.section_label, y.year_number, s.semester_number, d.name, d.code
-                FROM sections sec
-                JOIN years y ON sec.year_id = y.id
-                JOIN semesters s ON s.year_id = y.id
-                JOIN departments d ON y.department_id = d.id
-                WHERE s.is_active = 1
-                ORDER BY y.year_number, s.semester_number, sec.section_label
-            ''')
-            sections = cursor.fetchall()
-            
-            all_sections = []
-            for section_id, section_label, year_number, semester_number, dept_name, dept_code in sections:
-                cursor.execute('''
-                    SELECT gs.day, gs.time_slot, s.name, st.teacher_name, 
-                           CASE WHEN tr.name IS NOT NULL THEN tr.name ELSE lr.name END as room_name
-                    FROM generated_schedules gs
-                    JOIN subjects s ON gs.subject_id = s.id
-                    JOIN subject_teachers st ON gs.teacher_id = st.id
-                    LEFT JOIN theory_rooms tr ON gs.room_id = tr.id AND gs.room_type = 'theory'
-                    LEFT JOIN lab_rooms lr ON gs.room_id = lr.id AND gs.room_type = 'lab'
-                    WHERE gs.section_id = ?
-                    ORDER BY 
-                        CASE gs.day 
-                            WHEN 'monday' THEN 1 
-                            WHEN 'tuesday' THEN 2 
-                            WHEN 'wednesday' THEN 3 
-                            WHEN 'thursday' THEN 4 
-                            WHEN 'friday' THEN 5 
-                        END, gs.time_slot
-                ''', (section_id,))
-                
-                schedule_data = cursor.fetchall()
-                schedule_grid = {}
-                for day, time_slot, subject, teacher, room in schedule_data:
-                    if day not in schedule_grid:
-                        schedule_grid[day] = {}
-                    schedule_grid[day][time_slot] = {
-                        'subject': subject,
-                        'teacher': teacher,
-                        'room': room
-                    }
-                
-                all_sections.append({
-                    'section_label': section_label,
-                    'year_number': year_number,
-                    'semester_number': semester_number,
-                    'dept_name': dept_name,
-                    'dept_code': dept_code,
-                    'schedule': schedule_grid
-                })
-            
-            conn.close()
-            return jsonify({'success': True, 'sections': all_sections})
+        # Published by the generator; no database access at all
+        snapshot = _send_snapshot(TIMETABLE)
+        if snapshot is not None:
+            return snapshot
         
-        return jsonify({'success': False, 'message': 'No generated timetable found'})
+        # Nothing published yet (e.g. generated before snapshots existed)
+        return responses.respond('student-timetable', _load_student_timetable, request,
+                                 version=_routine5_version)
         
     except Exception as e:
         logger.error(f"Error fetching student timetable: {e}")
         return jsonify({'success': False, 'error': str(e)})
 
-@app.route('/download-timetable')
+@web.route('/api/student-timetable/index')
+def get_student_timetable_index():
+    if 'user' not in session or session['role'] != 'student':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    return _send_snapshot(INDEX) or (jsonify({'error': 'No generated timetable found'}), 404)
+
+@web.route('/api/student-timetable/sections/<key>')
+def get_student_section_timetable(key):
+    if 'user' not in session or session['role'] != 'student':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    if not re.fullmatch(r'[a-z0-9-]+', key):
+        return jsonify({'error': 'Unknown section'}), 404
+    return _send_snapshot(f'sections/{key}.json') or (jsonify({'error': 'Unknown section'}), 404)
+
+@web.route('/download-timetable')
 def download_student_timetable():
     if 'user' not in session or session['role'] != 'student':
         return jsonify({'error': 'Unauthorized'}), 403
@@ -478,16 +509,16 @@ def download_student_timetable():
         logger.error(f"Error downloading PDF: {e}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/routine5_setup')
+@web.route('/routine5_setup')
 def routine5_setup():
     if 'user' not in session or session['role'] != 'hod':
-        return redirect(url_for('login'))
+        return redirect(url_for('.login'))
     
     # Redirect to Routine5 setup page
     return redirect('/static/routine5_setup.html')
 
 # Attendance System Routes
-@app.route('/create-attendance', methods=['POST'])
+@web.route('/create-attendance', methods=['POST'])
 def create_attendance():
     if 'user' not in session or session['role'] != 'faculty':
         return jsonify({'error': 'Unauthorized'}), 403
@@ -515,15 +546,11 @@ def create_attendance():
         class_id = f"{stream.lower()}-{stream.lower()}-{section.lower()}"
         class_name = f"{stream} Semester {semester} - Section {section}"
         
-        # Get room coordinates from database
-        conn_room = sqlite3.connect('attendance.db')
-        cursor_room = conn_room.cursor()
-        cursor_room.execute('SELECT latitude, longitude FROM rooms WHERE room_number = ?', (room,))
-        room_data = cursor_room.fetchone()
-        conn_room.close()
+        # Room coordinates from the registry (no query)
+        registered = attendance_system.rooms.get(room)
         
-        if room_data:
-            teacher_lat, teacher_lng = room_data
+        if registered:
+            teacher_lat, teacher_lng = registered.lat, registered.lng
         else:
             # Default coordinates for Room 303
             teacher_lat = 22.5184833
@@ -543,24 +570,15 @@ def create_attendance():
                 'message': f'No students found for class {class_format}'
             })
         
-        # Email configuration - UPDATE THESE VALUES
-        smtp_config = {
-            'smtp_server': 'smtp.gmail.com',
-            'smtp_port': 587,
-            'email': 'sync.timely@gmail.com',
-            'password': 'zrtw pmwx dlsp jkcf',
-            'use_tls': True
-        }
-        
-        # Send emails to students
-        emails_sent = attendance_system.send_attendance_emails(
-            students, session_id, class_name, room, smtp_config
+        # Queue emails to students; the outbox sender delivers them in the background
+        emails_queued = attendance_system.queue_attendance_emails(
+            students, session_id, class_name, room, ATTENDANCE_SMTP_CONFIG
         )
         
         return jsonify({
             'success': True,
             'sessionId': session_id,
-            'emailsSent': emails_sent,
+            'emailsQueued': emails_queued,
             'studentsFound': len(students),
             'classFormat': class_format
         })
@@ -569,20 +587,25 @@ def create_attendance():
         logger.error(f"Error creating attendance: {e}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/mark-attendance/<session_id>')
+@web.route('/attendance-emails/<session_id>')
+def attendance_email_status(session_id):
+    if 'user' not in session or session['role'] != 'faculty':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    try:
+        return jsonify(attendance_system.get_email_status(session_id))
+    except Exception as e:
+        logger.error(f"Error getting email status: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@web.route('/mark-attendance/<session_id>')
 def mark_attendance_page(session_id):
     try:
-        conn = sqlite3.connect('attendance.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        session_data = db.connection().execute('''
             SELECT class_name, room, created_at, radius, is_active
             FROM attendance_sessions 
             WHERE id = ?
-        ''', (session_id,))
-        
-        session_data = cursor.fetchone()
-        conn.close()
+        ''', (session_id,)).fetchone()
         
         if not session_data:
             return render_template('error.html', message='Invalid attendance session')
@@ -605,7 +628,7 @@ def mark_attendance_page(session_id):
         logger.error(f"Error loading attendance page: {e}")
         return render_template('error.html', message='Error loading attendance page')
 
-@app.route('/api/mark-attendance', methods=['POST'])
+@web.route('/api/mark-attendance', methods=['POST'])
 def api_mark_attendance():
     try:
         data = request.get_json()
@@ -621,13 +644,8 @@ def api_mark_attendance():
         print(f"DEBUG: Email from request: {email}")
         
         if email:
-            # Find student by email
-            conn = sqlite3.connect('attendance.db')
-            cursor = conn.cursor()
-            cursor.execute('SELECT id FROM students WHERE email = ?', (email,))
-            result = cursor.fetchone()
-            conn.close()
-            student_id = result[0] if result else 1
+            # Find student by email (session roster is cached by the marking engine)
+            student_id = attendance_system.marking.student_id_for_email(session_id, email) or 1
             print(f"DEBUG: Student ID found: {student_id}")
         else:
             student_id = 1  # Default fallback
@@ -638,8 +656,12 @@ def api_mark_attendance():
         if ',' in client_ip:
             client_ip = client_ip.split(',')[0].strip()
         
+        # Random id the browser keeps in localStorage; one device per student per session
+        device_id = data.get('device_id')
+        device_id = str(device_id)[:64] if device_id else None
+        
         result = attendance_system.mark_attendance(
-            session_id, student_id, latitude, longitude, client_ip
+            session_id, student_id, latitude, longitude, client_ip, device_id
         )
         
         return jsonify(result)
@@ -648,7 +670,7 @@ def api_mark_attendance():
         logger.error(f"Error marking attendance: {e}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/attendance-stats/<session_id>')
+@web.route('/attendance-stats/<session_id>')
 def attendance_stats(session_id):
     if 'user' not in session or session['role'] != 'faculty':
         return jsonify({'error': 'Unauthorized'}), 403
@@ -660,7 +682,20 @@ def attendance_stats(session_id):
         logger.error(f"Error getting attendance stats: {e}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/end-session/<session_id>', methods=['POST'])
+@web.route('/attendance-stream/<session_id>')
+def attendance_stream(session_id):
+    """Server-Sent Events: a counters snapshot, then a delta per accepted mark"""
+    if 'user' not in session or session['role'] != 'faculty':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    counters = attendance_system.marking.counters(session_id)
+    if counters is None:
+        return jsonify({'error': 'Session not found'}), 404
+    
+    return Response(event_stream(counters), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@web.route('/end-session/<session_id>', methods=['POST'])
 def end_session(session_id):
     if 'user' not in session or session['role'] != 'faculty':
         return jsonify({'error': 'Unauthorized'}), 403
@@ -672,87 +707,34 @@ def end_session(session_id):
         logger.error(f"Error ending session: {e}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/attendance-report/<session_id>')
+@web.route('/attendance-report/<session_id>')
 def attendance_report(session_id):
     if 'user' not in session or session['role'] != 'faculty':
-        return redirect(url_for('login'))
+        return redirect(url_for('.login'))
     
     try:
-        conn = sqlite3.connect('attendance.db')
-        cursor = conn.cursor()
-        
-        # Get session info
-        cursor.execute('''
-            SELECT class_name, room, created_at, class_id
-            FROM attendance_sessions WHERE id = ?
-        ''', (session_id,))
-        session_data = cursor.fetchone()
-        
-        if not session_data:
+        report = reports.session(session_id)
+        if not report:
             return render_template('error.html', message='Session not found')
         
-        # Get all students for this class
-        cursor.execute('''
-            SELECT s.id, s.name, s.email, s.roll_number
-            FROM students s WHERE s.class_id = ?
-        ''', (session_data[3],))
-        all_students = cursor.fetchall()
-        
-        # Get attendance records
-        cursor.execute('''
-            SELECT student_id, status, marked_at, distance
-            FROM attendance_records WHERE session_id = ?
-        ''', (session_id,))
-        attendance_records = {row[0]: row for row in cursor.fetchall()}
-        
-        conn.close()
-        
-        # Build student list with status
-        students = []
-        present_count = absent_count = not_clicked_count = 0
-        
-        for student in all_students:
-            student_id = student[0]
-            if student_id in attendance_records:
-                record = attendance_records[student_id]
-                status = record[1]  # present/absent
-                marked_at = record[2]
-                distance = record[3]
-                if status == 'present':
-                    present_count += 1
-                else:
-                    absent_count += 1
-            else:
-                status = 'not-clicked'
-                marked_at = None
-                distance = None
-                not_clicked_count += 1
-            
-            students.append({
-                'name': student[1],
-                'email': student[2],
-                'roll_number': student[3],
-                'status': status,
-                'marked_at': marked_at,
-                'distance': distance
-            })
+        # Counters are maintained by the marking path (attendance.live)
+        counts = attendance_system.marking.counters(session_id).snapshot()
         
         session_info = {
-            'class_name': session_data[0],
-            'room': session_data[1],
-            'created_at': session_data[2]
+            'class_name': report.class_name,
+            'room': report.room,
+            'created_at': report.created_at
         }
         
         stats = {
-            'present': present_count,
-            'absent': absent_count,
-            'not_clicked': not_clicked_count,
-            'total': len(all_students)
+            'present': counts['present'],
+            'absent': counts['absent'],
+            'not_clicked': counts['not_clicked'],
+            'total': counts['total']
         }
         
         return render_template('attendance_report.html', 
                              session=session_info, 
-                             students=students, 
                              stats=stats,
                              session_id=session_id)
         
@@ -760,7 +742,88 @@ def attendance_report(session_id):
         logger.error(f"Error generating report: {e}")
         return render_template('error.html', message='Error generating report')
 
-@app.route('/start_routine5_app', methods=['POST'])
+def _can_view_attendance():
+    return 'user' in session and session.get('role') in ('faculty', 'hod')
+
+@web.route('/api/attendance/students/<int:student_id>')
+def student_attendance(student_id):
+    """Attendance percentage per class for one student"""
+    if not _can_view_attendance():
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    return jsonify({'student_id': student_id,
+                    'classes': attendance_system.aggregates.student(student_id)})
+
+@web.route('/api/attendance/classes/<class_id>')
+def class_attendance(class_id):
+    """Every student of a class with their attendance percentage, lowest first"""
+    if not _can_view_attendance():
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    return jsonify({'class_id': class_id,
+                    'students': attendance_system.aggregates.class_percentages(class_id)})
+
+@web.route('/api/attendance/classes/<class_id>/defaulters')
+def class_defaulters(class_id):
+    """Students below the attendance threshold (?threshold=75 overrides the configured one)"""
+    if not _can_view_attendance():
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    threshold = request.args.get('threshold', attendance_system.aggregates.threshold, type=float)
+    return jsonify({'class_id': class_id,
+                    'threshold': threshold,
+                    'students': attendance_system.aggregates.defaulters(class_id, threshold)})
+
+@web.route('/api/attendance/classes/<class_id>/trend')
+def class_attendance_trend(class_id):
+    """Per-day attendance for a class over the last ?days=30 days"""
+    if not _can_view_attendance():
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    days = request.args.get('days', 30, type=int)
+    since = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+    return jsonify({'class_id': class_id,
+                    'since': since,
+                    'days': attendance_system.aggregates.trend(class_id, since)})
+
+@web.route('/api/attendance/proxy-flags/<session_id>')
+def attendance_proxy_flags(session_id):
+    """Co-located marks flagged when the session ended"""
+    if not _can_view_attendance():
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    return jsonify({'session_id': session_id, 'flags': attendance_system.get_proxy_flags(session_id)})
+
+@web.route('/api/rooms/<room>/geofence', methods=['POST'])
+def set_room_geofence(room):
+    """Save a room's geofence: {"bounds": [s, w, n, e]} or {"polygon": [[lat, lng], ...]}"""
+    if 'user' not in session or session['role'] != 'hod':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    try:
+        geometry = attendance_system.set_room_geofence(room, request.get_json() or {})
+        return jsonify({'success': True, 'room': room, 'geometry': json.loads(geometry.to_json()),
+                        'tolerance': geometry.tolerance})
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+
+@web.route('/api/attendance/recheck', methods=['POST'])
+def recheck_attendance():
+    """Re-verify stored marks against the current geofences: {"session_id"} or {"day"}, plus "apply" to write changes"""
+    if not _can_view_attendance():
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    data = request.get_json() or {}
+    try:
+        results = attendance_system.recheck_attendance(
+            session_id=data.get('session_id'), day=data.get('day'), apply=bool(data.get('apply'))
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'sessions': results,
+                    'changed': sum(len(r['changed']) for r in results)})
+
+@web.route('/start_routine5_app', methods=['POST'])
 def start_routine5_app():
     if 'user' not in session or session['role'] != 'hod':
         return jsonify({'error': 'Unauthorized'}), 403
@@ -799,162 +862,50 @@ def start_routine5_app():
         logger.error(f"Error starting Routine5 app: {e}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/export-pdf/<session_id>')
-def export_pdf(session_id):
+@web.route('/export-report/<session_id>/<fmt>')
+def export_report(session_id, fmt):
     if 'user' not in session or session['role'] != 'faculty':
         return jsonify({'error': 'Unauthorized'}), 403
+    if fmt not in REPORT_FORMATS:
+        return jsonify({'error': f'Unsupported format: {fmt}'}), 404
     
     try:
-        conn = sqlite3.connect('attendance.db')
-        cursor = conn.cursor()
-        
-        # Get session info
-        cursor.execute('''
-            SELECT class_name, room, created_at, class_id
-            FROM attendance_sessions WHERE id = ?
-        ''', (session_id,))
-        session_data = cursor.fetchone()
-        
-        if not session_data:
+        attendance_system.marking.flush()
+        report = reports.session(session_id)
+        if not report:
             return jsonify({'error': 'Session not found'}), 404
         
-        # Get all students for this class
-        cursor.execute('''
-            SELECT s.id, s.name, s.email, s.roll_number
-            FROM students s WHERE s.class_id = ?
-        ''', (session_data[3],))
-        all_students = cursor.fetchall()
+        download_name = f'attendance_report_{session_id}.{fmt}'
         
-        # Get attendance records
-        cursor.execute('''
-            SELECT student_id, status, marked_at, distance
-            FROM attendance_records WHERE session_id = ?
-        ''', (session_id,))
-        attendance_records = {row[0]: row for row in cursor.fetchall()}
+        # Ended sessions are served from the on-disk cache
+        cached_path = reports.cached(report, fmt)
+        if cached_path:
+            return send_file(cached_path, as_attachment=True, download_name=download_name,
+                             mimetype=REPORT_FORMATS[fmt])
         
-        conn.close()
+        if fmt == 'csv':
+            return Response(reports.csv_stream(report), mimetype=REPORT_FORMATS[fmt],
+                            headers={'Content-Disposition': f'attachment; filename={download_name}'})
         
-        # Create PDF
         buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=0.5*inch)
-        styles = getSampleStyleSheet()
-        story = []
-        
-        # Header with logos
-        try:
-            from reportlab.platypus import Image
-            hitk_logo = Image('https://lh3.googleusercontent.com/d/1LBhx-x_Si1-cmGqsRAVmheoz0tXvJ3UN', width=1*inch, height=1*inch)
-            timely_logo = Image('https://lh3.googleusercontent.com/d/16SCBMg4I5snTZjuQ1XrsfDPkRMvPfwGs', width=1*inch, height=1*inch)
-            
-            logo_data = [[
-                hitk_logo,
-                Paragraph('<b>Heritage Institute of Technology</b><br/>Attendance Management System<br/>Powered by Timely™', 
-                          ParagraphStyle('LogoText', parent=styles['Normal'], fontSize=12, alignment=1)),
-                timely_logo
-            ]]
-            
-            logo_table = Table(logo_data, colWidths=[1.5*inch, 4*inch, 1.5*inch])
-            logo_table.setStyle(TableStyle([
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 20)
-            ]))
-            story.append(logo_table)
-        except:
-            header_style = ParagraphStyle('Header', parent=styles['Normal'], fontSize=14, alignment=1, spaceAfter=20)
-            story.append(Paragraph('<b>Heritage Institute of Technology</b><br/>Attendance Management System<br/>Powered by Timely™', header_style))
-        
-        # Title
-        title_style = ParagraphStyle('CustomTitle', parent=styles['Heading1'], 
-                                   fontSize=18, spaceAfter=20, alignment=1)
-        story.append(Paragraph('Attendance Report', title_style))
-        
-        # Session info
-        info_style = ParagraphStyle('Info', parent=styles['Normal'], fontSize=12, spaceAfter=10)
-        story.append(Paragraph(f'<b>Class:</b> {session_data[0]}', info_style))
-        story.append(Paragraph(f'<b>Room:</b> {session_data[1]}', info_style))
-        story.append(Paragraph(f'<b>Date:</b> {session_data[2]}', info_style))
-        story.append(Spacer(1, 20))
-        
-        # Build table data
-        table_data = [['Name', 'Roll Number', 'Email', 'Status', 'Time']]
-        present_count = absent_count = not_clicked_count = 0
-        
-        for student in all_students:
-            student_id = student[0]
-            if student_id in attendance_records:
-                record = attendance_records[student_id]
-                status = record[1].title()
-                marked_at = record[2] if record[2] else 'N/A'
-                if record[1] == 'present':
-                    present_count += 1
-                else:
-                    absent_count += 1
-            else:
-                status = 'Not Clicked'
-                marked_at = 'N/A'
-                not_clicked_count += 1
-            
-            table_data.append([student[1], student[3], student[2], status, marked_at])
-        
-        # Create table
-        table = Table(table_data, colWidths=[2*inch, 1*inch, 2.5*inch, 1*inch, 1.5*inch])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        
-        # Color code status
-        for i, row in enumerate(table_data[1:], 1):
-            if row[3] == 'Present':
-                table.setStyle(TableStyle([('BACKGROUND', (3, i), (3, i), colors.lightgreen)]))
-            elif row[3] == 'Absent':
-                table.setStyle(TableStyle([('BACKGROUND', (3, i), (3, i), colors.lightcoral)]))
-            else:
-                table.setStyle(TableStyle([('BACKGROUND', (3, i), (3, i), colors.lightyellow)]))
-        
-        story.append(table)
-        story.append(Spacer(1, 20))
-        
-        # Summary
-        summary_data = [
-            ['Total Students', str(len(all_students))],
-            ['Present', str(present_count)],
-            ['Absent', str(absent_count)],
-            ['Not Clicked', str(not_clicked_count)]
-        ]
-        
-        summary_table = Table(summary_data, colWidths=[2*inch, 1*inch])
-        summary_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, -1), colors.lightblue),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        
-        story.append(Paragraph('<b>Summary</b>', styles['Heading2']))
-        story.append(summary_table)
-        
-        doc.build(story)
+        reports.write(report, fmt, buffer)
         buffer.seek(0)
         
         return send_file(
             buffer,
             as_attachment=True,
-            download_name=f'attendance_report_{session_id}.pdf',
-            mimetype='application/pdf'
+            download_name=download_name,
+            mimetype=REPORT_FORMATS[fmt]
         )
         
     except Exception as e:
-        logger.error(f"Error exporting PDF: {e}")
+        logger.error(f"Error exporting {fmt} report: {e}")
         return jsonify({'error': str(e)}), 500
 
+@web.route('/export-pdf/<session_id>')
+def export_pdf(session_id):
+    return export_report(session_id, 'pdf')
+
 
 
 def start_routine5_app():
@@ -967,6 +918,15 @@ def start_routine5_app():
     routine5_path = os.path.join(os.getcwd(), 'Routine5_lab_advanced')
     subprocess.Popen(['python', 'app.py'], cwd=routine5_path, shell=True)
 
+def create_app() -> Flask:
+    """The web app; subsystems are built on first use, not here"""
+    flask_app = Flask(__name__)
+    flask_app.secret_key = 'your-secret-key-change-in-production'
+    flask_app.register_blueprint(web)
+    return flask_app
+
+app = create_app()
+
 if __name__ == '__main__':
     import threading
     
@@ -974,4 +934,7 @@ if __name__ == '__main__':
     routine5_thread = threading.Thread(target=start_routine5_app, daemon=True)
     routine5_thread.start()
     
+    # Resume delivery of any attendance emails left queued by a previous run
+    attendance_system.get_outbox(ATTENDANCE_SMTP_CONFIG)
+    
     app.run(debug=False, host='0.0.0.0', port=5000)
\ No newline at end of file
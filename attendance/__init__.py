@@ -0,0 +1 @@
+# package init\n
\ No newline at end of file
@@ -0,0 +1,183 @@
+"""
+Materialized attendance aggregates across sessions.
+
+When a session ends, every student on its class roster is folded into
+``student_attendance_totals`` (sessions held, present, absent, not clicked per
+student and class) and the class's row for that day in
+``class_daily_attendance``. Both are upserts in the same transaction that marks
+the session ``aggregated_at``, so a session is counted exactly once and
+semester-level questions read a class's few hundred rows instead of joining
+every session and record. Sessions that ended before the tables existed are
+picked up by ``backfill``.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+from utils.db_utils import ConnectionManager
+from utils.logging_utils import get_logger
+
+logger = get_logger("AttendanceAggregates")
+
+_FOLD_STUDENTS = '''
+    INSERT INTO student_attendance_totals
+        (class_id, student_id, sessions, present, absent, not_clicked, last_session_at)
+    SELECT a.class_id, s.id, 1,
+           COALESCE(r.status = 'present', 0), COALESCE(r.status = 'absent', 0), r.student_id IS NULL,
+           a.created_at
+    FROM attendance_sessions a
+    JOIN students s ON s.class_id = a.class_id
+    LEFT JOIN attendance_records r ON r.session_id = a.id AND r.student_id = s.id
+    WHERE a.id = ?
+    ON CONFLICT (class_id, student_id) DO UPDATE SET
+        sessions = sessions + 1,
+        present = present + excluded.present,
+        absent = absent + excluded.absent,
+        not_clicked = not_clicked + excluded.not_clicked,
+        last_session_at = MAX(COALESCE(last_session_at, ''), excluded.last_session_at)
+'''
+
+_FOLD_DAY = '''
+    INSERT INTO class_daily_attendance (class_id, day, sessions, present, absent, not_clicked)
+    SELECT a.class_id, date(a.created_at, 'localtime'), 1,
+           COALESCE(SUM(r.status = 'present'), 0), COALESCE(SUM(r.status = 'absent'), 0),
+           COUNT(*) - COUNT(r.student_id)
+    FROM attendance_sessions a
+    JOIN students s ON s.class_id = a.class_id
+    LEFT JOIN attendance_records r ON r.session_id = a.id AND r.student_id = s.id
+    WHERE a.id = ?
+    GROUP BY a.class_id
+    ON CONFLICT (class_id, day) DO UPDATE SET
+        sessions = sessions + 1,
+        present = present + excluded.present,
+        absent = absent + excluded.absent,
+        not_clicked = not_clicked + excluded.not_clicked
+'''
+
+def _percentage(present: int, sessions: int) -> float:
+    return round(100.0 * present / sessions, 2) if sessions else 0.0
+
+class AttendanceAggregates:
+    def __init__(self, db: ConnectionManager, threshold: float = 75.0):
+        self.db = db
+        self.threshold = threshold
+
+    def apply_session(self, session_id: str) -> bool:
+        """Fold an ended session into the aggregates; False if it was already counted or is still open"""
+        with self.db.transaction() as cursor:
+            cursor.execute('''
+                UPDATE attendance_sessions SET aggregated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND is_active = 0 AND aggregated_at IS NULL
+            ''', (session_id,))
+            if cursor.rowcount == 0:
+                return False
+            cursor.execute(_FOLD_STUDENTS, (session_id,))
+            cursor.execute(_FOLD_DAY, (session_id,))
+        return True
+
+    def reclassify(self, session_id: str, changes: List[Tuple[int, str, str]]) -> None:
+        """Move counted marks between statuses, e.g. after a geofence correction.
+
+        changes are (student_id, old_status, new_status); sessions not yet
+        aggregated are left alone since they will be counted as stored.
+        """
+        with self.db.transaction() as cursor:
+            row = cursor.execute('''
+                SELECT class_id, date(created_at, 'localtime') FROM attendance_sessions
+                WHERE id = ? AND aggregated_at IS NOT NULL
+            ''', (session_id,)).fetchone()
+            if not row:
+                return
+            class_id, day = row
+            deltas = [(int(new == 'present') - int(old == 'present'), int(new == 'absent') - int(old == 'absent'),
+                       class_id, student_id) for student_id, old, new in changes]
+            cursor.executemany('''
+                UPDATE student_attendance_totals SET present = present + ?, absent = absent + ?
+                WHERE class_id = ? AND student_id = ?
+            ''', deltas)
+            cursor.execute('''
+                UPDATE class_daily_attendance SET present = present + ?, absent = absent + ?
+                WHERE class_id = ? AND day = ?
+            ''', (sum(d[0] for d in deltas), sum(d[1] for d in deltas), class_id, day))
+
+    def backfill(self, batch_size: int = 500) -> int:
+        """Fold every ended session that has not been counted yet; returns how many were"""
+        applied = 0
+        while True:
+            pending = [row[0] for row in self.db.connection().execute('''
+                SELECT id FROM attendance_sessions
+                WHERE is_active = 0 AND aggregated_at IS NULL
+                LIMIT ?
+            ''', (batch_size,))]
+            if not pending:
+                break
+            with self.db.transaction():
+                for session_id in pending:
+                    applied += self.apply_session(session_id)
+        if applied:
+            logger.info(f"Folded {applied} ended sessions into the attendance aggregates")
+        return applied
+
+    def student(self, student_id: int) -> List[Dict]:
+        """Attendance percentage per class for one student"""
+        rows = self.db.connection().execute('''
+            SELECT class_id, sessions, present, absent, not_clicked, last_session_at
+            FROM student_attendance_totals WHERE student_id = ?
+            ORDER BY class_id
+        ''', (student_id,)).fetchall()
+        return [{
+            'class_id': row[0],
+            'sessions': row[1],
+            'present': row[2],
+            'absent': row[3],
+            'not_clicked': row[4],
+            'percentage': _percentage(row[2], row[1]),
+            'last_session_at': row[5]
+        } for row in rows]
+
+    def class_percentages(self, class_id: str, below: Optional[float] = None) -> List[Dict]:
+        """Every student of a class with their attendance percentage, lowest first"""
+        sql = '''
+            SELECT t.student_id, s.name, s.roll_number, s.email,
+                   t.sessions, t.present, t.absent, t.not_clicked
+            FROM student_attendance_totals t
+            LEFT JOIN students s ON s.id = t.student_id
+            WHERE t.class_id = ?
+        '''
+        params: list = [class_id]
+        if below is not None:
+            sql += ' AND t.present * 100.0 < ? * t.sessions'
+            params.append(below)
+        sql += ' ORDER BY t.present * 1.0 / t.sessions, s.roll_number'
+        rows = self.db.connection().execute(sql, params).fetchall()
+        return [{
+            'student_id': row[0],
+            'name': row[1],
+            'roll_number': row[2],
+            'email': row[3],
+            'sessions': row[4],
+            'present': row[5],
+            'absent': row[6],
+            'not_clicked': row[7],
+            'percentage': _percentage(row[5], row[4])
+        } for row in rows]
+
+    def defaulters(self, class_id: str, threshold: Optional[float] = None) -> List[Dict]:
+        """Students of a class whose attendance is below the threshold (default: configured)"""
+        return self.class_percentages(class_id, below=self.threshold if threshold is None else threshold)
+
+    def trend(self, class_id: str, since: Optional[str] = None) -> List[Dict]:
+        """Per-day attendance for a class, oldest first; since is an ISO date"""
+        rows = self.db.connection().execute('''
+            SELECT day, sessions, present, absent, not_clicked
+            FROM class_daily_attendance
+            WHERE class_id = ? AND day >= ?
+            ORDER BY day
+        ''', (class_id, since or '')).fetchall()
+        return [{
+            'day': row[0],
+            'sessions': row[1],
+            'present': row[2],
+            'absent': row[3],
+            'not_clicked': row[4],
+            'percentage': _percentage(row[2], row[2] + row[3] + row[4])
+        } for row in rows]
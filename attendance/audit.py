@@ -0,0 +1,91 @@
+"""
+Batch re-verification of stored attendance marks against room geofences.
+
+Loads every located record of a session (or of all sessions held on a day) in
+one query and checks each session's records with one vectorized geofence call,
+using the same rule as the marking path: the room polygon if the room has one,
+otherwise the radius around the teacher's position. The result lists the marks
+whose status would change and which room each of them actually falls in.
+
+With ``apply=True`` the changes are written back, along with the matching
+adjustments to the aggregates. Only ended sessions are rewritten; open sessions
+are still taking marks and are reported as skipped.
+"""
+
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from attendance.aggregates import AttendanceAggregates
+from attendance.geofence import GeofenceIndex, RoomGeometry, haversine_many
+from utils.db_utils import ConnectionManager
+
+def recheck(db: ConnectionManager, geofences: GeofenceIndex, session_id: Optional[str] = None,
+            day: Optional[str] = None, apply: bool = False,
+            aggregates: Optional[AttendanceAggregates] = None) -> List[Dict]:
+    """One result per session; give either session_id or an ISO day"""
+    if (session_id is None) == (day is None):
+        raise ValueError("Give either a session id or a day")
+    if session_id is not None:
+        where, params = 'a.id = ?', (session_id,)
+    else:
+        where, params = "date(a.created_at, 'localtime') = ?", (day,)
+
+    conn = db.connection()
+    sessions = {row[0]: row for row in conn.execute(f'''
+        SELECT a.id, a.room, a.teacher_lat, a.teacher_lng, a.radius, a.is_active
+        FROM attendance_sessions a WHERE {where}
+    ''', params)}
+    records = defaultdict(list)
+    for row in conn.execute(f'''
+        SELECT r.session_id, r.id, r.student_id, r.student_lat, r.student_lng, r.status
+        FROM attendance_records r
+        JOIN attendance_sessions a ON a.id = r.session_id
+        WHERE {where} AND r.student_lat IS NOT NULL AND r.student_lng IS NOT NULL
+    ''', params):
+        records[row[0]].append(row[1:])
+
+    results = []
+    for sid, (_, room, teacher_lat, teacher_lng, radius, is_active) in sessions.items():
+        geometry = geofences.get(room)
+        if geometry is None or not geometry.is_polygon:
+            geometry = RoomGeometry.circle(room, teacher_lat, teacher_lng, radius)
+        rows = records.get(sid, [])
+        result = {'session_id': sid, 'room': room, 'checked': len(rows), 'changed': [], 'applied': False}
+        results.append(result)
+        if not rows:
+            continue
+
+        record_ids, student_ids, lats, lngs, statuses = (list(column) for column in zip(*rows))
+        lats, lngs = np.asarray(lats, dtype=float), np.asarray(lngs, dtype=float)
+        outside = geometry.outside_distance(lats, lngs)
+        present = outside <= geometry.tolerance
+        # Circles report the distance from the teacher, as the marking path does
+        distance = outside if geometry.is_polygon else haversine_many(lats, lngs, teacher_lat, teacher_lng)
+        new_statuses = np.where(present, 'present', 'absent')
+        changed = np.flatnonzero(new_statuses != np.asarray(statuses))
+        if not len(changed):
+            continue
+
+        located = geofences.locate(lats[changed], lngs[changed])
+        result['changed'] = [{
+            'record_id': record_ids[i],
+            'student_id': student_ids[i],
+            'old_status': statuses[i],
+            'new_status': str(new_statuses[i]),
+            'distance': round(float(distance[i]), 2),
+            'located_room': located[k]
+        } for k, i in enumerate(changed)]
+
+        if apply and is_active:
+            result['skipped'] = 'session is still open'
+        elif apply:
+            with db.transaction() as cursor:
+                cursor.executemany('UPDATE attendance_records SET status = ?, distance = ? WHERE id = ?',
+                                   [(c['new_status'], c['distance'], c['record_id']) for c in result['changed']])
+                if aggregates is not None:
+                    aggregates.reclassify(sid, [(c['student_id'], c['old_status'], c['new_status'])
+                                                for c in result['changed']])
+            result['applied'] = True
+    return results
@@ -0,0 +1,145 @@
+"""
+Precompiled email templates for attendance notifications.
+
+Templates use str.format syntax (the ones in config.email_config). A template
+is parsed once into literal segments and fields; fields that are the same for a
+whole session (class, room) are baked in with ``partial`` so that rendering a
+student's message only joins a handful of strings. SessionEmailRenderer also
+encodes the shared MIME headers once and produces ready-to-send message bytes
+per recipient, without building an email.message object for each student.
+"""
+
+import base64
+import html
+import uuid
+from email.header import Header
+from email.utils import formatdate, make_msgid
+from string import Formatter
+from typing import Dict, List, Optional, Tuple, Union
+
+from config.email_config import EMAIL_TEMPLATES
+
+_Segment = Union[str, Tuple[str]]  # literal text, or (field_name,)
+
+class CompiledTemplate:
+    def __init__(self, source: str, escape: bool = False, _segments: Optional[List[_Segment]] = None):
+        self.escape = escape
+        if _segments is None:
+            _segments = []
+            for literal, field_name, format_spec, conversion in Formatter().parse(source):
+                if literal:
+                    _segments.append(literal)
+                if field_name is not None:
+                    if format_spec or conversion or not field_name.isidentifier():
+                        raise ValueError(f"Unsupported template field: {{{field_name}}}")
+                    _segments.append((field_name,))
+        self._segments = _merge(_segments)
+
+    @classmethod
+    def literal(cls, text: str) -> "CompiledTemplate":
+        """A template with no fields, for text that is already rendered"""
+        return cls("", _segments=[text])
+
+    @property
+    def fields(self) -> List[str]:
+        return [s[0] for s in self._segments if isinstance(s, tuple)]
+
+    def _value(self, value) -> str:
+        value = str(value)
+        return html.escape(value) if self.escape else value
+
+    def partial(self, **fields) -> "CompiledTemplate":
+        """Bake in the given fields and return a template over the remaining ones"""
+        segments = [self._value(fields[s[0]]) if isinstance(s, tuple) and s[0] in fields else s
+                    for s in self._segments]
+        return CompiledTemplate("", self.escape, segments)
+
+    def render(self, **fields) -> str:
+        return "".join(s if isinstance(s, str) else self._value(fields[s[0]]) for s in self._segments)
+
+def _merge(segments: List[_Segment]) -> List[_Segment]:
+    merged: List[_Segment] = []
+    for segment in segments:
+        if isinstance(segment, str) and merged and isinstance(merged[-1], str):
+            merged[-1] += segment
+        else:
+            merged.append(segment)
+    return merged
+
+def _encode_header(value: str) -> str:
+    return value if value.isascii() else Header(value, "utf-8").encode()
+
+def _part(content_type: str, text: str) -> bytes:
+    return (f"Content-Type: {content_type}; charset=\"utf-8\"\r\n"
+            "Content-Transfer-Encoding: base64\r\n\r\n").encode() + \
+        base64.encodebytes(text.encode("utf-8")).replace(b"\n", b"\r\n")
+
+class SessionEmailRenderer:
+    """Renders per-student messages for one attendance session"""
+
+    def __init__(self, sender: str, subject: str, html_template: CompiledTemplate,
+                 text_template: Optional[CompiledTemplate] = None):
+        self.sender = sender
+        self.subject = subject
+        self.html_template = html_template
+        self.text_template = text_template
+        self._msgid_domain = sender.rpartition("@")[2] or None
+
+        headers = [
+            f"From: {sender}",
+            f"Subject: {_encode_header(subject)}",
+            f"Date: {formatdate(localtime=True)}",
+            "MIME-Version: 1.0",
+        ]
+        if text_template is not None:
+            self._boundary = f"=={uuid.uuid4().hex}"
+            headers.append(f'Content-Type: multipart/alternative; boundary="{self._boundary}"')
+        self._headers = ("\r\n".join(headers) + "\r\n").encode()
+
+    def render_html(self, **fields) -> str:
+        return self.html_template.render(**fields)
+
+    def render_text(self, **fields) -> Optional[str]:
+        return self.text_template.render(**fields) if self.text_template is not None else None
+
+    def render(self, recipient: str, **fields) -> bytes:
+        """Return the complete RFC 5322 message for one recipient"""
+        per_message = (f"To: {recipient}\r\n"
+                       f"Message-ID: {make_msgid(domain=self._msgid_domain)}\r\n").encode()
+        html_body = self.render_html(**fields)
+        if self.text_template is None:
+            return self._headers + per_message + _part("text/html", html_body)
+
+        boundary = self._boundary.encode()
+        return (self._headers + per_message + b"\r\n" +
+                b"--" + boundary + b"\r\n" + _part("text/plain", self.render_text(**fields)) +
+                b"--" + boundary + b"\r\n" + _part("text/html", html_body) +
+                b"--" + boundary + b"--\r\n")
+
+def build_message(sender: str, recipient: str, subject: str, html_body: str,
+                  text_body: Optional[str] = None) -> bytes:
+    """One-off message bytes for an already rendered body (e.g. from the outbox)"""
+    renderer = SessionEmailRenderer(sender, subject, CompiledTemplate.literal(html_body),
+                                    CompiledTemplate.literal(text_body) if text_body is not None else None)
+    return renderer.render(recipient)
+
+_compiled: Dict[str, Tuple[CompiledTemplate, CompiledTemplate, CompiledTemplate]] = {}
+
+def attendance_renderer(sender: str, class_name: str, room: str, duration: int = 5,
+                        include_text: bool = True, template: str = "attendance_notification") -> SessionEmailRenderer:
+    """Renderer for one session; per-student fields are student_name and attendance_url"""
+    if template not in _compiled:
+        source = EMAIL_TEMPLATES[template]
+        _compiled[template] = (
+            CompiledTemplate(source["subject"]),
+            CompiledTemplate(source["html"], escape=True),
+            CompiledTemplate(source["body"].strip() + "\n"),
+        )
+    subject, html_template, text_template = _compiled[template]
+    session_fields = {"class_name": class_name, "room": room}
+    return SessionEmailRenderer(
+        sender,
+        subject.render(class_name=class_name),
+        html_template.partial(**session_fields),
+        text_template.partial(duration=duration, **session_fields) if include_text else None,
+    )
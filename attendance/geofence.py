@@ -0,0 +1,239 @@
+"""
+Room geofences: circles, rectangles and polygons with a spatial grid index.
+
+The room list in config.email_config places rooms centimetres apart, so radius
+circles around them all overlap. A room can instead be given as a rectangle or
+polygon of (lat, lng) vertices, plus a tolerance in metres for GPS error. All
+checks are NumPy batch operations: one tap is a batch of one, and an audit
+re-checks every record of a session or a day in a single call.
+
+Geometry is measured on a local equirectangular projection (metres east/north
+of a reference point), which is accurate to millimetres over a campus. Circles
+keep using the Haversine distance, so they match the original radius check.
+"""
+
+import json
+import math
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.db_utils import ConnectionManager
+
+EARTH_RADIUS_M = 6371000
+
+_M_PER_DEG = math.pi / 180 * EARTH_RADIUS_M
+
+def haversine_many(lats, lngs, lat0: float, lng0: float) -> np.ndarray:
+    """Distance in metres from every (lat, lng) to one point"""
+    lat1 = np.radians(np.asarray(lats, dtype=float))
+    lng1 = np.radians(np.asarray(lngs, dtype=float))
+    lat2, lng2 = math.radians(lat0), math.radians(lng0)
+    a = (np.sin((lat2 - lat1) / 2) ** 2 +
+         np.cos(lat1) * math.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+class _Projection:
+    """Metres east/north of an origin"""
+
+    def __init__(self, lat0: float, lng0: float):
+        self.lat0 = lat0
+        self.lng0 = lng0
+        self.kx = _M_PER_DEG * math.cos(math.radians(lat0))
+
+    def __call__(self, lats, lngs) -> Tuple[np.ndarray, np.ndarray]:
+        return ((np.asarray(lngs, dtype=float) - self.lng0) * self.kx,
+                (np.asarray(lats, dtype=float) - self.lat0) * _M_PER_DEG)
+
+@dataclass
+class RoomGeometry:
+    room: str
+    polygon: Optional[List[Tuple[float, float]]] = None  # (lat, lng) vertices
+    center: Optional[Tuple[float, float]] = None          # circle centre
+    radius: float = 0.0
+    tolerance: float = 0.0
+
+    @classmethod
+    def circle(cls, room: str, lat: float, lng: float, radius: float, tolerance: float = 0.0) -> "RoomGeometry":
+        return cls(room, center=(lat, lng), radius=radius, tolerance=tolerance)
+
+    @classmethod
+    def rectangle(cls, room: str, south: float, west: float, north: float, east: float,
+                  tolerance: float = 0.0) -> "RoomGeometry":
+        return cls(room, polygon=[(south, west), (south, east), (north, east), (north, west)], tolerance=tolerance)
+
+    @classmethod
+    def from_json(cls, room: str, data, tolerance: Optional[float] = None) -> "RoomGeometry":
+        """Parse {"polygon": [[lat, lng], ...]}, {"bounds": [s, w, n, e]} or {"circle": [lat, lng, r]}"""
+        if isinstance(data, str):
+            data = json.loads(data)
+        tolerance = float(data.get('tolerance', 0.0) if tolerance is None else tolerance)
+        if 'polygon' in data:
+            vertices = [(float(lat), float(lng)) for lat, lng in data['polygon']]
+            if len(vertices) < 3:
+                raise ValueError(f"Polygon for {room} needs at least 3 vertices")
+            return cls(room, polygon=vertices, tolerance=tolerance)
+        if 'bounds' in data:
+            south, west, north, east = map(float, data['bounds'])
+            if south >= north or west >= east:
+                raise ValueError(f"Bounds for {room} must be [south, west, north, east]")
+            return cls.rectangle(room, south, west, north, east, tolerance)
+        if 'circle' in data:
+            lat, lng, radius = map(float, data['circle'])
+            return cls.circle(room, lat, lng, radius, tolerance)
+        raise ValueError(f"Geofence for {room} needs a polygon, bounds or circle")
+
+    def to_json(self) -> str:
+        if self.polygon is not None:
+            return json.dumps({'polygon': [list(v) for v in self.polygon]})
+        return json.dumps({'circle': [self.center[0], self.center[1], self.radius]})
+
+    @property
+    def is_polygon(self) -> bool:
+        return self.polygon is not None
+
+    def centroid(self) -> Tuple[float, float]:
+        if self.polygon is None:
+            return self.center
+        lats, lngs = zip(*self.polygon)
+        return sum(lats) / len(lats), sum(lngs) / len(lngs)
+
+    def outside_distance(self, lats, lngs) -> np.ndarray:
+        """Metres each point lies outside the room (0 inside)"""
+        if self.polygon is None:
+            return np.maximum(haversine_many(lats, lngs, *self.center) - self.radius, 0.0)
+
+        projection = _Projection(*self.centroid())
+        px, py = projection(lats, lngs)
+        px, py = np.atleast_1d(px)[:, None], np.atleast_1d(py)[:, None]
+        vertex_lats, vertex_lngs = np.asarray(self.polygon, dtype=float).T
+        ax, ay = projection(vertex_lats, vertex_lngs)   # edge starts
+        bx, by = np.roll(ax, -1), np.roll(ay, -1)        # edge ends
+
+        # Crossing number: edges that straddle the point's y and cross to its right
+        straddles = (ay > py) != (by > py)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cross_x = ax + (py - ay) * (bx - ax) / (by - ay)
+        inside = np.count_nonzero(straddles & (px < cross_x), axis=1) % 2 == 1
+
+        # Distance to the nearest edge
+        ex, ey = bx - ax, by - ay
+        length2 = ex * ex + ey * ey
+        t = np.clip(((px - ax) * ex + (py - ay) * ey) / np.where(length2 == 0, 1, length2), 0, 1)
+        dx, dy = px - (ax + t * ex), py - (ay + t * ey)
+        edge = np.sqrt(dx * dx + dy * dy).min(axis=1)
+        return np.where(inside, 0.0, edge)
+
+    def contains(self, lats, lngs) -> np.ndarray:
+        return self.outside_distance(lats, lngs) <= self.tolerance
+
+    def bounds_m(self, projection: _Projection) -> Tuple[float, float, float, float]:
+        """(min_x, min_y, max_x, max_y) in the projection's metres, widened by the tolerance"""
+        if self.polygon is None:
+            x, y = projection(self.center[0], self.center[1])
+            pad = self.radius + self.tolerance
+            return float(x) - pad, float(y) - pad, float(x) + pad, float(y) + pad
+        lats, lngs = zip(*self.polygon)
+        xs, ys = projection(lats, lngs)
+        return (float(xs.min()) - self.tolerance, float(ys.min()) - self.tolerance,
+                float(xs.max()) + self.tolerance, float(ys.max()) + self.tolerance)
+
+class GeofenceIndex:
+    """Rooms bucketed into square grid cells so a point is only tested against nearby rooms"""
+
+    def __init__(self, rooms: Iterable[RoomGeometry], cell_m: float = 20.0):
+        self.cell_m = cell_m
+        self.rooms: Dict[str, RoomGeometry] = {}
+        self._cells: Dict[Tuple[int, int], List[str]] = {}
+        self._projection: Optional[_Projection] = None
+        self._build(list(rooms))
+
+    def _build(self, rooms: List[RoomGeometry]) -> None:
+        self.rooms = {room.room: room for room in rooms}
+        self._cells = {}
+        if not rooms:
+            self._projection = None
+            return
+        centroids = [room.centroid() for room in rooms]
+        self._projection = _Projection(sum(c[0] for c in centroids) / len(centroids),
+                                       sum(c[1] for c in centroids) / len(centroids))
+        for room in rooms:
+            min_x, min_y, max_x, max_y = room.bounds_m(self._projection)
+            for cx in range(math.floor(min_x / self.cell_m), math.floor(max_x / self.cell_m) + 1):
+                for cy in range(math.floor(min_y / self.cell_m), math.floor(max_y / self.cell_m) + 1):
+                    self._cells.setdefault((cx, cy), []).append(room.room)
+
+    def get(self, room: str) -> Optional[RoomGeometry]:
+        return self.rooms.get(room)
+
+    def update(self, geometry: RoomGeometry) -> None:
+        """Add or replace one room's geometry"""
+        rooms = dict(self.rooms)
+        rooms[geometry.room] = geometry
+        self._build(list(rooms.values()))
+
+    def candidates(self, lat: float, lng: float) -> List[str]:
+        if self._projection is None:
+            return []
+        x, y = self._projection(lat, lng)
+        return list(self._cells.get((math.floor(float(x) / self.cell_m), math.floor(float(y) / self.cell_m)), ()))
+
+    def locate(self, lats, lngs) -> List[Optional[str]]:
+        """The room each point falls in (the nearest boundary wins when rooms overlap), or None"""
+        lats = np.atleast_1d(np.asarray(lats, dtype=float))
+        lngs = np.atleast_1d(np.asarray(lngs, dtype=float))
+        found: List[Optional[str]] = [None] * len(lats)
+        if self._projection is None or not len(lats):
+            return found
+
+        x, y = self._projection(lats, lngs)
+        cells = np.stack([np.floor(x / self.cell_m), np.floor(y / self.cell_m)], axis=1).astype(np.int64)
+        unique_cells, groups = np.unique(cells, axis=0, return_inverse=True)
+        groups = groups.reshape(-1)
+        for g, (cx, cy) in enumerate(unique_cells):
+            names = self._cells.get((int(cx), int(cy)))
+            if not names:
+                continue
+            members = np.flatnonzero(groups == g)
+            best = np.full(len(members), np.inf)
+            best_room = np.full(len(members), -1)
+            for k, name in enumerate(names):
+                room = self.rooms[name]
+                outside = room.outside_distance(lats[members], lngs[members])
+                hit = (outside <= room.tolerance) & (outside < best)
+                best = np.where(hit, outside, best)
+                best_room = np.where(hit, k, best_room)
+            for i, k in zip(members, best_room):
+                if k >= 0:
+                    found[i] = names[k]
+        return found
+
+def verify(geometry: RoomGeometry, lats: Sequence[float], lngs: Sequence[float]) -> Tuple[np.ndarray, np.ndarray]:
+    """Batch check: (inside flags, metres outside the room) for every point"""
+    outside = geometry.outside_distance(lats, lngs)
+    return outside <= geometry.tolerance, outside
+
+def load_geofences(db: ConnectionManager, cell_m: float = 20.0, rooms: Optional[Iterable] = None) -> GeofenceIndex:
+    """Index of every room: its stored geofence, else the radius circle from room_coordinates
+
+    ``rooms`` are (room, lat, lng, radius) rows already loaded, e.g. a RoomRegistry.
+    """
+    conn = db.connection()
+    if rooms is None:
+        rooms = conn.execute('SELECT room_number, latitude, longitude, radius FROM room_coordinates').fetchall()
+    geometries = {room: RoomGeometry.from_json(room, geometry, tolerance)
+                  for room, geometry, tolerance in conn.execute(
+                      'SELECT room_number, geometry, tolerance FROM room_geofences')}
+    for room, lat, lng, radius in rooms:
+        geometries.setdefault(room, RoomGeometry.circle(room, lat, lng, radius))
+    return GeofenceIndex(geometries.values(), cell_m)
+
+def save_geofence(db: ConnectionManager, geometry: RoomGeometry) -> None:
+    with db.transaction() as cursor:
+        cursor.execute('''
+            INSERT INTO room_geofences (room_number, geometry, tolerance, updated_at)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT (room_number) DO UPDATE SET
+                geometry = excluded.geometry, tolerance = excluded.tolerance, updated_at = CURRENT_TIMESTAMP
+        ''', (geometry.room, geometry.to_json(), geometry.tolerance))
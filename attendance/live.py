@@ -0,0 +1,113 @@
+"""
+Live per-session attendance counters.
+
+The marking path updates a session's counters as each tap is accepted, so the
+present / absent / not-clicked totals are known without an aggregate query.
+Every change bumps a version and is kept in a short in-memory log. Stream
+readers (the SSE endpoint) wait on the session's condition and are sent only the
+deltas since the version they last saw, or a fresh snapshot if they fell
+further behind than the log reaches. A mark costs the same however many
+dashboards are watching.
+
+Counters are per process: they see the marks accepted by this process's
+MarkingEngine.
+"""
+
+import json
+import threading
+from collections import deque
+from typing import Dict, Iterator, List, Optional
+
+KEEPALIVE_SECONDS = 15.0
+
+class SessionCounters:
+    def __init__(self, total: int, present: int = 0, absent: int = 0,
+                 ended: bool = False, history: int = 256):
+        self.total = total
+        self.present = present
+        self.absent = absent
+        self.ended = ended
+        self.version = 0
+        self._log: deque = deque(maxlen=history)  # (version, delta)
+        self._changed = threading.Condition()
+
+    @property
+    def not_clicked(self) -> int:
+        return max(self.total - self.present - self.absent, 0)
+
+    def snapshot(self) -> Dict:
+        with self._changed:
+            return {
+                'version': self.version,
+                'present': self.present,
+                'absent': self.absent,
+                'not_clicked': self.not_clicked,
+                'total': self.total,
+                'ended': self.ended,
+            }
+
+    def record(self, status: str) -> Dict:
+        """Count one accepted mark and wake stream readers; returns the delta"""
+        with self._changed:
+            not_clicked = self.not_clicked
+            if status == 'present':
+                self.present += 1
+            else:
+                self.absent += 1
+            delta = {status: 1}
+            if self.not_clicked != not_clicked:
+                delta['not_clicked'] = self.not_clicked - not_clicked
+            return self._publish(delta)
+
+    def end(self) -> None:
+        with self._changed:
+            if not self.ended:
+                self.ended = True
+                self._publish({'ended': True})
+
+    def _publish(self, delta: Dict) -> Dict:
+        self.version += 1
+        delta['version'] = self.version
+        self._log.append((self.version, delta))
+        self._changed.notify_all()
+        return delta
+
+    def wait(self, since: int, timeout: float) -> Optional[List[Dict]]:
+        """Deltas after version ``since``, waiting up to timeout for the first one.
+
+        Returns an empty list on timeout, and None when the reader is too far
+        behind for the log and should take a new snapshot instead.
+        """
+        with self._changed:
+            if self.version == since and not self.ended:
+                self._changed.wait(timeout)
+            if self.version == since:
+                return []
+            if not self._log or self._log[0][0] > since + 1:
+                return None
+            return [delta for version, delta in self._log if version > since]
+
+def _event(name: str, data: Dict) -> str:
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+def event_stream(counters: SessionCounters, keepalive: float = KEEPALIVE_SECONDS) -> Iterator[str]:
+    """Server-Sent Events for one session: a snapshot, then deltas until the session ends"""
+    snapshot = counters.snapshot()
+    yield _event('snapshot', snapshot)
+    since = snapshot['version']
+    while not snapshot['ended']:
+        deltas = counters.wait(since, keepalive)
+        if deltas is None:
+            snapshot = counters.snapshot()
+            since = snapshot['version']
+            yield _event('snapshot', snapshot)
+            continue
+        if not deltas:
+            yield ": keepalive\n\n"
+            continue
+        for delta in deltas:
+            since = delta['version']
+            if delta.get('ended'):
+                yield _event('end', delta)
+                return
+            yield _event('delta', delta)
@@ -0,0 +1,143 @@
+"""
+Pooled SMTP dispatcher for attendance notifications.
+
+A bounded pool of persistent SMTP connections sends messages in parallel. Each
+connection is recycled after ``max_messages_per_connection`` messages (most
+providers cap messages per session) and replaced after any failure; a failed
+message is retried on a fresh connection. ``send`` returns one DeliveryResult
+per recipient instead of a single count.
+"""
+
+import queue
+import smtplib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from email.message import Message
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from utils.logging_utils import get_logger
+
+logger = get_logger("AttendanceMailer")
+
+@dataclass
+class DeliveryResult:
+    recipient: str
+    success: bool
+    attempts: int = 1
+    error: Optional[str] = None
+
+class _PooledConnection:
+    __slots__ = ("smtp", "sent")
+
+    def __init__(self, smtp: smtplib.SMTP):
+        self.smtp = smtp
+        self.sent = 0
+
+class SMTPDispatcher:
+    def __init__(self, smtp_config: Dict, pool_size: int = 4, max_messages_per_connection: int = 100,
+                 max_attempts: int = 3, timeout: float = 30,
+                 smtp_factory: Callable[..., smtplib.SMTP] = smtplib.SMTP):
+        self.smtp_config = smtp_config
+        self.pool_size = max(pool_size, 1)
+        self.max_messages_per_connection = max_messages_per_connection
+        self.max_attempts = max(max_attempts, 1)
+        self.timeout = timeout
+        self.smtp_factory = smtp_factory
+        self._idle: "queue.LifoQueue[_PooledConnection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+
+    def _connect(self) -> _PooledConnection:
+        config = self.smtp_config
+        smtp = self.smtp_factory(config['smtp_server'], config['smtp_port'], timeout=self.timeout)
+        if config.get('use_tls', True):
+            smtp.starttls()
+        if config.get('password'):
+            smtp.login(config['email'], config['password'])
+        return _PooledConnection(smtp)
+
+    def _acquire(self) -> _PooledConnection:
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            return self._connect()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _release(self, conn: Optional[_PooledConnection]) -> None:
+        if conn is not None:
+            if conn.sent >= self.max_messages_per_connection:
+                _quit(conn)
+            else:
+                self._idle.put(conn)
+        self._slots.release()
+
+    def send_one(self, recipient: str, message: Union[Message, bytes]) -> DeliveryResult:
+        """Send one message, retrying on a fresh connection if the current one fails"""
+        error = None
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                conn = self._acquire()
+            except (smtplib.SMTPException, OSError) as e:
+                error = f"connect failed: {e}"
+                continue
+            try:
+                if isinstance(message, bytes):
+                    conn.smtp.sendmail(self.smtp_config['email'], [recipient], message)
+                else:
+                    conn.smtp.send_message(message, to_addrs=[recipient])
+                conn.sent += 1
+            except smtplib.SMTPRecipientsRefused as e:
+                # The connection is fine, the address is not; retrying will not help
+                conn.sent += 1
+                self._release(conn)
+                return DeliveryResult(recipient, False, attempt, f"recipient refused: {e.recipients}")
+            except (smtplib.SMTPException, OSError) as e:
+                error = str(e) or e.__class__.__name__
+                _quit(conn)
+                self._release(None)
+                continue
+            self._release(conn)
+            return DeliveryResult(recipient, True, attempt)
+
+        logger.warning(f"Giving up on {recipient} after {self.max_attempts} attempts: {error}")
+        return DeliveryResult(recipient, False, self.max_attempts, error)
+
+    def send(self, messages: Iterable[Tuple[str, Union[Message, bytes]]]) -> List[DeliveryResult]:
+        """Send (recipient, message) pairs in parallel; results are in input order.
+
+        A message is either an email.message object or ready-to-send bytes.
+        """
+        messages = list(messages)
+        if not messages:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.pool_size, len(messages)),
+                                thread_name_prefix="smtp") as pool:
+            return list(pool.map(lambda item: self.send_one(*item), messages))
+
+    def close(self) -> None:
+        """Close every idle connection"""
+        while True:
+            try:
+                _quit(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _quit(conn: _PooledConnection) -> None:
+    try:
+        conn.smtp.quit()
+    except (smtplib.SMTPException, OSError):
+        try:
+            conn.smtp.close()
+        except OSError:
+            pass
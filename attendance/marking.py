@@ -0,0 +1,300 @@
+"""
+Attendance marking path for burst traffic.
+
+Active sessions (coordinates, radius, roster, students already seen and the
+proxy index of IPs, devices and positions) are kept in memory so a student tap
+is answered with a single INSERT. Uniqueness is
+enforced by the database through the unique indexes on attendance_records
+(see attendance.migrations) and ``INSERT ... ON CONFLICT``; the in-memory sets only short-circuit taps that are
+certain to be rejected. With a WriteBehindQueue attached, accepted taps are
+acknowledged from the cache and written in batches instead. Each session also
+carries live counters (attendance.live) that accepted marks update in place.
+Rooms with a polygon geofence (attendance.geofence) are checked against the
+polygon instead of the radius around the teacher's position.
+"""
+
+import math
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Optional, Set, Tuple
+
+from attendance.geofence import EARTH_RADIUS_M, GeofenceIndex, RoomGeometry
+from attendance.live import SessionCounters
+from attendance.proxy import ProxyIndex
+from attendance.write_behind import WriteBehindQueue
+from utils.db_utils import ConnectionManager
+
+# How long an ended session stays cached after end(), covering the database update that follows
+TOMBSTONE_SECONDS = 60.0
+
+def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Distance in meters between two coordinates using the Haversine formula"""
+    lat1_rad = math.radians(lat1)
+    lat2_rad = math.radians(lat2)
+    delta_lat = math.radians(lat2 - lat1)
+    delta_lon = math.radians(lon2 - lon1)
+
+    a = (math.sin(delta_lat / 2) ** 2 +
+         math.cos(lat1_rad) * math.cos(lat2_rad) *
+         math.sin(delta_lon / 2) ** 2)
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+    return EARTH_RADIUS_M * c
+
+@dataclass
+class ActiveSession:
+    session_id: str
+    class_id: str
+    room: str
+    teacher_lat: float
+    teacher_lng: float
+    radius: float
+    is_active: bool = True
+    roster: Dict[str, int] = field(default_factory=dict)  # email -> student id
+    students: Set[int] = field(default_factory=set)
+    proxy: ProxyIndex = field(default_factory=lambda: ProxyIndex(0.0), repr=False)
+    counters: SessionCounters = field(default_factory=lambda: SessionCounters(0), repr=False)
+    geofence: Optional[RoomGeometry] = None  # room polygon; None keeps the radius check
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def ips(self) -> Dict[str, int]:
+        """Client ip -> student id"""
+        return self.proxy.ips
+
+class MarkingEngine:
+    """Validates taps against cached session state and records them with one write"""
+
+    def __init__(self, db: ConnectionManager, writer: Optional[WriteBehindQueue] = None,
+                 geofences: Optional[GeofenceIndex] = None, colocated_m: float = 1.0,
+                 block_colocated: bool = False, tombstone_seconds: float = TOMBSTONE_SECONDS):
+        self.db = db
+        self.writer = writer
+        self.geofences = geofences
+        self.colocated_m = colocated_m
+        self.block_colocated = block_colocated
+        self.tombstone_seconds = tombstone_seconds
+        self._sessions: Dict[str, ActiveSession] = {}
+        self._tombstones: Dict[str, float] = {}  # session id -> monotonic expiry, in end() order
+        self._lock = threading.Lock()
+
+    def register(self, session_id: str, class_id: str, room: str,
+                 teacher_lat: float, teacher_lng: float, radius: float) -> ActiveSession:
+        """Cache a session that was just created"""
+        active = ActiveSession(session_id, class_id, room, teacher_lat, teacher_lng, radius,
+                               geofence=self._room_polygon(room),
+                               proxy=ProxyIndex(teacher_lat, self.colocated_m))
+        active.roster, class_size = self._load_roster(class_id)
+        active.counters = SessionCounters(class_size)
+        with self._lock:
+            self._sessions[session_id] = active
+        return active
+
+    def get_session(self, session_id: str) -> Optional[ActiveSession]:
+        """Return the cached session, loading it (and what was already marked) on first use"""
+        active = self._sessions.get(session_id)
+        if active is not None:
+            return active
+
+        conn = self.db.connection()
+        row = conn.execute('''
+            SELECT class_id, room, teacher_lat, teacher_lng, radius, is_active
+            FROM attendance_sessions
+            WHERE id = ?
+        ''', (session_id,)).fetchone()
+        if not row:
+            return None
+
+        class_id, room, teacher_lat, teacher_lng, radius, is_active = row
+        active = ActiveSession(session_id, class_id, room, teacher_lat, teacher_lng, radius,
+                               is_active=bool(is_active), geofence=self._room_polygon(room),
+                               proxy=ProxyIndex(teacher_lat, self.colocated_m))
+        active.roster, class_size = self._load_roster(class_id)
+        present = absent = 0
+        for student_id, client_ip, device_id, lat, lng, status in conn.execute('''
+                SELECT student_id, client_ip, device_id, student_lat, student_lng, status
+                FROM attendance_records WHERE session_id = ?
+        ''', (session_id,)):
+            active.students.add(student_id)
+            active.proxy.add(student_id, client_ip, device_id, lat, lng)
+            if status == 'present':
+                present += 1
+            else:
+                absent += 1
+        active.counters = SessionCounters(class_size, present, absent, ended=not is_active)
+        if not is_active:
+            # Ended sessions are only looked up for reports; caching them would grow without bound
+            return active
+
+        with self._lock:
+            return self._sessions.setdefault(session_id, active)
+
+    def end(self, session_id: str) -> None:
+        """Stop accepting taps for a session and flush its marks.
+
+        The session stays cached as a tombstone for tombstone_seconds: a tap that races the
+        end would otherwise reload the row while it still says is_active=1 and cache a live
+        copy again. Later ends drop expired tombstones, like any other ended session.
+        """
+        active = self.get_session(session_id)
+        if active is not None:
+            with active.lock:
+                active.is_active = False
+                # Only the final counters are still needed
+                active.roster = {}
+                active.students = set()
+                active.proxy = ProxyIndex(active.teacher_lat, self.colocated_m)
+            active.counters.end()
+        now = time.monotonic()
+        with self._lock:
+            self._expire_tombstones(now)
+            if active is not None:
+                self._tombstones.pop(session_id, None)
+                self._tombstones[session_id] = now + self.tombstone_seconds
+        self.flush()
+
+    def forget(self, session_id: str) -> None:
+        """Drop an ended session from the cache so its counters are reloaded from the database"""
+        with self._lock:
+            self._tombstones.pop(session_id, None)
+            active = self._sessions.get(session_id)
+            if active is not None and not active.is_active:
+                del self._sessions[session_id]
+
+    def _expire_tombstones(self, now: float) -> None:
+        """Drop tombstones older than tombstone_seconds; the caller holds self._lock"""
+        while self._tombstones:
+            session_id, expires = next(iter(self._tombstones.items()))
+            if expires > now:
+                break
+            del self._tombstones[session_id]
+            active = self._sessions.get(session_id)
+            if active is not None and not active.is_active:
+                del self._sessions[session_id]
+
+    def flush(self) -> None:
+        """Commit any write-behind marks so that readers see them"""
+        if self.writer is not None:
+            self.writer.flush()
+
+    def counters(self, session_id: str) -> Optional[SessionCounters]:
+        """Live counters for a session, or None if it does not exist"""
+        active = self.get_session(session_id)
+        return active.counters if active is not None else None
+
+    def student_id_for_email(self, session_id: str, email: str) -> Optional[int]:
+        """Resolve a student email, using the session roster before the database"""
+        active = self.get_session(session_id)
+        if active is not None and email in active.roster:
+            return active.roster[email]
+
+        row = self.db.connection().execute('SELECT id FROM students WHERE email = ?', (email,)).fetchone()
+        return row[0] if row else None
+
+    def mark(self, session_id: str, student_id: int, student_lat: float,
+             student_lng: float, client_ip: Optional[str], device_id: Optional[str] = None) -> Dict:
+        """Validate a tap and record it"""
+        active = self.get_session(session_id)
+        if active is None:
+            return {'success': False, 'message': 'Invalid session'}
+        if not active.is_active:
+            return {'success': False, 'message': 'Session has ended'}
+
+        if active.geofence is not None:
+            # Distance is how far outside the room polygon the student is
+            distance = float(active.geofence.outside_distance(student_lat, student_lng)[0])
+            required = active.geofence.tolerance
+        else:
+            distance = haversine_distance(student_lat, student_lng, active.teacher_lat, active.teacher_lng)
+            required = active.radius
+        status = 'present' if distance <= required else 'absent'
+
+        # Positions are only compared at tap time when co-located taps are blocked
+        position = (student_lat, student_lng) if self.block_colocated else (None, None)
+        if student_id in active.students:
+            return {'success': False, 'message': 'Attendance already marked'}
+        proxy = active.proxy.check(student_id, client_ip, device_id, *position)
+        if proxy is not None:
+            return _proxy_detected(proxy)
+
+        with active.lock:
+            # Re-check under the lock so two taps on one session cannot both pass
+            if student_id in active.students:
+                return {'success': False, 'message': 'Attendance already marked'}
+            proxy = active.proxy.check(student_id, client_ip, device_id, *position)
+            if proxy is not None:
+                return _proxy_detected(proxy)
+            if not active.is_active:
+                return {'success': False, 'message': 'Session has ended'}
+
+            if self.writer is not None:
+                marked_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+                self.writer.submit((session_id, student_id, student_lat, student_lng,
+                                    distance, status, marked_at, client_ip, device_id))
+                active.students.add(student_id)
+                active.proxy.add(student_id, client_ip, device_id, student_lat, student_lng)
+                active.counters.record(status)
+                return _marked(status, distance, required)
+
+            try:
+                cursor = self.db.connection().execute('''
+                    INSERT INTO attendance_records
+                    (session_id, student_id, student_lat, student_lng, distance, status, marked_at, client_ip,
+                     device_id)
+                    VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, ?, ?)
+                    ON CONFLICT (session_id, student_id) DO NOTHING
+                ''', (session_id, student_id, student_lat, student_lng, distance, status, client_ip, device_id))
+            except sqlite3.IntegrityError as e:
+                # Another process recorded this IP or device for a different student
+                return _proxy_detected('device' if 'device_id' in str(e) else 'ip')
+            except sqlite3.OperationalError as e:
+                if 'ON CONFLICT' not in str(e):
+                    raise
+                # Schema predates the unique indexes (see attendance.migrations); rely on the cache
+                cursor = self.db.connection().execute('''
+                    INSERT INTO attendance_records
+                    (session_id, student_id, student_lat, student_lng, distance, status, marked_at, client_ip)
+                    VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, ?)
+                ''', (session_id, student_id, student_lat, student_lng, distance, status, client_ip))
+
+            active.students.add(student_id)
+            if cursor.rowcount == 0:
+                return {'success': False, 'message': 'Attendance already marked'}
+            active.proxy.add(student_id, client_ip, device_id, student_lat, student_lng)
+            active.counters.record(status)
+
+        return _marked(status, distance, required)
+
+    def _room_polygon(self, room: str) -> Optional[RoomGeometry]:
+        geometry = self.geofences.get(room) if self.geofences is not None else None
+        return geometry if geometry is not None and geometry.is_polygon else None
+
+    def _load_roster(self, class_id: str) -> Tuple[Dict[str, int], int]:
+        """Email -> student id for a class, and the class size"""
+        rows = self.db.connection().execute(
+            'SELECT email, id FROM students WHERE class_id = ?', (class_id,)).fetchall()
+        return {email: student_id for email, student_id in rows}, len(rows)
+
+def _marked(status: str, distance: float, radius: float) -> Dict:
+    return {
+        'success': True,
+        'status': status,
+        'distance': round(distance, 2),
+        'required_distance': radius,
+        'message': f'Attendance marked as {status}. Distance: {round(distance, 2)}m'
+    }
+
+_PROXY_MESSAGES = {
+    'ip': 'This IP address was already used by another student.',
+    'device': 'This device was already used by another student.',
+    'location': 'Another student already marked attendance from this spot.',
+}
+
+def _proxy_detected(reason: str = 'ip') -> Dict:
+    return {
+        'success': False,
+        'message': f'Proxy detected! {_PROXY_MESSAGES[reason]} Use your own device.'
+    }
@@ -0,0 +1,263 @@
+"""
+Versioned schema migrations for attendance.db.
+
+This is the one place the attendance schema is defined. Each migration has a
+version number and runs once, inside a BEGIN IMMEDIATE transaction that also
+bumps ``PRAGMA user_version``, so concurrent workers starting together apply it
+exactly once. Databases created by the old setup scripts (user_version 0) are
+picked up as they are: version 1 only creates the tables that are missing.
+"""
+
+import threading
+from typing import Callable, List, Optional, Sequence, Tuple, Union
+
+from utils.db_utils import ConnectionManager
+from utils.logging_utils import get_logger
+
+logger = get_logger("AttendanceMigrations")
+
+Step = Union[str, Callable]
+
+def _dedupe_attendance_records(cursor) -> None:
+    # Rows raced in before uniqueness was enforced. Nothing is lost: every row touched
+    # is copied to attendance_records_set_aside with the reason, for review.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS attendance_records_set_aside AS
+        SELECT *, '' AS reason FROM attendance_records WHERE 0
+    ''')
+    # The same student marked twice: keep the earliest mark, move the others aside
+    duplicate = '''id NOT IN (SELECT MIN(id) FROM attendance_records GROUP BY session_id, student_id)'''
+    cursor.execute(f"INSERT INTO attendance_records_set_aside SELECT *, 'duplicate mark' FROM attendance_records WHERE {duplicate}")
+    cursor.execute(f"DELETE FROM attendance_records WHERE {duplicate}")
+    moved = cursor.rowcount
+    # Different students from one IP are real marks (possibly proxies): keep them, flag
+    # them, and clear the IP so the shared-IP index can be built
+    shared_ip = '''client_ip IS NOT NULL AND id NOT IN (
+        SELECT MIN(id) FROM attendance_records WHERE client_ip IS NOT NULL GROUP BY session_id, client_ip)'''
+    cursor.execute(f"INSERT INTO attendance_records_set_aside SELECT *, 'shared ip' FROM attendance_records WHERE {shared_ip}")
+    cursor.execute(f"UPDATE attendance_records SET client_ip = NULL WHERE {shared_ip}")
+    flagged = cursor.rowcount
+    if moved or flagged:
+        logger.warning(f"Set aside {moved} duplicate attendance records and flagged {flagged} marks "
+                       f"sharing an IP (see attendance_records_set_aside) before adding unique indexes")
+
+MIGRATIONS: List[Tuple[int, str, Sequence[Step]]] = [
+    (1, "base schema", (
+        '''CREATE TABLE IF NOT EXISTS students (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            email TEXT NOT NULL,
+            roll_number TEXT UNIQUE NOT NULL,
+            class_id TEXT NOT NULL,
+            semester INTEGER NOT NULL
+        )''',
+        '''CREATE TABLE IF NOT EXISTS attendance_sessions (
+            id TEXT PRIMARY KEY,
+            class_id TEXT NOT NULL,
+            class_name TEXT NOT NULL,
+            room TEXT NOT NULL,
+            teacher_lat REAL NOT NULL,
+            teacher_lng REAL NOT NULL,
+            radius INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            ended_at TIMESTAMP,
+            is_active BOOLEAN DEFAULT 1
+        )''',
+        '''CREATE TABLE IF NOT EXISTS attendance_records (
+            id INTEGER PRIMARY KEY,
+            session_id TEXT NOT NULL,
+            student_id INTEGER NOT NULL,
+            marked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            student_lat REAL,
+            student_lng REAL,
+            distance REAL,
+            status TEXT DEFAULT 'present',
+            client_ip TEXT,
+            FOREIGN KEY (session_id) REFERENCES attendance_sessions (id),
+            FOREIGN KEY (student_id) REFERENCES students (id)
+        )''',
+        '''CREATE TABLE IF NOT EXISTS room_coordinates (
+            room_number TEXT PRIMARY KEY,
+            latitude REAL NOT NULL,
+            longitude REAL NOT NULL,
+            radius INTEGER DEFAULT 50
+        )''',
+        '''CREATE TABLE IF NOT EXISTS notice_board (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            content TEXT NOT NULL,
+            type TEXT DEFAULT 'timetable',
+            published_by TEXT NOT NULL,
+            published_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            is_active BOOLEAN DEFAULT 1,
+            timetable_data TEXT
+        )''',
+        '''CREATE TABLE IF NOT EXISTS rooms (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            room_number TEXT UNIQUE NOT NULL,
+            latitude REAL,
+            longitude REAL,
+            radius INTEGER DEFAULT 5
+        )''',
+    )),
+    (2, "attendance uniqueness", (
+        _dedupe_attendance_records,
+        # Duplicate-mark check and the per-session report lookups
+        '''CREATE UNIQUE INDEX IF NOT EXISTS ux_attendance_records_session_student
+           ON attendance_records (session_id, student_id)''',
+        # Proxy (shared IP) check
+        '''CREATE UNIQUE INDEX IF NOT EXISTS ux_attendance_records_session_ip
+           ON attendance_records (session_id, client_ip) WHERE client_ip IS NOT NULL''',
+    )),
+    (3, "lookup indexes", (
+        # Covers get_attendance_stats without touching the table
+        '''CREATE INDEX IF NOT EXISTS ix_attendance_records_session_status
+           ON attendance_records (session_id, status)''',
+        # Covers get_students_by_class, the report roster and the marking roster
+        '''CREATE INDEX IF NOT EXISTS ix_students_class
+           ON students (class_id, id, name, email, roll_number)''',
+        # Covers the email -> student id lookup
+        '''CREATE INDEX IF NOT EXISTS ix_students_email
+           ON students (email, id)''',
+        '''CREATE INDEX IF NOT EXISTS ix_notice_board_active
+           ON notice_board (is_active, published_at)''',
+    )),
+    (4, "email outbox", (
+        '''CREATE TABLE IF NOT EXISTS email_outbox (
+            id INTEGER PRIMARY KEY,
+            session_id TEXT NOT NULL,
+            recipient TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            html_body TEXT NOT NULL,
+            text_body TEXT,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL DEFAULT 0,
+            claimed_at REAL,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            sent_at TIMESTAMP,
+            UNIQUE (session_id, recipient)
+        )''',
+        '''CREATE INDEX IF NOT EXISTS ix_email_outbox_due
+           ON email_outbox (status, next_attempt_at)''',
+    )),
+    (5, "attendance aggregates", (
+        # Set once a session's marks are folded into the aggregates below
+        'ALTER TABLE attendance_sessions ADD COLUMN aggregated_at TIMESTAMP',
+        '''CREATE TABLE IF NOT EXISTS student_attendance_totals (
+            class_id TEXT NOT NULL,
+            student_id INTEGER NOT NULL,
+            sessions INTEGER NOT NULL DEFAULT 0,
+            present INTEGER NOT NULL DEFAULT 0,
+            absent INTEGER NOT NULL DEFAULT 0,
+            not_clicked INTEGER NOT NULL DEFAULT 0,
+            last_session_at TIMESTAMP,
+            PRIMARY KEY (class_id, student_id)
+        ) WITHOUT ROWID''',
+        '''CREATE INDEX IF NOT EXISTS ix_student_attendance_totals_student
+           ON student_attendance_totals (student_id)''',
+        '''CREATE TABLE IF NOT EXISTS class_daily_attendance (
+            class_id TEXT NOT NULL,
+            day TEXT NOT NULL,
+            sessions INTEGER NOT NULL DEFAULT 0,
+            present INTEGER NOT NULL DEFAULT 0,
+            absent INTEGER NOT NULL DEFAULT 0,
+            not_clicked INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (class_id, day)
+        ) WITHOUT ROWID''',
+        '''CREATE INDEX IF NOT EXISTS ix_attendance_sessions_pending
+           ON attendance_sessions (is_active, aggregated_at)''',
+    )),
+    (6, "room geofences", (
+        # JSON polygon / circle per room (see attendance.geofence)
+        '''CREATE TABLE IF NOT EXISTS room_geofences (
+            room_number TEXT PRIMARY KEY,
+            geometry TEXT NOT NULL,
+            tolerance REAL NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+    )),
+    (7, "proxy detection", (
+        # Browser-generated id sent with each tap (see attendance.proxy)
+        'ALTER TABLE attendance_records ADD COLUMN device_id TEXT',
+        # Proxy (shared device) check, like the shared IP index of v2
+        '''CREATE UNIQUE INDEX IF NOT EXISTS ux_attendance_records_session_device
+           ON attendance_records (session_id, device_id) WHERE device_id IS NOT NULL''',
+        '''CREATE TABLE IF NOT EXISTS attendance_proxy_flags (
+            session_id TEXT NOT NULL,
+            student_id INTEGER NOT NULL,
+            cluster INTEGER NOT NULL,
+            cluster_size INTEGER NOT NULL,
+            score REAL NOT NULL,
+            reasons TEXT NOT NULL,
+            flagged_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (session_id, student_id)
+        ) WITHOUT ROWID''',
+    )),
+    (8, "room registry", (
+        # rooms fed the faculty room picker and room_coordinates the radius check, and
+        # they disagreed; sessions in picker-only rooms were checked with the default
+        # 50 m radius, so that is the radius they keep
+        '''INSERT OR IGNORE INTO room_coordinates (room_number, latitude, longitude, radius)
+           SELECT room_number, latitude, longitude, 50 FROM rooms
+           WHERE latitude IS NOT NULL AND longitude IS NOT NULL''',
+        'DROP TABLE rooms',
+        # The setup scripts still read and write "rooms"
+        '''CREATE VIEW IF NOT EXISTS rooms AS
+           SELECT rowid AS id, room_number, latitude, longitude, radius FROM room_coordinates''',
+        '''CREATE TRIGGER IF NOT EXISTS rooms_insert INSTEAD OF INSERT ON rooms
+           BEGIN
+               INSERT OR REPLACE INTO room_coordinates (room_number, latitude, longitude, radius)
+               VALUES (NEW.room_number, NEW.latitude, NEW.longitude,
+                       COALESCE((SELECT radius FROM room_coordinates WHERE room_number = NEW.room_number), 50));
+           END''',
+    )),
+    (9, "room radius from setup scripts", (
+        # v8's trigger dropped the radius the setup scripts insert (5 m rooms became 50 m)
+        'DROP TRIGGER IF EXISTS rooms_insert',
+        '''CREATE TRIGGER rooms_insert INSTEAD OF INSERT ON rooms
+           BEGIN
+               INSERT OR REPLACE INTO room_coordinates (room_number, latitude, longitude, radius)
+               VALUES (NEW.room_number, NEW.latitude, NEW.longitude,
+                       COALESCE(NEW.radius,
+                                (SELECT radius FROM room_coordinates WHERE room_number = NEW.room_number),
+                                50));
+           END''',
+    )),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+_migrate_lock = threading.Lock()
+
+def schema_version(db: ConnectionManager) -> int:
+    return db.connection().execute('PRAGMA user_version').fetchone()[0]
+
+def migrate(db: ConnectionManager, target: Optional[int] = None) -> int:
+    """Apply pending migrations up to target (default: latest); returns the new version.
+
+    Up-to-date databases cost a single PRAGMA read.
+    """
+    target = LATEST_VERSION if target is None else target
+    if schema_version(db) >= target:
+        return schema_version(db)
+
+    with _migrate_lock:
+        version = schema_version(db)
+        for number, description, steps in MIGRATIONS:
+            if number <= version or number > target:
+                continue
+            with db.transaction() as cursor:
+                # Another process may have migrated while we waited for the write lock
+                cursor.execute('PRAGMA user_version')
+                if cursor.fetchone()[0] >= number:
+                    continue
+                for step in steps:
+                    if callable(step):
+                        step(cursor)
+                    else:
+                        cursor.execute(step)
+                cursor.execute(f'PRAGMA user_version = {int(number)}')
+            logger.info(f"attendance schema migrated to v{number} ({description})")
+        return schema_version(db)
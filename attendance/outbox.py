@@ -0,0 +1,190 @@
+"""
+SQLite-backed outbox for attendance notification emails.
+
+Creating a session enqueues one row per student in a single transaction and
+returns immediately. A background sender claims due rows, delivers them through
+SMTPDispatcher and records the outcome per row: sent, retried later with
+exponential backoff, or failed once ``max_attempts`` is reached. Rows survive a
+restart; a row left in 'sending' by a process that died is reclaimed once its
+lease expires.
+
+Bodies may contain ``BASE_URL`` in place of the public base URL of their links.
+The sender fills it in per session through the ``base_url`` callback, so
+enqueueing never waits for a tunnel to come up.
+"""
+
+import html
+import random
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from attendance.email_templates import build_message
+from attendance.mailer import SMTPDispatcher
+from attendance.migrations import migrate
+from utils.db_utils import ConnectionManager
+from utils.logging_utils import get_logger
+
+logger = get_logger("AttendanceOutbox")
+
+STATUSES = ('queued', 'sending', 'sent', 'failed')
+
+BASE_URL = '{base_url}'
+
+class Outbox:
+    def __init__(self, db: ConnectionManager, smtp_config: Dict, batch_size: int = 50,
+                 max_attempts: int = 5, base_backoff: float = 2.0, max_backoff: float = 300.0,
+                 poll_interval: float = 5.0, lease_seconds: float = 600.0,
+                 dispatcher: Optional[SMTPDispatcher] = None,
+                 base_url: Optional[Callable[[str], str]] = None):
+        self.db = db
+        self.base_url = base_url  # session id -> public base URL, resolved at send time
+        self.smtp_config = smtp_config
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.dispatcher = dispatcher or SMTPDispatcher(
+            smtp_config,
+            pool_size=smtp_config.get('pool_size', 4),
+            max_messages_per_connection=smtp_config.get('max_messages_per_connection', 100),
+            max_attempts=1,  # retries are scheduled by the outbox with backoff
+        )
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.ensure_schema()
+
+    def ensure_schema(self) -> None:
+        migrate(self.db)
+
+    def enqueue(self, session_id: str, messages: Iterable[Tuple[str, str, str, Optional[str]]]) -> int:
+        """Queue (recipient, subject, html_body, text_body) rows in one transaction"""
+        rows = [(session_id, recipient, subject, html_body, text_body)
+                for recipient, subject, html_body, text_body in messages]
+        with self.db.transaction() as cursor:
+            cursor.executemany('''
+                INSERT OR IGNORE INTO email_outbox (session_id, recipient, subject, html_body, text_body)
+                VALUES (?, ?, ?, ?, ?)
+            ''', rows)
+            queued = cursor.rowcount
+        self._wake.set()
+        return queued
+
+    def status(self, session_id: str) -> Dict:
+        """Per-status message counts for a session"""
+        counts = dict.fromkeys(STATUSES, 0)
+        rows = self.db.connection().execute(
+            'SELECT status, COUNT(*) FROM email_outbox WHERE session_id = ? GROUP BY status',
+            (session_id,)).fetchall()
+        counts.update(rows)
+        counts['total'] = sum(counts[s] for s in STATUSES)
+        return counts
+
+    def failures(self, session_id: str) -> List[Dict]:
+        """Recipients that could not be reached, with the last error"""
+        rows = self.db.connection().execute('''
+            SELECT recipient, attempts, last_error FROM email_outbox
+            WHERE session_id = ? AND status = 'failed'
+        ''', (session_id,)).fetchall()
+        return [{'recipient': r[0], 'attempts': r[1], 'error': r[2]} for r in rows]
+
+    def _claim(self) -> List[Tuple]:
+        now = time.time()
+        with self.db.transaction() as cursor:
+            cursor.execute('''
+                SELECT id, recipient, subject, html_body, text_body, attempts, session_id FROM email_outbox
+                WHERE (status = 'queued' AND next_attempt_at <= ?)
+                   OR (status = 'sending' AND claimed_at < ?)
+                ORDER BY id
+                LIMIT ?
+            ''', (now, now - self.lease_seconds, self.batch_size))
+            rows = cursor.fetchall()
+            if rows:
+                cursor.executemany(
+                    "UPDATE email_outbox SET status = 'sending', claimed_at = ? WHERE id = ?",
+                    [(now, row[0]) for row in rows])
+        return rows
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.max_backoff, self.base_backoff * (2 ** (attempts - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    def drain_once(self) -> int:
+        """Claim and deliver one batch; returns the number of rows processed"""
+        rows = self._claim()
+        if not rows:
+            return 0
+
+        # Waits for the tunnel here, in the sender, once per session in the batch
+        urls = {sid: self.base_url(sid) for sid in {row[6] for row in rows}} if self.base_url else {}
+        messages = [(row[1], self._build_message(*row[1:5], base_url=urls.get(row[6]))) for row in rows]
+        results = self.dispatcher.send(messages)
+
+        now = time.time()
+        sent, retry, failed = [], [], []
+        for row, result in zip(rows, results):
+            attempts = row[5] + 1
+            if result.success:
+                sent.append((attempts, row[0]))
+            elif attempts >= self.max_attempts:
+                failed.append((attempts, result.error, row[0]))
+            else:
+                retry.append((attempts, now + self._backoff(attempts), result.error, row[0]))
+
+        with self.db.transaction() as cursor:
+            cursor.executemany('''
+                UPDATE email_outbox SET status = 'sent', attempts = ?, sent_at = CURRENT_TIMESTAMP,
+                                        last_error = NULL, claimed_at = NULL
+                WHERE id = ?
+            ''', sent)
+            cursor.executemany('''
+                UPDATE email_outbox SET status = 'queued', attempts = ?, next_attempt_at = ?,
+                                        last_error = ?, claimed_at = NULL
+                WHERE id = ?
+            ''', retry)
+            cursor.executemany('''
+                UPDATE email_outbox SET status = 'failed', attempts = ?, last_error = ?, claimed_at = NULL
+                WHERE id = ?
+            ''', failed)
+
+        if retry or failed:
+            logger.warning(f"Outbox batch: {len(sent)} sent, {len(retry)} to retry, {len(failed)} failed")
+        return len(rows)
+
+    def _build_message(self, recipient: str, subject: str, html_body: str, text_body: Optional[str],
+                       base_url: Optional[str] = None) -> bytes:
+        if base_url is not None:
+            html_body = html_body.replace(BASE_URL, html.escape(base_url))
+            text_body = text_body.replace(BASE_URL, base_url) if text_body is not None else None
+        return build_message(self.smtp_config['email'], recipient, subject, html_body, text_body)
+
+    def start(self) -> None:
+        """Start the background sender if it is not already running"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="attendance-outbox", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.dispatcher.close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                processed = self.drain_once()
+            except Exception as e:
+                logger.error(f"Outbox drain failed: {e}")
+                processed = 0
+            if not processed:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
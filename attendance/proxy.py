@@ -0,0 +1,177 @@
+"""
+Proxy detection for attendance taps.
+
+Each active session keeps a ProxyIndex of the client IPs, device ids and
+coordinate cells already used, each mapped to the student who used it, so a tap
+is checked with a handful of dict lookups. A reused IP or device id is rejected
+outright; a tap landing in or next to a cell another student already tapped
+from is only rejected when blocking co-located taps is switched on, since
+students sitting side by side are normal.
+
+When a session ends, ``flag_session`` clusters its marks (students within
+``cluster_m`` of each other) and scores every clustered mark on several
+signals. Marks scoring at least ``threshold`` are written to
+``attendance_proxy_flags`` for the faculty to review; nothing is rejected
+after the fact.
+"""
+
+import json
+import math
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from attendance.geofence import EARTH_RADIUS_M
+from utils.db_utils import ConnectionManager
+
+_M_PER_DEG = math.pi / 180 * EARTH_RADIUS_M
+
+# Score added by each signal; a clustered mark is flagged at the threshold. At the default
+# 0.8 only a shared GPS fix gets there: neighbours tapping together (colocated + burst) do not
+SIGNAL_WEIGHTS = {
+    'colocated': 0.4,   # within cluster_m of another student's mark
+    'same_spot': 0.4,   # practically the same GPS fix as another student
+    'burst': 0.2,       # marked within burst_s seconds of one of those students
+}
+SAME_SPOT_M = 0.2
+
+class ProxyIndex:
+    """What a session's accepted taps have used so far, keyed to the student"""
+
+    def __init__(self, lat0: float, cell_m: float = 1.0):
+        self.cell_m = cell_m
+        self.ips: Dict[str, int] = {}       # client ip -> student id
+        self.devices: Dict[str, int] = {}   # device id -> student id
+        self.cells: Dict[Tuple[int, int], int] = {}  # coordinate cell -> first student id
+        self._kx = _M_PER_DEG * math.cos(math.radians(lat0))
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return math.floor(lng * self._kx / self.cell_m), math.floor(lat * _M_PER_DEG / self.cell_m)
+
+    def check(self, student_id: int, client_ip: Optional[str], device_id: Optional[str],
+              lat: Optional[float] = None, lng: Optional[float] = None) -> Optional[str]:
+        """'ip', 'device' or 'location' if another student already used it, else None.
+
+        The location check only runs when coordinates are given.
+        """
+        if client_ip is not None and self.ips.get(client_ip, student_id) != student_id:
+            return 'ip'
+        if device_id is not None and self.devices.get(device_id, student_id) != student_id:
+            return 'device'
+        if lat is not None and lng is not None:
+            cx, cy = self._cell(lat, lng)
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    if self.cells.get((cx + dx, cy + dy), student_id) != student_id:
+                        return 'location'
+        return None
+
+    def add(self, student_id: int, client_ip: Optional[str], device_id: Optional[str],
+            lat: Optional[float], lng: Optional[float]) -> None:
+        if client_ip is not None:
+            self.ips.setdefault(client_ip, student_id)
+        if device_id is not None:
+            self.devices.setdefault(device_id, student_id)
+        if lat is not None and lng is not None:
+            self.cells.setdefault(self._cell(lat, lng), student_id)
+
+def _neighbours(points: List[Tuple[float, float]], cluster_m: float) -> List[List[Tuple[int, float]]]:
+    """(index, metres) of every other point within cluster_m, found through a grid of cluster_m cells"""
+    grid = defaultdict(list)
+    for i, (x, y) in enumerate(points):
+        grid[(math.floor(x / cluster_m), math.floor(y / cluster_m))].append(i)
+    near: List[List[Tuple[int, float]]] = [[] for _ in points]
+    for (cx, cy), members in grid.items():
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for j in grid.get((cx + dx, cy + dy), ()):
+                    for i in members:
+                        if i < j:
+                            d = math.hypot(points[i][0] - points[j][0], points[i][1] - points[j][1])
+                            if d <= cluster_m:
+                                near[i].append((j, d))
+                                near[j].append((i, d))
+    return near
+
+def _clusters(near: List[List[Tuple[int, float]]]) -> List[int]:
+    """Cluster label per point: neighbours (transitively) share one"""
+    parent = list(range(len(near)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, others in enumerate(near):
+        for j, _ in others:
+            parent[find(i)] = find(j)
+    return [find(i) for i in range(len(near))]
+
+def flag_session(db: ConnectionManager, session_id: str, cluster_m: float = 1.0,
+                 burst_s: float = 20.0, threshold: float = 0.8) -> List[Dict]:
+    """Score the co-located marks of a session and store the flagged ones (replacing earlier flags)"""
+    with db.transaction() as cursor:
+        rows = cursor.execute('''
+            SELECT student_id, student_lat, student_lng, CAST(strftime('%s', marked_at) AS INTEGER)
+            FROM attendance_records
+            WHERE session_id = ? AND student_lat IS NOT NULL AND student_lng IS NOT NULL
+            ORDER BY id
+        ''', (session_id,)).fetchall()
+        cursor.execute('DELETE FROM attendance_proxy_flags WHERE session_id = ?', (session_id,))
+        if len(rows) < 2:
+            return []
+
+        kx = _M_PER_DEG * math.cos(math.radians(rows[0][1]))
+        near = _neighbours([(lng * kx, lat * _M_PER_DEG) for _, lat, lng, _ in rows], cluster_m)
+        labels = _clusters(near)
+        clusters = defaultdict(list)
+        for i, label in enumerate(labels):
+            clusters[label].append(rows[i][0])
+
+        flags = []
+        for i, others in enumerate(near):
+            if not others:
+                continue
+            reasons = ['colocated']
+            if any(d <= SAME_SPOT_M for _, d in others):
+                reasons.append('same_spot')
+            marked = rows[i][3]
+            if marked is not None and any(
+                    rows[j][3] is not None and abs(marked - rows[j][3]) <= burst_s for j, _ in others):
+                reasons.append('burst')
+            score = round(sum(SIGNAL_WEIGHTS[r] for r in reasons), 2)
+            if score >= threshold:
+                members = clusters[labels[i]]
+                flags.append({
+                    'student_id': rows[i][0],
+                    'cluster': min(members),
+                    'cluster_size': len(members),
+                    'score': score,
+                    'reasons': reasons
+                })
+
+        cursor.executemany('''
+            INSERT INTO attendance_proxy_flags (session_id, student_id, cluster, cluster_size, score, reasons)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [(session_id, f['student_id'], f['cluster'], f['cluster_size'], f['score'], json.dumps(f['reasons']))
+              for f in flags])
+    return sorted(flags, key=lambda f: (f['cluster'], f['student_id']))
+
+def session_flags(db: ConnectionManager, session_id: str) -> List[Dict]:
+    """Stored flags of a session with the students' names, grouped by cluster"""
+    rows = db.connection().execute('''
+        SELECT f.student_id, s.name, s.roll_number, f.cluster, f.cluster_size, f.score, f.reasons
+        FROM attendance_proxy_flags f
+        LEFT JOIN students s ON s.id = f.student_id
+        WHERE f.session_id = ?
+        ORDER BY f.cluster, f.student_id
+    ''', (session_id,)).fetchall()
+    return [{
+        'student_id': row[0],
+        'name': row[1],
+        'roll_number': row[2],
+        'cluster': row[3],
+        'cluster_size': row[4],
+        'score': row[5],
+        'reasons': json.loads(row[6])
+    } for row in rows]
@@ -0,0 +1,300 @@
+"""
+Attendance report exports: CSV, XLSX and PDF from one engine.
+
+Report rows come from a single roster/records LEFT JOIN, in student id order,
+read straight off the cursor. CSV is streamed to the client as rows arrive; XLSX
+is written by openpyxl in write-only mode. The PDF student list is laid out as
+page-sized tables, each styled with one list built alongside its rows
+(consecutive rows with the same status share one background command). Exports of ended sessions only change when an audit recheck
+rewrites their marks, so they are written once to ``cache_dir`` and served from
+disk until ``invalidate`` drops them.
+"""
+
+import csv
+import io
+import os
+import tempfile
+from dataclasses import dataclass, field
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from utils.db_utils import ConnectionManager
+from utils.logging_utils import get_logger
+
+logger = get_logger("AttendanceReports")
+
+REPORT_CACHE_DIR = os.path.join("outputs", "reports")
+
+REPORT_FORMATS = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'pdf': 'application/pdf',
+}
+
+COLUMNS = ('Name', 'Roll Number', 'Email', 'Status', 'Marked At', 'Distance (m)')
+
+PDF_TABLE_ROWS = 40
+
+STATUS_LABELS = {'present': 'Present', 'absent': 'Absent', 'not-clicked': 'Not Clicked'}
+
+HITK_LOGO_URL = 'https://lh3.googleusercontent.com/d/1LBhx-x_Si1-cmGqsRAVmheoz0tXvJ3UN'
+TIMELY_LOGO_URL = 'https://lh3.googleusercontent.com/d/16SCBMg4I5snTZjuQ1XrsfDPkRMvPfwGs'
+
+@dataclass
+class ReportSession:
+    session_id: str
+    class_name: str
+    room: str
+    created_at: str
+    class_id: str
+    is_active: bool
+
+@dataclass
+class ReportSummary:
+    counts: Dict[str, int] = field(default_factory=lambda: dict.fromkeys(STATUS_LABELS, 0))
+
+    def add(self, status: str) -> None:
+        self.counts[status] = self.counts.get(status, 0) + 1
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def rows(self) -> List[Tuple[str, int]]:
+        return [('Total Students', self.total)] + [(STATUS_LABELS[s], self.counts[s]) for s in STATUS_LABELS]
+
+# name, roll number, email, status, marked at, distance
+ReportRow = Tuple[str, str, str, str, Optional[str], Optional[float]]
+
+class ReportEngine:
+    def __init__(self, db: ConnectionManager, cache_dir: str = REPORT_CACHE_DIR):
+        self.db = db
+        self.cache_dir = os.path.abspath(cache_dir)
+
+    def session(self, session_id: str) -> Optional[ReportSession]:
+        row = self.db.connection().execute('''
+            SELECT class_name, room, created_at, class_id, is_active
+            FROM attendance_sessions WHERE id = ?
+        ''', (session_id,)).fetchone()
+        if not row:
+            return None
+        return ReportSession(session_id, row[0], row[1], row[2], row[3], bool(row[4]))
+
+    def rows(self, report: ReportSession, summary: Optional[ReportSummary] = None) -> Iterator[ReportRow]:
+        """Every student in the class with their mark, if any"""
+        cursor = self.db.connection().execute('''
+            SELECT s.name, s.roll_number, s.email, COALESCE(r.status, 'not-clicked'), r.marked_at, r.distance
+            FROM students s
+            LEFT JOIN attendance_records r ON r.session_id = ? AND r.student_id = s.id
+            WHERE s.class_id = ?
+            ORDER BY s.id
+        ''', (report.session_id, report.class_id))
+        try:
+            for row in cursor:
+                if summary is not None:
+                    summary.add(row[3])
+                yield row
+        finally:
+            cursor.close()
+
+    # ---- cache ----
+
+    def cached(self, report: ReportSession, fmt: str) -> Optional[str]:
+        """Path of the export on disk for an ended session (written on first use), else None"""
+        if report.is_active:
+            return None
+        path = os.path.join(self.cache_dir, f"{report.session_id}.{fmt}")
+        if os.path.exists(path):
+            return path
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=f".{fmt}.tmp")
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                self.write(report, fmt, out)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        logger.info(f"Cached {fmt} report for session {report.session_id}")
+        return path
+
+    def invalidate(self, session_id: str) -> None:
+        """Delete the cached exports of a session whose marks were rewritten"""
+        for fmt in REPORT_FORMATS:
+            try:
+                os.unlink(os.path.join(self.cache_dir, f"{session_id}.{fmt}"))
+            except FileNotFoundError:
+                pass
+
+    # ---- writers ----
+
+    def write(self, report: ReportSession, fmt: str, out: BinaryIO) -> None:
+        if fmt == 'csv':
+            for chunk in self.csv_stream(report):
+                out.write(chunk)
+        elif fmt == 'xlsx':
+            self.write_xlsx(report, out)
+        elif fmt == 'pdf':
+            self.write_pdf(report, out)
+        else:
+            raise ValueError(f"Unknown report format: {fmt}")
+
+    def csv_stream(self, report: ReportSession, chunk_rows: int = 500) -> Iterator[bytes]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(COLUMNS)
+        for i, (name, roll, email, status, marked_at, distance) in enumerate(self.rows(report), 1):
+            writer.writerow((name, roll, email, STATUS_LABELS.get(status, status), marked_at or '',
+                             '' if distance is None else round(distance, 2)))
+            if i % chunk_rows == 0:
+                yield buffer.getvalue().encode('utf-8')
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue().encode('utf-8')
+
+    def write_xlsx(self, report: ReportSession, out: BinaryIO) -> None:
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font
+
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet('Attendance')
+        for letter, width in zip('ABCDEF', (28, 14, 36, 12, 20, 12)):
+            sheet.column_dimensions[letter].width = width
+
+        bold = Font(bold=True)
+        def header(ws, values):
+            cells = []
+            for value in values:
+                cell = WriteOnlyCell(ws, value=value)
+                cell.font = bold
+                cells.append(cell)
+            return cells
+
+        sheet.append(header(sheet, COLUMNS))
+        summary = ReportSummary()
+        for name, roll, email, status, marked_at, distance in self.rows(report, summary):
+            sheet.append((name, roll, email, STATUS_LABELS.get(status, status), marked_at,
+                          None if distance is None else round(distance, 2)))
+
+        info = workbook.create_sheet('Summary')
+        info.column_dimensions['A'].width = 18
+        info.column_dimensions['B'].width = 36
+        for label, value in (('Class', report.class_name), ('Room', report.room), ('Date', report.created_at)):
+            info.append(header(info, [label]) + [value])
+        info.append(())
+        for label, value in summary.rows():
+            info.append(header(info, [label]) + [value])
+        workbook.save(out)
+
+    def write_pdf(self, report: ReportSession, out: BinaryIO) -> None:
+        from reportlab.lib import colors
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+        from reportlab.lib.units import inch
+        from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+        doc = SimpleDocTemplate(out, pagesize=A4, topMargin=0.5*inch)
+        styles = getSampleStyleSheet()
+        story = []
+
+        # Header with logos
+        banner = '<b>Heritage Institute of Technology</b><br/>Attendance Management System<br/>Powered by Timely™'
+        hitk_logo, timely_logo = _logo(HITK_LOGO_URL), _logo(TIMELY_LOGO_URL)
+        if hitk_logo and timely_logo:
+            logo_table = Table([[
+                Image(io.BytesIO(hitk_logo), width=1*inch, height=1*inch),
+                Paragraph(banner, ParagraphStyle('LogoText', parent=styles['Normal'], fontSize=12, alignment=1)),
+                Image(io.BytesIO(timely_logo), width=1*inch, height=1*inch),
+            ]], colWidths=[1.5*inch, 4*inch, 1.5*inch])
+            logo_table.setStyle(TableStyle([
+                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+                ('BOTTOMPADDING', (0, 0), (-1, -1), 20)
+            ]))
+            story.append(logo_table)
+        else:
+            story.append(Paragraph(banner, ParagraphStyle('Header', parent=styles['Normal'], fontSize=14,
+                                                          alignment=1, spaceAfter=20)))
+
+        story.append(Paragraph('Attendance Report', ParagraphStyle('CustomTitle', parent=styles['Heading1'],
+                                                                   fontSize=18, spaceAfter=20, alignment=1)))
+        info_style = ParagraphStyle('Info', parent=styles['Normal'], fontSize=12, spaceAfter=10)
+        story.append(Paragraph(f'<b>Class:</b> {report.class_name}', info_style))
+        story.append(Paragraph(f'<b>Room:</b> {report.room}', info_style))
+        story.append(Paragraph(f'<b>Date:</b> {report.created_at}', info_style))
+        story.append(Spacer(1, 20))
+
+        status_colours = {'present': colors.lightgreen, 'absent': colors.lightcoral}
+        base_style = [
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ]
+
+        def status_table(rows, statuses, header):
+            # One style list per table; runs of the same status share a command
+            first = 1 if header else 0
+            style = list(base_style) if header else [
+                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                ('BACKGROUND', (0, 0), (-1, -1), colors.beige),
+                ('GRID', (0, 0), (-1, -1), 1, colors.black)
+            ]
+            start = 0
+            for i in range(1, len(statuses) + 1):
+                if i == len(statuses) or statuses[i] != statuses[start]:
+                    style.append(('BACKGROUND', (3, start + first), (3, i - 1 + first),
+                                  status_colours.get(statuses[start], colors.lightyellow)))
+                    start = i
+            if header:
+                rows = [['Name', 'Roll Number', 'Email', 'Status', 'Time']] + rows
+            table = Table(rows, colWidths=[2*inch, 1*inch, 2.5*inch, 1*inch, 1.5*inch])
+            table.setStyle(TableStyle(style))
+            return table
+
+        # Consecutive fixed-size tables read as one; a single long table is re-measured
+        # from the split point at every page break, which is quadratic in class size
+        summary = ReportSummary()
+        rows, statuses, tables = [], [], 0
+        for name, roll, email, status, marked_at, _ in self.rows(report, summary):
+            rows.append([name, roll, email, STATUS_LABELS.get(status, status), marked_at or 'N/A'])
+            statuses.append(status)
+            if len(rows) == PDF_TABLE_ROWS:
+                story.append(status_table(rows, statuses, header=not tables))
+                rows, statuses, tables = [], [], tables + 1
+        if rows or not tables:
+            story.append(status_table(rows, statuses, header=not tables))
+        story.append(Spacer(1, 20))
+
+        summary_table = Table([[label, str(value)] for label, value in summary.rows()],
+                              colWidths=[2*inch, 1*inch])
+        summary_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, -1), colors.lightblue),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ]))
+        story.append(Paragraph('<b>Summary</b>', styles['Heading2']))
+        story.append(summary_table)
+
+        doc.build(story)
+
+_logos: Dict[str, Optional[bytes]] = {}
+
+def _logo(url: str) -> Optional[bytes]:
+    """Logo image bytes, fetched once per process; None if unavailable"""
+    if url not in _logos:
+        try:
+            import requests
+            response = requests.get(url, timeout=5)
+            response.raise_for_status()
+            _logos[url] = response.content
+        except Exception as e:
+            logger.warning(f"Report logo unavailable, using text header: {e}")
+            _logos[url] = None
+    return _logos[url]
@@ -0,0 +1,74 @@
+"""
+Room registry: every room's coordinates and radius, held in memory.
+
+room_coordinates is the single room table (migration 8 folded the faculty
+picker's old ``rooms`` table into it and left a view of that name for the setup
+scripts). The registry reads it once at startup, so the room picker and session
+creation are dictionary lookups; only ``save`` writes, and it refreshes the map.
+"""
+
+from typing import Dict, List, NamedTuple, Optional
+
+from utils.db_utils import ConnectionManager
+
+class Room(NamedTuple):
+    room: str
+    lat: float
+    lng: float
+    radius: float
+
+class RoomRegistry:
+    def __init__(self, db: ConnectionManager):
+        self.db = db
+        self.version = 0  # bumped on every change, e.g. to revalidate cached room lists
+        self._rooms: Dict[str, Room] = {}
+        self._names: List[str] = []
+        self.reload()
+
+    def reload(self) -> None:
+        """Re-read room_coordinates (startup, and after this process changes it)"""
+        rooms = {row[0]: Room(*row) for row in self.db.connection().execute(
+            'SELECT room_number, latitude, longitude, radius FROM room_coordinates')}
+        # Swap both at once; readers never lock
+        self._rooms, self._names = rooms, sorted(rooms)
+        self.version += 1
+
+    def seed(self, rooms: Dict[str, Dict]) -> int:
+        """Register configured rooms ({room: {'lat', 'lng', 'radius'}}) that are missing; returns how many"""
+        missing = [(room, coords['lat'], coords['lng'], coords['radius'])
+                   for room, coords in rooms.items() if room not in self._rooms]
+        if missing:
+            with self.db.transaction() as cursor:
+                cursor.executemany('''
+                    INSERT OR IGNORE INTO room_coordinates (room_number, latitude, longitude, radius)
+                    VALUES (?, ?, ?, ?)
+                ''', missing)
+            self.reload()
+        return len(missing)
+
+    def save(self, room: str, lat: float, lng: float, radius: float) -> Room:
+        """Add or move a room"""
+        with self.db.transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO room_coordinates (room_number, latitude, longitude, radius)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (room_number) DO UPDATE SET
+                    latitude = excluded.latitude, longitude = excluded.longitude, radius = excluded.radius
+            ''', (room, lat, lng, radius))
+        self.reload()
+        return self._rooms[room]
+
+    def get(self, room: str) -> Optional[Room]:
+        return self._rooms.get(room)
+
+    def names(self) -> List[str]:
+        return list(self._names)
+
+    def __iter__(self):
+        return iter(list(self._rooms.values()))
+
+    def __contains__(self, room: str) -> bool:
+        return room in self._rooms
+
+    def __len__(self) -> int:
+        return len(self._rooms)
@@ -0,0 +1,109 @@
+"""
+Write-behind queue for attendance records.
+
+Marks validated by the MarkingEngine are acknowledged straight away and written
+by a background thread in ``executemany`` batches, every ``flush_interval_ms``
+or as soon as ``batch_size`` rows are waiting. At most ``max_unflushed`` rows
+are ever acknowledged but not yet committed: a submit that would exceed the
+window flushes inline first. The queue is flushed when a session ends, before
+statistics are read, and at interpreter shutdown, so only a hard crash can lose
+rows and never more than that window.
+"""
+
+import atexit
+import threading
+import time
+from typing import List, Tuple
+
+from utils.db_utils import ConnectionManager
+from utils.logging_utils import get_logger
+
+logger = get_logger("AttendanceWriteBehind")
+
+INSERT_RECORD = '''
+    INSERT OR IGNORE INTO attendance_records
+    (session_id, student_id, student_lat, student_lng, distance, status, marked_at, client_ip, device_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+class WriteBehindQueue:
+    def __init__(self, db: ConnectionManager, flush_interval_ms: int = 50,
+                 batch_size: int = 200, max_unflushed: int = 1000):
+        self.db = db
+        self.flush_interval_ms = flush_interval_ms
+        self.batch_size = batch_size
+        self.max_unflushed = max(max_unflushed, 1)
+        self._pending: List[Tuple] = []
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="attendance-write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    @property
+    def unflushed(self) -> int:
+        """Rows acknowledged but not yet committed"""
+        with self._cond:
+            return len(self._pending) + self._in_flight
+
+    def submit(self, row: Tuple) -> None:
+        """Queue one attendance_records row (columns as in INSERT_RECORD)"""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Write-behind queue is closed")
+            window_full = len(self._pending) + self._in_flight >= self.max_unflushed
+        if window_full:
+            self.flush()
+        with self._cond:
+            self._pending.append(row)
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+
+    def flush(self) -> int:
+        """Commit everything queued so far; returns the number of rows written"""
+        with self._flush_lock:
+            with self._cond:
+                batch, self._pending = self._pending, []
+                self._in_flight = len(batch)
+            if not batch:
+                return 0
+            try:
+                with self.db.transaction() as cursor:
+                    cursor.executemany(INSERT_RECORD, batch)
+                    written = cursor.rowcount
+            except BaseException:
+                with self._cond:
+                    self._pending[:0] = batch
+                    self._in_flight = 0
+                raise
+            with self._cond:
+                self._in_flight = 0
+            if written < len(batch):
+                # Only possible if another process marked the same student or IP first
+                logger.warning(f"{len(batch) - written} acknowledged attendance rows conflicted and were dropped")
+            return written
+
+    def close(self) -> None:
+        """Stop the writer thread and flush what is left"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        self.flush()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed or len(self._pending) >= self.batch_size,
+                                    timeout=self.flush_interval_ms / 1000)
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Attendance flush failed, will retry: {e}")
+                time.sleep(self.flush_interval_ms / 1000)
@@ -1,92 +1,129 @@
-import sqlite3
-import smtplib
 import uuid
-import math
 from datetime import datetime
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from typing import List, Dict, Tuple, Optional
-from config.email_config import get_room_coordinates, get_attendance_settings, EMAIL_TEMPLATES
+from config.email_config import get_room_coordinates, get_room_geofences, get_attendance_settings, get_email_config, EMAIL_TEMPLATES
+from utils.db_utils import get_db
+from attendance.marking import MarkingEngine, haversine_distance
+from attendance.write_behind import WriteBehindQueue
+from attendance.mailer import SMTPDispatcher
+from attendance.outbox import BASE_URL, Outbox
+from attendance.email_templates import attendance_renderer
+from attendance.migrations import migrate
+from attendance.aggregates import AttendanceAggregates
+from attendance.geofence import RoomGeometry, load_geofences, save_geofence
+from attendance.rooms import Room, RoomRegistry
+from attendance import audit
+from attendance.proxy import flag_session, session_flags
+from attendance.reports import ReportEngine
 
 class LocationBasedAttendanceSystem:
-    def __init__(self, db_path: str = "attendance.db"):
+    def __init__(self, db_path: str = "attendance.db", write_behind: Optional[bool] = None):
         self.db_path = db_path
+        self.db = get_db(db_path)
+        settings = get_attendance_settings()
+        if write_behind is None:
+            write_behind = settings['write_behind']
+        writer = None
+        if write_behind:
+            writer = WriteBehindQueue(
+                self.db,
+                flush_interval_ms=settings['write_behind_flush_ms'],
+                batch_size=settings['write_behind_batch_size'],
+                max_unflushed=settings['write_behind_max_unflushed'],
+            )
+        self.outbox: Optional[Outbox] = None
+        self._tunnel_leases: Dict = {}
+        self.geofence_tolerance = settings['geofence_tolerance']
+        self.settings = settings
+        migrate(self.db)
+        self.aggregates = AttendanceAggregates(self.db, settings['defaulter_threshold'])
+        self.aggregates.backfill()
+        self.rooms = RoomRegistry(self.db)
         self.init_room_coordinates()
+        self.geofences = load_geofences(self.db, rooms=self.rooms)
+        self.marking = MarkingEngine(self.db, writer, self.geofences,
+                                     colocated_m=settings['proxy_colocated_m'],
+                                     block_colocated=settings['proxy_block_colocated'])
+        self.reports = ReportEngine(self.db)
     
     def init_room_coordinates(self):
-        """Initialize room coordinates in the database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Create room_coordinates table if not exists
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS room_coordinates (
-                room_number TEXT PRIMARY KEY,
-                latitude REAL NOT NULL,
-                longitude REAL NOT NULL,
-                radius INTEGER DEFAULT 50
-            )
-        ''')
-        
-        # Insert room coordinates from configuration
-        room_coords = get_room_coordinates()
-        sample_rooms = [
-            (room, coords['lat'], coords['lng'], coords['radius'])
-            for room, coords in room_coords.items()
+        """Register configured rooms and geofences that the database does not have yet"""
+        self.rooms.seed(get_room_coordinates())
+        # Configured geofences; corrections saved later through set_room_geofence win
+        geofences = [
+            RoomGeometry.from_json(room, data, data.get('tolerance', self.geofence_tolerance))
+            for room, data in get_room_geofences().items()
         ]
-        
-        cursor.executemany('''
-            INSERT OR IGNORE INTO room_coordinates (room_number, latitude, longitude, radius)
-            VALUES (?, ?, ?, ?)
-        ''', sample_rooms)
-        
-        conn.commit()
-        conn.close()
+        if not geofences:
+            return
+        with self.db.transaction() as cursor:
+            cursor.executemany('''
+                INSERT OR IGNORE INTO room_geofences (room_number, geometry, tolerance)
+                VALUES (?, ?, ?)
+            ''', [(g.room, g.to_json(), g.tolerance) for g in geofences])
+    
+    def save_room(self, room: str, lat: float, lng: float, radius: Optional[float] = None) -> Room:
+        """Add or move a room; applies to sessions created afterwards"""
+        existing = self.rooms.get(room)
+        if radius is None:
+            radius = existing.radius if existing else self.settings['default_radius']
+        if not self.settings['min_radius'] <= radius <= self.settings['max_radius']:
+            raise ValueError(f"radius must be between {self.settings['min_radius']} and {self.settings['max_radius']} m")
+        saved = self.rooms.save(room, lat, lng, radius)
+        current = self.geofences.get(room)
+        if current is None or (existing and current == RoomGeometry.circle(room, *existing[1:])):
+            # No geofence of its own: the radius circle is the room's geofence
+            self.geofences.update(RoomGeometry.circle(room, lat, lng, radius))
+        return saved
+    
+    def set_room_geofence(self, room: str, data: Dict) -> RoomGeometry:
+        """Save a room's polygon, rectangle or circle; applies to sessions created afterwards"""
+        geometry = RoomGeometry.from_json(room, data, data.get('tolerance', self.geofence_tolerance))
+        save_geofence(self.db, geometry)
+        self.geofences.update(geometry)
+        return geometry
+    
+    def recheck_attendance(self, session_id: str = None, day: str = None, apply: bool = False) -> List[Dict]:
+        """Re-verify stored marks against the current geofences (one session or one day)"""
+        self.marking.flush()
+        results = audit.recheck(self.db, self.geofences, session_id=session_id, day=day,
+                                apply=apply, aggregates=self.aggregates)
+        for result in results:
+            if result['applied']:
+                # Cached exports and the final counters still show the old statuses
+                self.reports.invalidate(result['session_id'])
+                self.marking.forget(result['session_id'])
+        return results
+    
+    def get_proxy_flags(self, session_id: str) -> List[Dict]:
+        """Marks flagged as likely proxies when the session ended"""
+        return session_flags(self.db, session_id)
     
     def calculate_distance(self, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
         """Calculate distance between two coordinates using Haversine formula"""
-        R = 6371000  # Earth's radius in meters
-        
-        lat1_rad = math.radians(lat1)
-        lat2_rad = math.radians(lat2)
-        delta_lat = math.radians(lat2 - lat1)
-        delta_lon = math.radians(lon2 - lon1)
-        
-        a = (math.sin(delta_lat / 2) ** 2 + 
-             math.cos(lat1_rad) * math.cos(lat2_rad) * 
-             math.sin(delta_lon / 2) ** 2)
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-        
-        return R * c
+        return haversine_distance(lat1, lon1, lat2, lon2)
     
     def create_attendance_session(self, class_id: str, class_name: str, room: str, 
                                 teacher_lat: float, teacher_lng: float) -> str:
         """Create a new attendance session"""
         session_id = str(uuid.uuid4())
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        registered = self.rooms.get(room)
+        radius = registered.radius if registered else self.settings['default_radius']
         
-        # Get room radius
-        cursor.execute('SELECT radius FROM room_coordinates WHERE room_number = ?', (room,))
-        result = cursor.fetchone()
-        radius = result[0] if result else 50  # Default 50m radius
-        
-        cursor.execute('''
-            INSERT INTO attendance_sessions 
-            (id, class_id, class_name, room, teacher_lat, teacher_lng, radius)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (session_id, class_id, class_name, room, teacher_lat, teacher_lng, radius))
-        
-        conn.commit()
-        conn.close()
+        with self.db.transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO attendance_sessions 
+                (id, class_id, class_name, room, teacher_lat, teacher_lng, radius)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (session_id, class_id, class_name, room, teacher_lat, teacher_lng, radius))
         
+        self.marking.register(session_id, class_id, room, teacher_lat, teacher_lng, radius)
         return session_id
     
     def get_students_by_class(self, class_id: str) -> List[Dict]:
         """Get all students for a specific class"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self.db.connection().cursor()
         
         cursor.execute('''
             SELECT id, name, email, roll_number 
@@ -103,127 +140,77 @@ class LocationBasedAttendanceSystem:
                 'roll_number': row[3]
             })
         
-        conn.close()
+        cursor.close()
         return students
     
+    def _acquire_tunnel(self, session_id: str):
+        """Hold the shared public tunnel for this session; it starts in the background"""
+        from ngrok_manager import attendance_tunnel
+        print("🚀 Starting ngrok tunnel for attendance session...")
+        def forget():
+            # The hold expired (or was released): sessions that are never ended must not pile up
+            if self._tunnel_leases.get(session_id) is lease:
+                self._tunnel_leases.pop(session_id, None)
+        
+        lease = attendance_tunnel.acquire(on_release=forget)
+        self._tunnel_leases[session_id] = lease
+        return lease
+    
+    def _public_base_url(self, lease) -> str:
+        """Wait for the tunnel started by _acquire_tunnel and return its URL"""
+        base_url = lease.url()
+        
+        if not lease.is_public:
+            print("⚠️ Ngrok failed, using localhost - emails will contain local URLs")
+        else:
+            print(f"✅ Ngrok tunnel active: {base_url} (held for this session for 5 minutes)")
+        return base_url
+    
+    def _session_base_url(self, session_id: str) -> str:
+        """Base URL for a session's queued emails; the outbox sender calls this at send time"""
+        lease = self._tunnel_leases.get(session_id)
+        if lease is None:
+            # Queued before a restart, or the session's hold has ended: no tunnel is held for it
+            from ngrok_manager import attendance_tunnel
+            return attendance_tunnel.fallback_url
+        return self._public_base_url(lease)
+    
+    def _attendance_url(self, base_url: str, session_id: str, email: str) -> str:
+        """Per-student link; the email parameter identifies the student"""
+        return f"{base_url}/mark-attendance/{session_id}?email={email}"
+    
     def send_attendance_emails(self, students: List[Dict], session_id: str, 
                              class_name: str, room: str, smtp_config: Dict) -> int:
-        """Send attendance notification emails to students"""
+        """Send attendance notification emails to students and wait for delivery"""
         try:
             print(f"Connecting to SMTP server: {smtp_config['smtp_server']}:{smtp_config['smtp_port']}")
-            server = smtplib.SMTP(smtp_config['smtp_server'], smtp_config['smtp_port'])
-            server.starttls()
-            print(f"Logging in with email: {smtp_config['email']}")
-            server.login(smtp_config['email'], smtp_config['password'])
-            print("SMTP login successful")
-            
-            emails_sent = 0
-            # Start ngrok tunnel for this attendance session
-            from ngrok_manager import start_ngrok_for_attendance
-            print("🚀 Starting ngrok tunnel for attendance session...")
-            base_url = start_ngrok_for_attendance()
+            lease = self._acquire_tunnel(session_id)
+            renderer = attendance_renderer(smtp_config['email'], class_name, room,
+                                           include_text=smtp_config.get('plain_text_alternative', True))
+            base_url = self._public_base_url(lease)
             
-            if "localhost" in base_url:
-                print("⚠️ Ngrok failed, using localhost - emails will contain local URLs")
-            else:
-                print(f"✅ Ngrok tunnel active: {base_url} (will auto-close in 5 minutes)")
+            messages = [
+                (student['email'], renderer.render(
+                    student['email'],
+                    student_name=student['name'],
+                    attendance_url=self._attendance_url(base_url, session_id, student['email']),
+                ))
+                for student in students
+            ]
             
-            attendance_url = f"{base_url}/mark-attendance/{session_id}"
-            
-            for student in students:
-                subject = f"Attendance Required - {class_name}"
-                # Add email parameter to URL for student identification
-                student_url = f"{attendance_url}?email={student['email']}"
-                
-                # Create HTML email template
-                body = f"""
-<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="UTF-8">
-    <style>
-        body {{ font-family: Arial, sans-serif; margin: 0; padding: 20px; background: #f5f5f5; }}
-        .container {{ max-width: 600px; margin: 0 auto; background: white; border-radius: 10px; overflow: hidden; box-shadow: 0 4px 15px rgba(0,0,0,0.1); }}
-        .header {{ background: linear-gradient(135deg, #667eea, #764ba2); padding: 30px; text-align: center; color: white; }}
-        .logo {{ display: flex; align-items: center; justify-content: center; gap: 15px; margin-bottom: 15px; }}
-        .logo img {{ height: 50px; }}
-        .content {{ padding: 30px; }}
-        .attendance-card {{ background: #f8f9ff; border-left: 4px solid #667eea; padding: 20px; margin: 20px 0; border-radius: 8px; }}
-        .btn {{ display: inline-block; background: linear-gradient(135deg, #38a169, #2f855a); color: white; padding: 15px 30px; text-decoration: none; border-radius: 25px; font-weight: bold; margin: 20px 0; }}
-        .footer {{ background: #f7fafc; padding: 20px; text-align: center; color: #718096; font-size: 12px; }}
-        .warning {{ background: #fff5f5; border: 1px solid #feb2b2; color: #742a2a; padding: 15px; border-radius: 8px; margin: 15px 0; }}
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <div class="logo">
-                <img src="https://lh3.googleusercontent.com/d/1LBhx-x_Si1-cmGqsRAVmheoz0tXvJ3UN" alt="HITK Logo">
-                <div>
-                    <h1 style="margin: 0; font-size: 24px;">Timely™</h1>
-                    <p style="margin: 5px 0 0 0; opacity: 0.9;">Smart Attendance System</p>
-                </div>
-                <img src="https://lh3.googleusercontent.com/d/1HfdfTfJKHXAsXbk06AroA-BLn8VcnqhA" alt="Timely Logo">
-            </div>
-        </div>
-        
-        <div class="content">
-            <h2 style="color: #2d3748; margin-bottom: 10px;">📍 Attendance Required</h2>
-            <p>Dear <strong>{student['name']}</strong>,</p>
+            with SMTPDispatcher(
+                smtp_config,
+                pool_size=smtp_config.get('pool_size', 4),
+                max_messages_per_connection=smtp_config.get('max_messages_per_connection', 100),
+            ) as dispatcher:
+                results = dispatcher.send(messages)
             
-            <div class="attendance-card">
-                <h3 style="margin: 0 0 10px 0; color: #4a5568;">📚 {class_name}</h3>
-                <p style="margin: 5px 0;"><strong>🏫 Location:</strong> {room}</p>
-                <p style="margin: 5px 0;"><strong>⏰ Session:</strong> Active now (expires in 5 minutes)</p>
-            </div>
-            
-            <p>Your attendance is required for the above class session. Please mark your attendance by clicking the button below:</p>
-            
-            <div style="text-align: center;">
-                <a href="{student_url}" class="btn">📱 Mark My Attendance</a>
-            </div>
-            
-            <div class="warning">
-                <strong>⚠️ CRITICAL - READ CAREFULLY:</strong>
-                <ul style="margin: 10px 0; padding-left: 20px;">
-                    <li><strong>🚨 DISCONNECT FROM WIFI - Use Mobile Data Only</strong></li>
-                    <li>Multiple students on same WiFi will be flagged as proxy</li>
-                    <li>You must be physically present in the classroom</li>
-                    <li>Location verification is automatic</li>
-                    <li>Session expires in 5 minutes</li>
-                    <li>Enable location services on your device</li>
-                </ul>
-            </div>
-            
-            <p style="color: #718096; font-size: 14px; margin-top: 20px;">
-                If you're having trouble with the button, copy and paste this link:<br>
-                <span style="background: #f7fafc; padding: 5px; border-radius: 4px; word-break: break-all;">{student_url}</span>
-            </p>
-        </div>
-        
-        <div class="footer">
-            <p><strong>Heritage Institute of Technology, Kolkata</strong></p>
-            <p>Automated by Timely™ Smart Attendance System</p>
-            <p style="margin-top: 10px;">This is an automated message. Please do not reply to this email.</p>
-        </div>
-    </div>
-</body>
-</html>
-"""
-                
-                msg = MIMEMultipart()
-                msg['From'] = smtp_config['email']
-                msg['To'] = student['email']
-                msg['Subject'] = subject
-                
-                msg.attach(MIMEText(body, 'html'))
-                print(f"Sending email to: {student['email']}")
-                server.send_message(msg)
-                emails_sent += 1
-                print(f"Email sent successfully to: {student['email']}")
-            
-            server.quit()
-            return emails_sent
+            for result in results:
+                if result.success:
+                    print(f"Email sent successfully to: {result.recipient}")
+                else:
+                    print(f"Failed to send email to {result.recipient}: {result.error}")
+            return sum(1 for result in results if result.success)
             
         except Exception as e:
             print(f"Error sending emails: {e}")
@@ -231,46 +218,41 @@ class LocationBasedAttendanceSystem:
             traceback.print_exc()
             return 0
     
+    def get_outbox(self, smtp_config: Optional[Dict] = None) -> Outbox:
+        """Return the email outbox, creating it on first use and starting its sender"""
+        if self.outbox is None:
+            self.outbox = Outbox(self.db, smtp_config or get_email_config(), base_url=self._session_base_url)
+        self.outbox.start()
+        return self.outbox
+    
+    def queue_attendance_emails(self, students: List[Dict], session_id: str,
+                                class_name: str, room: str, smtp_config: Dict) -> int:
+        """Queue attendance emails in the outbox and return without waiting for delivery or the tunnel"""
+        # The tunnel starts in the background; the sender fills in its URL when it sends
+        self._acquire_tunnel(session_id)
+        renderer = attendance_renderer(smtp_config['email'], class_name, room,
+                                       include_text=smtp_config.get('plain_text_alternative', True))
+        messages = []
+        for student in students:
+            fields = {
+                'student_name': student['name'],
+                'attendance_url': self._attendance_url(BASE_URL, session_id, student['email']),
+            }
+            messages.append((student['email'], renderer.subject,
+                             renderer.render_html(**fields), renderer.render_text(**fields)))
+        
+        return self.get_outbox(smtp_config).enqueue(session_id, messages)
+    
+    def get_email_status(self, session_id: str) -> Dict:
+        """Queued, sending, sent and failed email counts for a session"""
+        if self.outbox is None:
+            self.outbox = Outbox(self.db, get_email_config(), base_url=self._session_base_url)
+        return self.outbox.status(session_id)
+    
     def mark_attendance(self, session_id: str, student_id: int, 
-                       student_lat: float, student_lng: float, client_ip: str = None) -> Dict:
+                       student_lat: float, student_lng: float, client_ip: str = None,
+                       device_id: str = None) -> Dict:
         """Mark attendance for a student with location verification"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Get session details
-        cursor.execute('''
-            SELECT teacher_lat, teacher_lng, radius, is_active, room
-            FROM attendance_sessions 
-            WHERE id = ?
-        ''', (session_id,))
-        
-        session = cursor.fetchone()
-        if not session:
-            conn.close()
-            return {'success': False, 'message': 'Invalid session'}
-        
-        teacher_lat, teacher_lng, radius, is_active, room = session
-        
-        if not is_active:
-            conn.close()
-            return {'success': False, 'message': 'Session has ended'}
-        
-        # Calculate distance
-        distance = self.calculate_distance(student_lat, student_lng, teacher_lat, teacher_lng)
-        
-        # Check if student is within range
-        status = 'present' if distance <= radius else 'absent'
-        
-        # Check if already marked by this specific student
-        cursor.execute('''
-            SELECT id FROM attendance_records 
-            WHERE session_id = ? AND student_id = ?
-        ''', (session_id, student_id))
-        
-        if cursor.fetchone():
-            conn.close()
-            return {'success': False, 'message': 'Attendance already marked'}
-        
         # Use provided client_ip or get from Flask request
         if not client_ip:
             from flask import request as flask_request
@@ -278,74 +260,41 @@ class LocationBasedAttendanceSystem:
             if ',' in client_ip:
                 client_ip = client_ip.split(',')[0].strip()
         
-        # Check for IP proxy detection
-        cursor.execute('''
-            SELECT student_id FROM attendance_records 
-            WHERE session_id = ? AND client_ip = ?
-        ''', (session_id, client_ip))
-        
-        existing_ip = cursor.fetchone()
-        if existing_ip and existing_ip[0] != student_id:
-            conn.close()
-            return {
-                'success': False, 
-                'message': f'Proxy detected! This IP address was already used by another student. Use your own device.'
-            }
-        
-        # Insert attendance record with IP tracking
-        cursor.execute('''
-            INSERT INTO attendance_records 
-            (session_id, student_id, student_lat, student_lng, distance, status, marked_at, client_ip)
-            VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, ?)
-        ''', (session_id, student_id, student_lat, student_lng, distance, status, client_ip))
-        
-        conn.commit()
-        conn.close()
-        
-        return {
-            'success': True,
-            'status': status,
-            'distance': round(distance, 2),
-            'required_distance': radius,
-            'message': f'Attendance marked as {status}. Distance: {round(distance, 2)}m'
-        }
+        return self.marking.mark(session_id, student_id, student_lat, student_lng, client_ip, device_id)
     
     def get_attendance_stats(self, session_id: str) -> Dict:
         """Get attendance statistics for a session"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT 
-                COUNT(*) as total_marked,
-                SUM(CASE WHEN status = 'present' THEN 1 ELSE 0 END) as present,
-                SUM(CASE WHEN status = 'absent' THEN 1 ELSE 0 END) as absent
-            FROM attendance_records 
-            WHERE session_id = ?
-        ''', (session_id,))
-        
-        stats = cursor.fetchone()
-        conn.close()
+        # Maintained by the marking path (attendance.live); no aggregate query
+        counters = self.marking.counters(session_id)
+        snapshot = counters.snapshot() if counters is not None else {'present': 0, 'absent': 0}
         
         return {
-            'total_marked': stats[0],
-            'present': stats[1],
-            'absent': stats[2]
+            'total_marked': snapshot['present'] + snapshot['absent'],
+            'present': snapshot['present'],
+            'absent': snapshot['absent']
         }
     
     def end_session(self, session_id: str) -> bool:
         """End an attendance session"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            UPDATE attendance_sessions 
-            SET is_active = 0, ended_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        ''', (session_id,))
-        
-        success = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
+        self.marking.end(session_id)
+        lease = self._tunnel_leases.pop(session_id, None)
+        if lease is not None:
+            lease.release()
+        with self.db.transaction() as cursor:
+            cursor.execute('''
+                UPDATE attendance_sessions 
+                SET is_active = 0, ended_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (session_id,))
+            
+            success = cursor.rowcount > 0
+            if success:
+                # Count the session in the per-student and per-day aggregates
+                self.aggregates.apply_session(session_id)
+                # Batch proxy pass over the final marks; flags are for review only
+                flag_session(self.db, session_id,
+                             cluster_m=self.settings['proxy_colocated_m'],
+                             burst_s=self.settings['proxy_burst_seconds'],
+                             threshold=self.settings['proxy_flag_score'])
         
         return success
\ No newline at end of file
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Semester attendance query benchmark.
+
+Seeds --sessions ended sessions spread over --classes classes of --class-size
+students, folds them into the aggregate tables, then times the same questions
+two ways:
+  scan        - join every session of the class with the roster and records
+  aggregates  - read student_attendance_totals / class_daily_attendance
+
+Usage:
+    python benchmarks/bench_attendance_aggregates.py --sessions 100000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from attendance.aggregates import AttendanceAggregates
+from attendance.migrations import migrate
+from utils.db_utils import ConnectionManager
+
+SCAN_PERCENTAGES = '''
+    SELECT s.id, COUNT(a.id), SUM(r.status = 'present')
+    FROM students s
+    JOIN attendance_sessions a ON a.class_id = s.class_id AND a.is_active = 0
+    LEFT JOIN attendance_records r ON r.session_id = a.id AND r.student_id = s.id
+    WHERE s.class_id = ?
+    GROUP BY s.id
+'''
+
+SCAN_DEFAULTERS = SCAN_PERCENTAGES + ' HAVING SUM(r.status = \'present\') * 100.0 < 75 * COUNT(a.id)'
+
+SCAN_STUDENT = '''
+    SELECT a.class_id, COUNT(a.id), SUM(r.status = 'present')
+    FROM students s
+    JOIN attendance_sessions a ON a.class_id = s.class_id AND a.is_active = 0
+    LEFT JOIN attendance_records r ON r.session_id = a.id AND r.student_id = s.id
+    WHERE s.id = ?
+    GROUP BY a.class_id
+'''
+
+SCAN_TREND = '''
+    SELECT date(a.created_at, 'localtime'), COUNT(DISTINCT a.id), SUM(r.status = 'present')
+    FROM attendance_sessions a
+    LEFT JOIN attendance_records r ON r.session_id = a.id
+    WHERE a.class_id = ? AND a.is_active = 0
+    GROUP BY 1
+'''
+
+def seed(db, args):
+    rng = random.Random(5)
+    students = args.classes * args.class_size
+    with db.transaction() as cursor:
+        cursor.executemany(
+            'INSERT INTO students (id, name, email, roll_number, class_id, semester) VALUES (?, ?, ?, ?, ?, 3)',
+            ((i, f'Student {i}', f'student{i}@heritageit.edu.in', f'R{i:06d}', f'class-{i % args.classes}')
+             for i in range(students)))
+        cursor.executemany(
+            'INSERT INTO attendance_sessions (id, class_id, class_name, room, teacher_lat, teacher_lng, radius, '
+            "created_at, is_active) VALUES (?, ?, 'Class', '303', 22.5, 88.4, 50, datetime('2026-01-05', ?), 0)",
+            ((f's{n}', f'class-{n % args.classes}', f'+{n // (args.classes * 4)} days')
+             for n in range(args.sessions)))
+
+        # Each student has a personal attendance rate so that some of them are defaulters
+        rate = [rng.uniform(0.5, 1.0) for _ in range(students)]
+        def records():
+            for n in range(args.sessions):
+                class_index = n % args.classes
+                for k in range(args.class_size):
+                    student_id = class_index + k * args.classes
+                    roll = rng.random()
+                    if roll < rate[student_id]:
+                        yield (f's{n}', student_id, 'present', f'10.{n % 250}.{k}.{n % 200}')
+                    elif roll < rate[student_id] + 0.1:
+                        yield (f's{n}', student_id, 'absent', f'10.{n % 250}.{k}.{n % 200}')
+        cursor.executemany('INSERT INTO attendance_records (session_id, student_id, status, client_ip) '
+                           'VALUES (?, ?, ?, ?)', records())
+
+def timed(label, fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f'  {label:<12} {elapsed * 1e3:10.2f} ms   {len(result)} rows')
+    return elapsed
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--sessions', type=int, default=100000)
+    ap.add_argument('--classes', type=int, default=250)
+    ap.add_argument('--class-size', type=int, default=40)
+    ap.add_argument('--repeat', type=int, default=5)
+    args = ap.parse_args()
+
+    db = ConnectionManager(os.path.join(tempfile.mkdtemp(prefix='bench_aggregates_'), 'attendance.db'))
+    migrate(db)
+    start = time.perf_counter()
+    seed(db, args)
+    records = db.connection().execute('SELECT COUNT(*) FROM attendance_records').fetchone()[0]
+    print(f'{args.sessions:,} sessions, {records:,} records, {args.classes} classes of {args.class_size} '
+          f'(seeded in {time.perf_counter() - start:.1f} s)')
+
+    aggregates = AttendanceAggregates(db)
+    start = time.perf_counter()
+    aggregates.backfill()
+    elapsed = time.perf_counter() - start
+    print(f'folded all sessions in {elapsed:.1f} s ({elapsed / args.sessions * 1e3:.2f} ms per session end)')
+
+    conn = db.connection()
+    class_id, student_id = 'class-7', 7
+    questions = [
+        ('class percentages', lambda: conn.execute(SCAN_PERCENTAGES, (class_id,)).fetchall(),
+         lambda: aggregates.class_percentages(class_id)),
+        ('defaulters', lambda: conn.execute(SCAN_DEFAULTERS, (class_id,)).fetchall(),
+         lambda: aggregates.defaulters(class_id)),
+        ('one student', lambda: conn.execute(SCAN_STUDENT, (student_id,)).fetchall(),
+         lambda: aggregates.student(student_id)),
+        ('daily trend', lambda: conn.execute(SCAN_TREND, (class_id,)).fetchall(),
+         lambda: aggregates.trend(class_id)),
+    ]
+    for name, scan, materialized in questions:
+        print(name)
+        slow = timed('scan', scan, args.repeat)
+        fast = timed('aggregates', materialized, args.repeat)
+        print(f'  {"speedup":<12} {slow / fast:10.0f}x')
+    db.close_all()
+
+if __name__ == '__main__':
+    main()
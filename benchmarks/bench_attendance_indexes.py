@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Attendance schema index benchmark.
+
+Builds an attendance.db at schema v1 (tables only, as the old setup scripts
+left it) with --sessions x --class-size attendance records, then times the hot
+queries and prints their query plans before and after attendance.migrations
+brings the copy up to the latest version.
+
+Usage:
+    python benchmarks/bench_attendance_indexes.py --sessions 5000 --class-size 200
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from attendance.migrations import LATEST_VERSION, migrate
+from utils.db_utils import ConnectionManager
+
+QUERIES = [
+    ('duplicate check',
+     'SELECT 1 FROM attendance_records WHERE session_id = ? AND student_id = ?',
+     lambda p: (p.session(), p.student())),
+    ('proxy ip check',
+     'SELECT student_id FROM attendance_records WHERE session_id = ? AND client_ip = ?',
+     lambda p: (p.session(), p.ip())),
+    ('session stats',
+     '''SELECT COUNT(*), SUM(CASE WHEN status = 'present' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN status = 'absent' THEN 1 ELSE 0 END)
+        FROM attendance_records WHERE session_id = ?''',
+     lambda p: (p.session(),)),
+    ('report records',
+     'SELECT student_id, status, marked_at, distance FROM attendance_records WHERE session_id = ?',
+     lambda p: (p.session(),)),
+    ('students by class',
+     'SELECT id, name, email, roll_number FROM students WHERE class_id = ?',
+     lambda p: (p.class_id(),)),
+    ('email lookup',
+     'SELECT id FROM students WHERE email = ?',
+     lambda p: (p.email(),)),
+]
+
+class Params:
+    def __init__(self, args, seed=7):
+        self.args = args
+        self.rng = random.Random(seed)
+
+    def session(self):
+        return f'session-{self.rng.randrange(self.args.sessions)}'
+
+    def student(self):
+        return self.rng.randrange(self.args.students) + 1
+
+    def ip(self):
+        return f'10.{self.rng.randrange(256)}.{self.rng.randrange(256)}.{self.rng.randrange(256)}'
+
+    def class_id(self):
+        return f'class-{self.rng.randrange(self.args.students // self.args.class_size)}'
+
+    def email(self):
+        return f'student{self.student()}@heritageit.edu.in'
+
+def build(path, args):
+    db = ConnectionManager(path)
+    migrate(db, target=1)
+    classes = args.students // args.class_size
+    rng = random.Random(1)
+    with db.transaction() as cursor:
+        cursor.executemany(
+            'INSERT INTO students (id, name, email, roll_number, class_id, semester) VALUES (?, ?, ?, ?, ?, 3)',
+            ((i, f'Student {i}', f'student{i}@heritageit.edu.in', f'R{i:06d}', f'class-{(i - 1) % classes}')
+             for i in range(1, args.students + 1)))
+        cursor.executemany(
+            'INSERT INTO attendance_sessions (id, class_id, class_name, room, teacher_lat, teacher_lng, radius) '
+            "VALUES (?, ?, 'Class', 'Room 303', 22.5184833, 88.4168668, 50)",
+            ((f'session-{s}', f'class-{s % classes}') for s in range(args.sessions)))
+
+        def records():
+            for s in range(args.sessions):
+                class_index = s % classes
+                for k in range(args.class_size):
+                    student_id = class_index + 1 + k * classes
+                    yield (f'session-{s}', student_id, 22.5184833, 88.4168668, rng.uniform(0, 80),
+                           'present' if rng.random() < 0.8 else 'absent',
+                           f'10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(256)}')
+        cursor.executemany(
+            'INSERT INTO attendance_records (session_id, student_id, student_lat, student_lng, distance, status, client_ip) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)', records())
+    return db
+
+def run(db, args, label):
+    conn = db.connection()
+    print(f'\n{label}')
+    timings = {}
+    for name, sql, make in QUERIES:
+        plan = ' | '.join(row[-1] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, make(Params(args))))
+        params = Params(args)
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            conn.execute(sql, make(params)).fetchall()
+        timings[name] = (time.perf_counter() - start) / args.repeat
+        print(f'  {name:<18} {timings[name] * 1e3:9.3f} ms   {plan}')
+    return timings
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--sessions', type=int, default=5000)
+    ap.add_argument('--class-size', type=int, default=200)
+    ap.add_argument('--students', type=int, default=50000)
+    ap.add_argument('--repeat', type=int, default=20, help='executions per query')
+    ap.add_argument('--workdir', help='where to build the databases (default: a temp dir)')
+    args = ap.parse_args()
+    args.students = max(args.students - args.students % args.class_size, args.class_size)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='bench_indexes_')
+    os.makedirs(workdir, exist_ok=True)
+    before_path = os.path.join(workdir, 'before.db')
+    after_path = os.path.join(workdir, 'after.db')
+    for path in (before_path, after_path):
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    start = time.perf_counter()
+    before = build(before_path, args)
+    records = before.connection().execute('SELECT COUNT(*) FROM attendance_records').fetchone()[0]
+    print(f'{records:,} attendance records, {args.students:,} students '
+          f'(built in {time.perf_counter() - start:.1f} s, {workdir})')
+    slow = run(before, args, 'schema v1 (no indexes)')
+
+    dest = sqlite3.connect(after_path)
+    before.connection().backup(dest)
+    dest.close()
+    before.close_all()
+
+    after = ConnectionManager(after_path)
+    start = time.perf_counter()
+    migrate(after)
+    print(f'\nmigrated copy to v{LATEST_VERSION} in {time.perf_counter() - start:.1f} s')
+    fast = run(after, args, f'schema v{LATEST_VERSION}')
+    after.close_all()
+
+    print('\nspeedup')
+    for name, _, _ in QUERIES:
+        print(f'  {name:<18} {slow[name] / fast[name]:9.0f}x')
+
+if __name__ == '__main__':
+    main()
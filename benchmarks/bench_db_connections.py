@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Concurrent request benchmark for the attendance database connection layer.
+
+Compares the old pattern (a fresh sqlite3.connect plus pragmas per request) with
+the shared per-thread ConnectionManager in utils/db_utils.py. Each simulated
+request does what a typical route does: read the latest notices, look a student
+up by email and, for a share of requests, write one attendance record.
+
+Usage:
+    python benchmarks/bench_db_connections.py --threads 16 --requests 4000
+"""
+
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.db_utils import ConnectionManager
+
+def seed(db_path, students):
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.executescript('''
+        CREATE TABLE students (id INTEGER PRIMARY KEY, name TEXT, email TEXT, class_id TEXT);
+        CREATE TABLE notice_board (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT, content TEXT,
+                                   published_by TEXT, published_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                                   type TEXT, is_active BOOLEAN DEFAULT 1);
+        CREATE TABLE attendance_records (id INTEGER PRIMARY KEY, session_id TEXT, student_id INTEGER,
+                                         status TEXT, marked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+    ''')
+    conn.executemany('INSERT INTO students VALUES (?, ?, ?, ?)',
+                     [(i, f'Student {i}', f's{i}@example.edu', 'cse-cse-b') for i in range(students)])
+    conn.executemany('INSERT INTO notice_board (title, content, published_by, type) VALUES (?, ?, ?, ?)',
+                     [(f'Notice {i}', 'Body', 'HOD', 'timetable') for i in range(50)])
+    conn.commit()
+    conn.close()
+
+def request_fresh(db_path, i, write):
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute('PRAGMA journal_mode=WAL')
+    cursor = conn.cursor()
+    cursor.execute('SELECT title, content, published_by, published_at, type FROM notice_board '
+                   'WHERE is_active = 1 ORDER BY published_at DESC LIMIT 10')
+    cursor.fetchall()
+    cursor.execute('SELECT id FROM students WHERE email = ?', (f's{i}@example.edu',))
+    cursor.fetchone()
+    if write:
+        cursor.execute('INSERT INTO attendance_records (session_id, student_id, status) VALUES (?, ?, ?)',
+                       ('bench', i, 'present'))
+        conn.commit()
+    conn.close()
+
+def request_pooled(manager, i, write):
+    conn = manager.connection()
+    conn.execute('SELECT title, content, published_by, published_at, type FROM notice_board '
+                 'WHERE is_active = 1 ORDER BY published_at DESC LIMIT 10').fetchall()
+    conn.execute('SELECT id FROM students WHERE email = ?', (f's{i}@example.edu',)).fetchone()
+    if write:
+        with manager.transaction() as cursor:
+            cursor.execute('INSERT INTO attendance_records (session_id, student_id, status) VALUES (?, ?, ?)',
+                           ('bench', i, 'present'))
+
+def run(label, fn, threads, requests, write_every, students):
+    latencies = []
+    errors = 0
+
+    def one(i):
+        start = time.perf_counter()
+        fn(i % students, i % write_every == 0)
+        return time.perf_counter() - start
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for fut in [pool.submit(one, i) for i in range(requests)]:
+            try:
+                latencies.append(fut.result())
+            except sqlite3.Error:
+                errors += 1
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000 if latencies else 0.0
+    print(f"{label:<8} {requests / elapsed:>10.0f} req/s   p50 {p(0.50):6.2f} ms   "
+          f"p95 {p(0.95):6.2f} ms   p99 {p(0.99):6.2f} ms   mean {statistics.fmean(latencies) * 1000 if latencies else 0:6.2f} ms   "
+          f"errors {errors}")
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--threads', type=int, default=16)
+    ap.add_argument('--requests', type=int, default=4000)
+    ap.add_argument('--students', type=int, default=2000)
+    ap.add_argument('--write-every', type=int, default=4, help='one request in N writes a record')
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'attendance.db')
+        seed(db_path, args.students)
+        print(f"{args.threads} threads, {args.requests} requests, 1 write per {args.write_every} requests")
+
+        run('fresh', lambda i, w: request_fresh(db_path, i, w),
+            args.threads, args.requests, args.write_every, args.students)
+
+        manager = ConnectionManager(db_path)
+        run('pooled', lambda i, w: request_pooled(manager, i, w),
+            args.threads, args.requests, args.write_every, args.students)
+        manager.close_all()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Attendance email rendering benchmark.
+
+Renders N ready-to-send messages for one session two ways:
+  legacy    - str.format of the full HTML body plus a fresh MIMEMultipart per
+              student, flattened to bytes (what send_message does)
+  compiled  - attendance_renderer: template compiled once per session, shared
+              headers pre-encoded, per-student substitution only
+
+Usage:
+    python benchmarks/bench_email_render.py --messages 10000
+"""
+
+import argparse
+import os
+import sys
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from attendance.email_templates import attendance_renderer
+from config.email_config import EMAIL_TEMPLATES
+
+SENDER = 'sync.timely@gmail.com'
+CLASS_NAME = 'CSE Semester 3 - Section B'
+ROOM = 'Room 303'
+BASE_URL = 'https://example.ngrok-free.app/mark-attendance/5f0c2d0e'
+
+def students(n):
+    return [(f'Student {i}', f'student{i}@heritageit.edu.in') for i in range(n)]
+
+def legacy(people, include_text):
+    template = EMAIL_TEMPLATES['attendance_notification']
+    out = []
+    for name, address in people:
+        url = f'{BASE_URL}?email={address}'
+        body = template['html'].format(student_name=name, attendance_url=url, class_name=CLASS_NAME, room=ROOM)
+        msg = MIMEMultipart('alternative' if include_text else 'mixed')
+        msg['From'] = SENDER
+        msg['To'] = address
+        msg['Subject'] = f'Attendance Required - {CLASS_NAME}'
+        if include_text:
+            msg.attach(MIMEText(template['body'].format(student_name=name, attendance_url=url,
+                                                        class_name=CLASS_NAME, room=ROOM, duration=5), 'plain'))
+        msg.attach(MIMEText(body, 'html'))
+        out.append(msg.as_bytes())
+    return out
+
+def compiled(people, include_text):
+    renderer = attendance_renderer(SENDER, CLASS_NAME, ROOM, include_text=include_text)
+    return [renderer.render(address, student_name=name, attendance_url=f'{BASE_URL}?email={address}')
+            for name, address in people]
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--messages', type=int, default=10000)
+    ap.add_argument('--html-only', action='store_true', help='skip the text/plain alternative')
+    args = ap.parse_args()
+
+    people = students(args.messages)
+    include_text = not args.html_only
+    print(f"{args.messages} messages, {'HTML only' if args.html_only else 'text + HTML'}")
+    for label, fn in (('legacy', legacy), ('compiled', compiled)):
+        start = time.perf_counter()
+        messages = fn(people, include_text)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<9} {len(messages) / elapsed:10,.0f} msg/s   {elapsed:6.2f} s   "
+              f"{elapsed / len(messages) * 1e6:7.1f} us/msg   avg {sum(map(len, messages)) // len(messages)} bytes")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Geofence verification benchmark.
+
+Generates --rooms rectangular rooms on a campus grid and --points student
+positions scattered around them, then times:
+  verify   - one room polygon against every point: a per-point Python loop
+             (the shape of the old one-tap-at-a-time check) vs one NumPy call
+  locate   - which room each point falls in: testing every room vs the grid index
+
+Usage:
+    python benchmarks/bench_geofence.py --points 100000 --rooms 200
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from attendance.geofence import GeofenceIndex, RoomGeometry
+
+LAT, LNG = 22.5184833, 88.4168668
+ROOM_DEG = 0.0001  # about 11 m x 10 m
+
+def point_in_polygon(lat, lng, polygon):
+    """Scalar ray casting on raw degrees, one point at a time"""
+    inside = False
+    j = len(polygon) - 1
+    for i in range(len(polygon)):
+        (lat_i, lng_i), (lat_j, lng_j) = polygon[i], polygon[j]
+        if (lat_i > lat) != (lat_j > lat) and lng < (lng_j - lng_i) * (lat - lat_i) / (lat_j - lat_i) + lng_i:
+            inside = not inside
+        j = i
+    return inside
+
+def make_rooms(count):
+    side = math.ceil(math.sqrt(count))
+    return [RoomGeometry.rectangle(f'R{n}', LAT + (n // side) * ROOM_DEG, LNG + (n % side) * ROOM_DEG,
+                                   LAT + (n // side + 1) * ROOM_DEG, LNG + (n % side + 1) * ROOM_DEG, tolerance=1)
+            for n in range(count)], side
+
+def timed(label, fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f'  {label:<12} {elapsed * 1e3:10.2f} ms')
+    return elapsed, result
+
+def brute_force_locate(rooms, lats, lngs):
+    best = np.full(len(lats), np.inf)
+    found = np.full(len(lats), -1)
+    for k, room in enumerate(rooms):
+        outside = room.outside_distance(lats, lngs)
+        hit = (outside <= room.tolerance) & (outside < best)
+        best = np.where(hit, outside, best)
+        found = np.where(hit, k, found)
+    return [rooms[k].room if k >= 0 else None for k in found]
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--points', type=int, default=100000)
+    ap.add_argument('--rooms', type=int, default=200)
+    ap.add_argument('--repeat', type=int, default=3)
+    args = ap.parse_args()
+
+    rooms, side = make_rooms(args.rooms)
+    rng = np.random.default_rng(7)
+    lats = LAT + rng.uniform(-0.5, side + 0.5, args.points) * ROOM_DEG
+    lngs = LNG + rng.uniform(-0.5, side + 0.5, args.points) * ROOM_DEG
+    print(f'{args.points:,} points, {args.rooms} rooms')
+
+    room = rooms[len(rooms) // 2]
+    print('verify (one room)')
+    slow, loop = timed('loop', lambda: [point_in_polygon(a, b, room.polygon) for a, b in zip(lats, lngs)],
+                       args.repeat)
+    fast, batch = timed('numpy', lambda: room.outside_distance(lats, lngs) == 0, args.repeat)
+    assert list(batch) == loop
+    print(f'  {"speedup":<12} {slow / fast:10.0f}x')
+
+    print('locate (all rooms)')
+    sample = min(args.points, 10000)
+    slow, every = timed('every room', lambda: brute_force_locate(rooms, lats[:sample], lngs[:sample]), args.repeat)
+    index = GeofenceIndex(rooms)
+    fast, indexed = timed('grid index', lambda: index.locate(lats[:sample], lngs[:sample]), args.repeat)
+    assert every == indexed
+    print(f'  {"speedup":<12} {slow / fast:10.0f}x   ({sample:,} points)')
+
+if __name__ == '__main__':
+    main()
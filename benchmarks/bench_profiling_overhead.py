@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Cost of the @profiled hooks.
+
+Times --calls calls of a small function three ways:
+  plain     - undecorated
+  disabled  - @profiled, profiling off (every production call)
+  profiled  - @profiled inside profiling.requested(), one profile per call
+and runs one Routine5 generation of a seeded department with and without
+profiling, writing the profile to a scratch directory.
+
+Usage:
+    python benchmarks/bench_profiling_overhead.py --calls 200000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Routine5_lab_advanced.engine import GenerationOptions, generate
+from tests.test_routine5_engine import _seed_department
+from utils import profiling
+
+def work(n):
+    return n + 1
+
+wrapped = profiling.profiled('bench.work')(work)
+
+def per_call(fn, calls):
+    start = time.perf_counter()
+    for n in range(calls):
+        fn(n)
+    return (time.perf_counter() - start) / calls
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--calls', type=int, default=200000)
+    args = ap.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_profiling_')
+    profiling.PROFILE_DIR = os.path.join(workdir, 'profiles')
+    plain = per_call(work, args.calls)
+    disabled = per_call(wrapped, args.calls)
+    print(f'  {"plain":<10} {plain * 1e9:8.0f} ns/call')
+    print(f'  {"disabled":<10} {disabled * 1e9:8.0f} ns/call   (+{(disabled - plain) * 1e9:.0f} ns)')
+    with profiling.requested('bench'):
+        profiled = per_call(wrapped, 200)
+    print(f'  {"profiled":<10} {profiled * 1e6:8.0f} us/call   (writes a profile per call)')
+
+    db_path = os.path.join(workdir, 'timetable.db')
+    _seed_department(db_path)
+    options = GenerationOptions(generate_pdf=False, seed=7)
+    for label, profile in (('generate', False), ('generate+prof', True)):
+        start = time.perf_counter()
+        if profile:
+            with profiling.requested('bench-generate'):
+                generate(1, db_path, options)
+        else:
+            generate(1, db_path, options)
+        print(f'  {label:<14} {(time.perf_counter() - start) * 1e3:8.1f} ms')
+    print(f'profiles in {profiling.PROFILE_DIR}')
+
+if __name__ == '__main__':
+    main()
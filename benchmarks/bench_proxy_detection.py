@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Proxy detection benchmark.
+
+Seeds one session with --students marks (random positions in a square room
+of about 1.5 m2 per student, one IP and device each) and times:
+  per tap   - the old per-tap SQL lookup of (session_id, client_ip) vs
+              ProxyIndex.check on IP, device and position
+  end pass  - flag_session clustering every mark of the session once
+
+Usage:
+    python benchmarks/bench_proxy_detection.py --students 500
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from attendance.migrations import migrate
+from attendance.proxy import ProxyIndex, flag_session
+from utils.db_utils import ConnectionManager
+
+LAT, LNG = 22.5184833, 88.4168668
+M_PER_DEG = 111195.0
+
+def seed(db, students, rng):
+    side = math.sqrt(1.5 * students)
+    taps = []
+    for i in range(students):
+        lat = LAT + rng.uniform(0, side) / M_PER_DEG
+        lng = LNG + rng.uniform(0, side) / (M_PER_DEG * math.cos(math.radians(LAT)))
+        taps.append((i, f'10.1.{i // 250}.{i % 250}', f'device-{i}', lat, lng))
+    with db.transaction() as cursor:
+        cursor.execute("INSERT INTO attendance_sessions (id, class_id, class_name, room, teacher_lat, teacher_lng, "
+                       "radius, is_active) VALUES ('s', 'c', 'Class', '303', ?, ?, 50, 0)", (LAT, LNG))
+        cursor.executemany(
+            "INSERT INTO attendance_records (session_id, student_id, client_ip, device_id, student_lat, student_lng, "
+            "marked_at) VALUES ('s', ?, ?, ?, ?, ?, datetime('now', ?))",
+            [(i, ip, device, lat, lng, f'+{rng.randrange(300)} seconds') for i, ip, device, lat, lng in taps])
+    return taps
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--students', type=int, default=500)
+    ap.add_argument('--repeat', type=int, default=5)
+    args = ap.parse_args()
+
+    db = ConnectionManager(os.path.join(tempfile.mkdtemp(prefix='bench_proxy_'), 'attendance.db'))
+    migrate(db)
+    rng = random.Random(3)
+    taps = seed(db, args.students, rng)
+    conn = db.connection()
+
+    index = ProxyIndex(LAT)
+    for i, ip, device, lat, lng in taps:
+        index.add(i, ip, device, lat, lng)
+
+    print(f'{args.students} marks in one session')
+    print('per tap')
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for i, ip, _, _, _ in taps:
+            conn.execute('SELECT student_id FROM attendance_records WHERE session_id = ? AND client_ip = ?',
+                         ('s', ip)).fetchone()
+    sql = (time.perf_counter() - start) / (args.repeat * len(taps))
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for i, ip, device, lat, lng in taps:
+            index.check(i, ip, device, lat, lng)
+    memory = (time.perf_counter() - start) / (args.repeat * len(taps))
+    print(f'  {"sql (ip)":<22} {sql * 1e6:8.2f} us')
+    print(f'  {"index (ip+dev+pos)":<22} {memory * 1e6:8.2f} us')
+    print(f'  {"speedup":<22} {sql / memory:8.0f}x')
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        flags = flag_session(db, 's')
+    elapsed = (time.perf_counter() - start) / args.repeat
+    print(f'end pass: {elapsed * 1e3:.1f} ms, {len(flags)} marks flagged')
+    db.close_all()
+
+if __name__ == '__main__':
+    main()
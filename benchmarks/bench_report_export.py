@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Attendance report export benchmark.
+
+Seeds one class of --students students (two thirds of them marked) and times:
+  legacy pdf  - two queries joined in Python, one table.setStyle call per row
+                (what /export-pdf used to do)
+  pdf         - ReportEngine: one LEFT JOIN, page-sized tables with one batched
+                style list each
+  xlsx / csv  - ReportEngine write-only workbook / streamed CSV
+  cached      - serving the ended session's export from the disk cache
+
+Usage:
+    python benchmarks/bench_report_export.py --students 2000
+"""
+
+import argparse
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from attendance import reports as reports_module
+from attendance.migrations import migrate
+from attendance.reports import ReportEngine
+from utils.db_utils import ConnectionManager
+
+SESSION_ID = 'bench-session'
+
+def seed(db, students):
+    rng = random.Random(3)
+    with db.transaction() as cursor:
+        cursor.executemany(
+            "INSERT INTO students (id, name, email, roll_number, class_id, semester) VALUES (?, ?, ?, ?, 'cse-b', 3)",
+            ((i, f'Student {i}', f'student{i}@heritageit.edu.in', f'CSE{i:05d}') for i in range(1, students + 1)))
+        cursor.execute("INSERT INTO attendance_sessions (id, class_id, class_name, room, teacher_lat, teacher_lng, radius) "
+                       "VALUES (?, 'cse-b', 'CSE 3B', '303', 22.5184833, 88.4168668, 50)", (SESSION_ID,))
+        cursor.executemany(
+            "INSERT INTO attendance_records (session_id, student_id, distance, status, client_ip) VALUES (?, ?, ?, ?, ?)",
+            ((SESSION_ID, i, rng.uniform(0, 80), rng.choice(('present', 'present', 'absent')), f'10.0.{i // 256}.{i % 256}')
+             for i in range(1, students + 1) if rng.random() < 2 / 3))
+
+def legacy_pdf(db, out):
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import inch
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
+
+    cursor = db.connection().cursor()
+    cursor.execute("SELECT s.id, s.name, s.email, s.roll_number FROM students s WHERE s.class_id = 'cse-b'")
+    all_students = cursor.fetchall()
+    cursor.execute('SELECT student_id, status, marked_at, distance FROM attendance_records WHERE session_id = ?',
+                   (SESSION_ID,))
+    records = {row[0]: row for row in cursor.fetchall()}
+
+    table_data = [['Name', 'Roll Number', 'Email', 'Status', 'Time']]
+    for student in all_students:
+        record = records.get(student[0])
+        status = record[1].title() if record else 'Not Clicked'
+        table_data.append([student[1], student[3], student[2], status, (record and record[2]) or 'N/A'])
+
+    table = Table(table_data, colWidths=[2*inch, 1*inch, 2.5*inch, 1*inch, 1.5*inch])
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+    for i, row in enumerate(table_data[1:], 1):
+        colour = {'Present': colors.lightgreen, 'Absent': colors.lightcoral}.get(row[3], colors.lightyellow)
+        table.setStyle(TableStyle([('BACKGROUND', (3, i), (3, i), colour)]))
+    SimpleDocTemplate(out, pagesize=A4, topMargin=0.5*inch).build([table])
+
+def timed(label, fn, repeat):
+    sizes = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        out = io.BytesIO()
+        fn(out)
+        sizes.append(len(out.getvalue()))
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f'{label:<11} {elapsed * 1e3:10.1f} ms   {sizes[-1] // 1024:6d} KiB')
+    return elapsed
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--students', type=int, default=2000)
+    ap.add_argument('--repeat', type=int, default=3)
+    args = ap.parse_args()
+
+    reports_module._logos.update({reports_module.HITK_LOGO_URL: None, reports_module.TIMELY_LOGO_URL: None})
+    workdir = tempfile.mkdtemp(prefix='bench_reports_')
+    db = ConnectionManager(os.path.join(workdir, 'attendance.db'))
+    migrate(db)
+    seed(db, args.students)
+    engine = ReportEngine(db, os.path.join(workdir, 'reports'))
+    report = engine.session(SESSION_ID)
+
+    print(f'{args.students} students, {args.repeat} runs each')
+    legacy = timed('legacy pdf', lambda out: legacy_pdf(db, out), args.repeat)
+    batched = timed('pdf', lambda out: engine.write(report, 'pdf', out), args.repeat)
+    timed('xlsx', lambda out: engine.write(report, 'xlsx', out), args.repeat)
+    timed('csv', lambda out: engine.write(report, 'csv', out), args.repeat)
+
+    with db.transaction() as cursor:
+        cursor.execute('UPDATE attendance_sessions SET is_active = 0 WHERE id = ?', (SESSION_ID,))
+    ended = engine.session(SESSION_ID)
+    engine.cached(ended, 'pdf')
+    def serve_cached(out):
+        with open(engine.cached(ended, 'pdf'), 'rb') as f:
+            out.write(f.read())
+    timed('cached pdf', serve_cached, args.repeat)
+    print(f'\npdf speedup over legacy: {legacy / batched:.1f}x')
+    db.close_all()
+
+if __name__ == '__main__':
+    main()
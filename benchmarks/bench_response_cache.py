@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Notice polling benchmark.
+
+Serves the /api/notices query from a scratch attendance.db three ways and
+times --requests calls of the view inside a request context:
+  uncached  - query and jsonify on every poll (the old route)
+  cached    - ResponseCache, full 200 response from memory
+  304       - ResponseCache, client sends its ETag back (an idle dashboard tab)
+
+Usage:
+    python benchmarks/bench_response_cache.py --requests 5000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, jsonify, request
+
+from attendance.migrations import migrate
+from utils.db_utils import ConnectionManager
+from utils.http_cache import ResponseCache
+
+def load_notices(db):
+    rows = db.connection().execute('''
+        SELECT title, content, published_by, published_at, type
+        FROM notice_board WHERE is_active = 1
+        ORDER BY published_at DESC LIMIT 10
+    ''').fetchall()
+    return [{'title': r[0], 'content': r[1], 'published_by': r[2], 'published_at': r[3], 'type': r[4]}
+            for r in rows]
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--requests', type=int, default=5000)
+    ap.add_argument('--notices', type=int, default=500)
+    args = ap.parse_args()
+
+    db = ConnectionManager(os.path.join(tempfile.mkdtemp(prefix='bench_cache_'), 'attendance.db'))
+    migrate(db)
+    with db.transaction() as cursor:
+        cursor.executemany("INSERT INTO notice_board (title, content, type, published_by, published_at) "
+                           "VALUES (?, ?, 'timetable', 'HOD', datetime('now', ?))",
+                           [(f'Notice {i}', 'New class timetables have been published. ' * 4, f'-{i} minutes')
+                            for i in range(args.notices)])
+
+    app = Flask(__name__)
+    cache = ResponseCache()
+    views = {
+        'uncached': lambda: jsonify(load_notices(db)),
+        'cached': lambda: cache.respond('notices', lambda: load_notices(db), request),
+    }
+    with app.test_request_context('/'):
+        etag = views['cached']().headers['ETag']
+
+    results = {}
+    for label, view, headers in (('uncached', views['uncached'], {}), ('cached', views['cached'], {}),
+                                 ('304', views['cached'], {'If-None-Match': etag})):
+        with app.test_request_context('/', headers=headers):
+            start = time.perf_counter()
+            for _ in range(args.requests):
+                response = view()
+            results[label] = (time.perf_counter() - start) / args.requests
+        print(f'  {label:<10} {results[label] * 1e6:8.1f} us/request   status {response.status_code}, '
+              f'{len(response.get_data())} bytes')
+    print(f'  {"speedup":<10} {results["uncached"] / results["304"]:8.1f}x (304 vs uncached)')
+    db.close_all()
+
+if __name__ == '__main__':
+    main()
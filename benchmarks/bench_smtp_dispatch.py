@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Attendance email dispatch benchmark against a local aiosmtpd sink.
+
+Compares the old pattern (one SMTP connection, send_message in a loop) with
+SMTPDispatcher at several pool sizes. The sink can add a per-message delay to
+stand in for a remote provider's DATA round trip.
+
+Usage:
+    pip install aiosmtpd
+    python benchmarks/bench_smtp_dispatch.py --messages 200 --latency-ms 20 --pools 1,4,8
+"""
+
+import argparse
+import asyncio
+import os
+import smtplib
+import socket
+import sys
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiosmtpd.controller import Controller
+
+from attendance.mailer import SMTPDispatcher
+
+class SlowSink:
+    def __init__(self, latency_ms):
+        self.latency = latency_ms / 1000
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.received += 1
+        return "250 Message accepted"
+
+def build_messages(n):
+    messages = []
+    for i in range(n):
+        msg = MIMEMultipart()
+        msg['From'] = 'noreply@example.edu'
+        msg['To'] = f'student{i}@example.edu'
+        msg['Subject'] = 'Attendance Required - Algorithms'
+        msg.attach(MIMEText(f'<p>Dear Student {i}, please mark your attendance.</p>\n' * 20, 'html'))
+        messages.append((msg['To'], msg))
+    return messages
+
+def serial(config, messages):
+    server = smtplib.SMTP(config['smtp_server'], config['smtp_port'])
+    for _, msg in messages:
+        server.send_message(msg)
+    server.quit()
+    return len(messages)
+
+def pooled(config, messages, pool_size):
+    with SMTPDispatcher(config, pool_size=pool_size) as dispatcher:
+        return sum(r.success for r in dispatcher.send(messages))
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--messages', type=int, default=200)
+    ap.add_argument('--latency-ms', type=float, default=20, help='simulated per-message server delay')
+    ap.add_argument('--pools', default='1,4,8', help='comma-separated pool sizes')
+    args = ap.parse_args()
+
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    sink = SlowSink(args.latency_ms)
+    controller = Controller(sink, hostname='127.0.0.1', port=port)
+    controller.start()
+    config = {'smtp_server': '127.0.0.1', 'smtp_port': port, 'email': 'noreply@example.edu', 'use_tls': False}
+    messages = build_messages(args.messages)
+
+    print(f"{args.messages} messages, {args.latency_ms:g} ms simulated server latency")
+    runs = [('serial', lambda: serial(config, messages))]
+    runs += [(f'pool={p}', lambda p=int(p): pooled(config, messages, p)) for p in args.pools.split(',')]
+    try:
+        for label, fn in runs:
+            start = time.perf_counter()
+            sent = fn()
+            elapsed = time.perf_counter() - start
+            print(f"{label:<8} {sent / elapsed:8.1f} msg/s   {elapsed:6.2f} s   sent {sent}")
+    finally:
+        controller.stop()
+
+if __name__ == '__main__':
+    main()
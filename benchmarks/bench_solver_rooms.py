@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Growth of the CP-SAT timetable model with the number of rooms.
+
+Builds a --days x --slots week with --subjects subjects of random group
+sizes and solves it with 0, 1, 10, 100 ... rooms of random capacity. For
+each room count prints the model's variables and constraints, the booleans a
+full day x slot x subject x room encoding would need, and the build and
+search times. Each slot's room is one variable bounded by capacity rank, so
+the model stays the same size whatever the room count.
+
+Usage:
+    python benchmarks/bench_solver_rooms.py --rooms 0,1,10,100,1000,10000
+"""
+
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.csp_solver import CSPSolverAgent
+from core.constraint_schema import ConstraintPackage, HardConstraints, Room, SoftConstraints, Subject, Teacher
+from utils.logging_utils import get_logger
+
+def package(days, slots, subjects, rooms, rng):
+    day_names = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'][:days]
+    slot_names = [f'S{i + 1}' for i in range(slots)]
+    teachers = [Teacher(id=f'T{i}', name=f'Teacher {i}', availability={d: list(slot_names) for d in day_names})
+                for i in range(subjects)]
+    per_week = days * slots // subjects
+    return ConstraintPackage(
+        hard=HardConstraints(
+            days=day_names, slots_per_day=slots, slot_names=slot_names, teachers=teachers,
+            subjects=[Subject(id=f'Sub{i}', name=f'Subject {i}', teacher_id=f'T{i}', periods_per_week=per_week,
+                              students=rng.randint(20, 60)) for i in range(subjects)],
+            rooms=[Room(id=f'R{i}', name=f'Room {i}', capacity=rng.randint(20, 120)) for i in range(rooms)] or None,
+        ),
+        soft=SoftConstraints(),
+    )
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--rooms', default='0,1,10,100,1000,10000', help='comma-separated room counts')
+    ap.add_argument('--days', type=int, default=5)
+    ap.add_argument('--slots', type=int, default=6)
+    ap.add_argument('--subjects', type=int, default=5)
+    ap.add_argument('--solutions', type=int, default=5)
+    ap.add_argument('--seed', type=int, default=7)
+    args = ap.parse_args()
+
+    get_logger('CSPSolverAgent').setLevel('WARNING')
+    solver = CSPSolverAgent()
+    print(f'  {"rooms":>6} {"vars":>6} {"cons":>6} {"cube vars":>10} {"build ms":>9} {"search ms":>10}  status')
+    for count in (int(n) for n in args.rooms.split(',')):
+        # Room 0 always seats everyone, so every room count is feasible
+        cp = package(args.days, args.slots, args.subjects, count, random.Random(args.seed))
+        if cp.hard.rooms:
+            cp.hard.rooms[0].capacity = 60
+        result = solver.solve(cp, max_solutions=args.solutions)
+        stats = result.stats
+        cube = args.days * args.slots * args.subjects * max(count, 1)
+        print(f'  {count:>6} {stats["variables"]:>6.0f} {stats["constraints"]:>6.0f} {cube:>10} '
+              f'{stats["build_seconds"] * 1e3:>9.1f} {stats["search_seconds"] * 1e3:>10.1f}  {result.status}')
+
+if __name__ == '__main__':
+    main()
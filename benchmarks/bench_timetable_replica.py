@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Read latency during timetable generation: primary database vs read-only replica.
+
+A writer thread repeatedly rewrites a schedules table inside exclusive
+transactions held for --hold-ms, --gap-ms apart (back-to-back generations on
+a rollback-journal database), while a reader runs --reads point queries either against the
+primary (waiting on busy_timeout) or against a replica published with
+publish_replica and opened mode=ro&immutable=1.
+
+Usage:
+    python benchmarks/bench_timetable_replica.py --hold-ms 200 --gap-ms 100 --reads 50
+"""
+
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.db_utils import ConnectionManager, ReadReplica, publish_replica, replica_path_for
+
+def writer(db_path, hold_ms, gap_ms, stop):
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=DELETE')
+    while not stop.is_set():
+        conn.execute('BEGIN EXCLUSIVE')
+        conn.execute('DELETE FROM generated_schedules')
+        conn.executemany('INSERT INTO generated_schedules (section_id, day, time_slot) VALUES (?, ?, ?)',
+                         ((n % 120, n % 5, n % 8) for n in range(5000)))
+        time.sleep(hold_ms / 1000)
+        conn.execute('COMMIT')
+        time.sleep(gap_ms / 1000)
+    conn.close()
+
+def read_latencies(connect, reads):
+    latencies = []
+    for n in range(reads):
+        start = time.perf_counter()
+        connect().execute('SELECT COUNT(*) FROM generated_schedules WHERE section_id = ?', (n % 120,)).fetchone()
+        latencies.append((time.perf_counter() - start) * 1e3)
+        time.sleep(0.002)
+    return latencies
+
+def report(label, latencies):
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f'  {label:<8} p50 {statistics.median(latencies):8.2f} ms   p99 {p99:8.2f} ms   max {latencies[-1]:8.2f} ms')
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--hold-ms', type=int, default=200)
+    ap.add_argument('--reads', type=int, default=50)
+    ap.add_argument('--gap-ms', type=int, default=100)
+    args = ap.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix='bench_replica_'), 'timetable.db')
+    primary = ConnectionManager(db_path, journal_mode='DELETE', busy_timeout_ms=30000)
+    with primary.transaction() as cursor:
+        cursor.execute('CREATE TABLE generated_schedules (id INTEGER PRIMARY KEY, section_id INTEGER, '
+                       'day INTEGER, time_slot INTEGER)')
+        cursor.execute('CREATE INDEX ix_section ON generated_schedules (section_id)')
+        cursor.executemany('INSERT INTO generated_schedules (section_id, day, time_slot) VALUES (?, ?, ?)',
+                           ((n % 120, n % 5, n % 8) for n in range(5000)))
+    replica = ReadReplica(publish_replica(primary.connection(), replica_path_for(db_path)))
+
+    print(f'writer holds an exclusive lock for {args.hold_ms} ms every {args.hold_ms + args.gap_ms} ms')
+    for label, connect in (('primary', primary.connection), ('replica', replica.connection)):
+        stop = threading.Event()
+        thread = threading.Thread(target=writer, args=(db_path, args.hold_ms, args.gap_ms, stop))
+        thread.start()
+        time.sleep(0.05)
+        try:
+            report(label, read_latencies(connect, args.reads))
+        finally:
+            stop.set()
+            thread.join()
+    primary.close_all()
+    replica.close_all()
+
+if __name__ == '__main__':
+    main()
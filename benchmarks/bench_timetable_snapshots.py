@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Student timetable read benchmark.
+
+Seeds a Routine5 timetable.db with --sections sections of full weekly
+schedules and times producing the /api/student-timetable body:
+  per-section  - the old route: one schedule query per section, then JSON
+  one query    - utils.timetable_snapshots.load_sections, then JSON
+  snapshot     - the published file read from disk (what the route now serves)
+
+Usage:
+    python benchmarks/bench_timetable_snapshots.py --sections 120
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Routine5_lab_advanced.engine import DAYS, TIME_SLOTS, init_db
+from utils.timetable_snapshots import TIMETABLE, SnapshotStore, load_sections, publish
+
+SECTION_QUERY = '''
+    SELECT gs.day, gs.time_slot, s.name, st.teacher_name,
+           CASE WHEN tr.name IS NOT NULL THEN tr.name ELSE lr.name END as room_name
+    FROM generated_schedules gs
+    JOIN subjects s ON gs.subject_id = s.id
+    JOIN subject_teachers st ON gs.teacher_id = st.id
+    LEFT JOIN theory_rooms tr ON gs.room_id = tr.id AND gs.room_type = 'theory'
+    LEFT JOIN lab_rooms lr ON gs.room_id = lr.id AND gs.room_type = 'lab'
+    WHERE gs.section_id = ?
+    ORDER BY
+        CASE gs.day
+            WHEN 'monday' THEN 1 WHEN 'tuesday' THEN 2 WHEN 'wednesday' THEN 3
+            WHEN 'thursday' THEN 4 WHEN 'friday' THEN 5
+        END, gs.time_slot
+'''
+
+def seed(db_path, sections):
+    init_db(db_path)
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO departments (name, code, program_duration) VALUES ('Computer Science', 'CSE', 4)")
+    for year in range(1, 5):
+        conn.execute("INSERT INTO years (department_id, year_number, section_count) VALUES (1, ?, ?)",
+                     (year, sections // 4))
+        conn.execute("INSERT INTO semesters (year_id, semester_number, semester_type, is_active) "
+                     "VALUES (?, ?, 'odd', 1)", (year, 2 * year - 1))
+    conn.executemany("INSERT INTO sections (year_id, section_label) VALUES (?, ?)",
+                     [(n % 4 + 1, f'S{n}') for n in range(sections)])
+    conn.executemany("INSERT INTO theory_rooms (name) VALUES (?)", [(f'R{n}',) for n in range(40)])
+    conn.executemany("INSERT INTO subjects (semester_id, name, type, credits) VALUES (?, ?, 'theory', 3)",
+                     [(n % 4 + 1, f'Subject {n}') for n in range(40)])
+    conn.executemany("INSERT INTO subject_teachers (subject_id, teacher_name) VALUES (?, ?)",
+                     [(n + 1, f'Prof. {n}') for n in range(40)])
+    conn.executemany(
+        "INSERT INTO generated_schedules (section_id, subject_id, teacher_id, room_id, room_type, day, time_slot) "
+        "VALUES (?, ?, ?, ?, 'theory', ?, ?)",
+        [(section + 1, (section + d + t) % 40 + 1, (section + d + t) % 40 + 1, (section + t) % 40 + 1, day, slot)
+         for section in range(sections) for d, day in enumerate(DAYS) for t, slot in enumerate(TIME_SLOTS[:7])])
+    conn.commit()
+    return conn
+
+def per_section(conn):
+    sections = conn.execute('''
+        SELECT sec.id, sec.section_label, y.year_number, s.semester_number, d.name, d.code
+        FROM sections sec JOIN years y ON sec.year_id = y.id JOIN semesters s ON s.year_id = y.id
+        JOIN departments d ON y.department_id = d.id
+        WHERE s.is_active = 1 ORDER BY y.year_number, s.semester_number, sec.section_label
+    ''').fetchall()
+    result = []
+    for section_id, label, year, semester, name, code in sections:
+        grid = {}
+        for day, slot, subject, teacher, room in conn.execute(SECTION_QUERY, (section_id,)):
+            grid.setdefault(day, {})[slot] = {'subject': subject, 'teacher': teacher, 'room': room}
+        result.append({'section_label': label, 'year_number': year, 'semester_number': semester,
+                       'dept_name': name, 'dept_code': code, 'schedule': grid})
+    return json.dumps({'success': True, 'sections': result}, separators=(',', ':'), sort_keys=True).encode()
+
+def timed(label, fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        body = fn()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f'  {label:<12} {elapsed * 1e3:8.2f} ms   {len(body):,} bytes')
+    return elapsed
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--sections', type=int, default=120)
+    ap.add_argument('--repeat', type=int, default=20)
+    args = ap.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_snapshots_')
+    conn = seed(os.path.join(workdir, 'timetable.db'), args.sections)
+    root = os.path.join(workdir, 'snapshots')
+    start = time.perf_counter()
+    publish(load_sections(conn), root)
+    print(f'{args.sections} sections; published snapshot in {(time.perf_counter() - start) * 1e3:.0f} ms')
+
+    store = SnapshotStore(root)
+
+    def snapshot(gzip_ok=False):
+        with open(store.path(TIMETABLE, gzip_ok)[0], 'rb') as f:
+            return f.read()
+
+    slow = timed('per-section', lambda: per_section(conn), args.repeat)
+    timed('one query', lambda: json.dumps({'success': True, 'sections': load_sections(conn)},
+                                          separators=(',', ':'), sort_keys=True).encode(), args.repeat)
+    fast = timed('snapshot', snapshot, args.repeat)
+    timed('snapshot gz', lambda: snapshot(True), args.repeat)
+    print(f'  {"speedup":<12} {slow / fast:8.0f}x (snapshot vs per-section)')
+    conn.close()
+
+if __name__ == '__main__':
+    main()
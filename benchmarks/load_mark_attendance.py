@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Burst load test for POST /api/mark-attendance.
+
+Seeds a throwaway attendance.db with students across several classes, opens one
+session per class through LocationBasedAttendanceSystem and has every student
+tap at once from a pool of concurrent clients. A share of taps come from outside
+the room radius, re-tap, or reuse another student's IP, so every branch of the
+marking path is exercised.
+
+By default requests go through the Flask test client inside this process. Pass
+--url to hit a running server instead (it must be started from --workdir so it
+uses the seeded database).
+
+Usage:
+    python benchmarks/load_mark_attendance.py --students 3000 --classes 10 --concurrency 32
+    python benchmarks/load_mark_attendance.py --write-behind
+    python benchmarks/load_mark_attendance.py --workdir /tmp/load --seed-only   # then start app.py there
+    python benchmarks/load_mark_attendance.py --workdir /tmp/load --url http://127.0.0.1:5000
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+ROOM = 'Room 101'
+METERS_PER_DEGREE = 111320
+
+def seed(workdir, students, classes):
+    """Create attendance.db in workdir with the repo's clean schema plus generated students"""
+    from clean_attendance_only import clean_setup
+
+    os.chdir(workdir)
+    clean_setup()
+    conn = sqlite3.connect('attendance.db')
+    rows = [(1000 + i, f'Student {i}', f'student{i}@load.test', f'LT{i:05d}', f'class-{i % classes}', 3)
+            for i in range(students)]
+    conn.executemany('INSERT INTO students VALUES (?, ?, ?, ?, ?, ?)', rows)
+    conn.commit()
+    conn.close()
+
+def open_sessions(classes):
+    from attendance_system import LocationBasedAttendanceSystem
+    from config.email_config import get_room_coordinates
+
+    coords = get_room_coordinates()[ROOM]
+    system = LocationBasedAttendanceSystem('attendance.db')
+    sessions = {}
+    for c in range(classes):
+        class_id = f'class-{c}'
+        sessions[class_id] = system.create_attendance_session(
+            class_id, f'Load Test {c}', ROOM, coords['lat'], coords['lng'])
+    radius = system.db.connection().execute(
+        'SELECT radius FROM attendance_sessions LIMIT 1').fetchone()[0]
+    return sessions, coords, radius
+
+def build_taps(args, sessions, coords, radius):
+    """One payload per student plus re-taps, with randomized positions and IPs"""
+    rng = random.Random(args.seed)
+    conn = sqlite3.connect('attendance.db')
+    students = conn.execute("SELECT email, class_id FROM students WHERE email LIKE '%@load.test'").fetchall()
+    conn.close()
+
+    taps = []
+    class_ips = {}
+    for n, (email, class_id) in enumerate(students):
+        inside = rng.random() >= args.outside
+        distance = rng.uniform(0, radius * 0.9) if inside else rng.uniform(radius * 1.5, radius * 10)
+        bearing = rng.uniform(0, 2 * math.pi)
+        lat = coords['lat'] + distance * math.cos(bearing) / METERS_PER_DEGREE
+        lng = coords['lng'] + distance * math.sin(bearing) / (METERS_PER_DEGREE * math.cos(math.radians(coords['lat'])))
+        ip = f'10.{n // 65536 % 256}.{n // 256 % 256}.{n % 256}'
+        seen = class_ips.setdefault(class_id, [])
+        if seen and rng.random() < args.proxy:
+            ip = rng.choice(seen)  # a classmate's device, i.e. a proxy tap
+        seen.append(ip)
+        taps.append(({'session_id': sessions[class_id], 'email': email, 'latitude': lat, 'longitude': lng}, ip))
+
+    retaps = [rng.choice(taps) for _ in range(int(len(taps) * args.retap))]
+    taps.extend(retaps)
+    rng.shuffle(taps)
+    return taps
+
+def classify(status, body):
+    if status >= 500:
+        return 'locked' if 'locked' in body.get('error', '') else 'server_error'
+    if status >= 400:
+        return 'client_error'
+    if body.get('success'):
+        return body['status']
+    message = body.get('message', '')
+    if message.startswith('Proxy'):
+        return 'proxy_rejected'
+    if 'already' in message:
+        return 'duplicate_rejected'
+    return 'rejected'
+
+def make_sender(url):
+    if url:
+        endpoint = url.rstrip('/') + '/api/mark-attendance'
+
+        def send(payload, ip):
+            req = urllib.request.Request(endpoint, data=json.dumps(payload).encode(), method='POST',
+                                         headers={'Content-Type': 'application/json', 'X-Forwarded-For': ip})
+            try:
+                with urllib.request.urlopen(req, timeout=30) as resp:
+                    return resp.status, json.loads(resp.read() or b'{}')
+            except urllib.error.HTTPError as e:
+                return e.code, json.loads(e.read() or b'{}')
+        return send
+
+    import logging
+    from app import app
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    local = threading.local()
+
+    def send(payload, ip):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = app.test_client()
+        resp = client.post('/api/mark-attendance', json=payload, headers={'X-Forwarded-For': ip})
+        return resp.status_code, resp.get_json() or {}
+    return send
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))] * 1000
+
+def run(taps, send, concurrency):
+    latencies = []
+    outcomes = Counter()
+    lock = threading.Lock()
+
+    def one(tap):
+        payload, ip = tap
+        start = time.perf_counter()
+        try:
+            status, body = send(payload, ip)
+            outcome = classify(status, body)
+        except Exception as e:
+            outcome = 'locked' if 'locked' in str(e) else 'transport_error'
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            outcomes[outcome] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, taps))
+    return time.perf_counter() - started, sorted(latencies), outcomes
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--students', type=int, default=3000)
+    ap.add_argument('--classes', type=int, default=10)
+    ap.add_argument('--concurrency', type=int, default=32)
+    ap.add_argument('--outside', type=float, default=0.1, help='share of taps from outside the radius')
+    ap.add_argument('--retap', type=float, default=0.05, help='extra taps from students who already marked')
+    ap.add_argument('--proxy', type=float, default=0.02, help='share of taps reusing another student\'s IP')
+    ap.add_argument('--seed', type=int, default=42)
+    ap.add_argument('--workdir', help='directory for attendance.db (default: a temporary directory)')
+    ap.add_argument('--url', help='base URL of a running app instead of the Flask test client')
+    ap.add_argument('--write-behind', action='store_true', help='enable ATTENDANCE_WRITE_BEHIND (test client only)')
+    ap.add_argument('--seed-only', action='store_true', help='only create the database')
+    args = ap.parse_args()
+
+    if args.write_behind:
+        os.environ['ATTENDANCE_WRITE_BEHIND'] = '1'
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='timely-load-')
+    os.makedirs(workdir, exist_ok=True)
+    if args.url and os.path.exists(os.path.join(workdir, 'attendance.db')):
+        # The server already has this database open; reuse the earlier --seed-only run
+        os.chdir(workdir)
+    else:
+        seed(workdir, args.students, args.classes)
+        print(f"Seeded {args.students} students in {args.classes} classes at {os.path.join(workdir, 'attendance.db')}")
+    if args.seed_only:
+        return
+
+    sessions, coords, radius = open_sessions(args.classes)
+    taps = build_taps(args, sessions, coords, radius)
+    send = make_sender(args.url)
+
+    mode = args.url or ('test client, write-behind' if args.write_behind else 'test client')
+    print(f"{len(taps)} taps, concurrency {args.concurrency}, {mode}")
+    elapsed, latencies, outcomes = run(taps, send, args.concurrency)
+
+    errors = sum(outcomes[k] for k in ('locked', 'server_error', 'client_error', 'transport_error'))
+    print(f"throughput  {len(taps) / elapsed:,.0f} req/s ({elapsed:.2f}s)")
+    print(f"latency     p50 {percentile(latencies, 0.50):.2f} ms   p95 {percentile(latencies, 0.95):.2f} ms   "
+          f"p99 {percentile(latencies, 0.99):.2f} ms")
+    print(f"errors      {errors} ({100 * errors / len(taps):.2f}%), 'database is locked': {outcomes['locked']}")
+    print("outcomes    " + ", ".join(f"{k}={v}" for k, v in sorted(outcomes.items())))
+
+if __name__ == '__main__':
+    main()
@@ -20,10 +20,15 @@ EMAIL_CONFIG = {
     'smtp_port': int(os.getenv('SMTP_PORT', 587)),
     'email': os.getenv('ATTENDANCE_EMAIL', 'your-email@gmail.com'),
     'password': os.getenv('ATTENDANCE_EMAIL_PASSWORD', 'your-app-password'),
-    'use_tls': True
+    'use_tls': True,
+    'pool_size': int(os.getenv('SMTP_POOL_SIZE', 4)),  # parallel SMTP connections
+    'max_messages_per_connection': int(os.getenv('SMTP_MAX_PER_CONNECTION', 100)),
+    'plain_text_alternative': os.getenv('SMTP_PLAIN_TEXT', '1') == '1',  # add a text/plain part
 }
 
 # Room Coordinates (Replace with actual coordinates of your institution)
+# Rooms missing from room_coordinates are added at startup; registered rooms are
+# changed through attendance.rooms.RoomRegistry.save (POST /api/rooms)
 ROOM_COORDINATES = {
     'Room 101': {'lat': 22.5185485, 'lng': 88.4167369, 'radius': 30},
     'Room 102': {'lat': 22.5185585, 'lng': 88.4167469, 'radius': 30},
@@ -35,8 +40,18 @@ ROOM_COORDINATES = {
     'Lab B': {'lat': 22.5186185, 'lng': 88.4168069, 'radius': 40},
     'Auditorium': {'lat': 22.5186285, 'lng': 88.4168169, 'radius': 50},
     'Library': {'lat': 22.5186385, 'lng': 88.4168269, 'radius': 35},
+    '303': {'lat': 22.5184833, 'lng': 88.4168668, 'radius': 50},
+    '304': {'lat': 22.5185000, 'lng': 88.4169000, 'radius': 50},
+    '305': {'lat': 22.5185200, 'lng': 88.4169300, 'radius': 50},
+    '306': {'lat': 22.5185400, 'lng': 88.4169600, 'radius': 50},
 }
 
+# Room geofences, checked instead of the radius when present (see attendance.geofence).
+# Each room is {'bounds': [south, west, north, east]} or {'polygon': [[lat, lng], ...]},
+# with an optional 'tolerance' in meters for GPS error, e.g.
+#   'Room 303': {'bounds': [22.51844, 88.41682, 22.51852, 88.41692], 'tolerance': 5},
+ROOM_GEOFENCES = {}
+
 # Attendance Settings
 ATTENDANCE_SETTINGS = {
     'session_duration_minutes': 30,  # How long attendance session stays active
@@ -44,6 +59,20 @@ ATTENDANCE_SETTINGS = {
     'default_radius': 50,  # Default classroom radius in meters
     'max_radius': 100,  # Maximum allowed radius
     'min_radius': 10,   # Minimum allowed radius
+    # Write-behind marking: acknowledge taps from memory and commit them in batches
+    'write_behind': os.getenv('ATTENDANCE_WRITE_BEHIND', '0') == '1',
+    'write_behind_flush_ms': int(os.getenv('ATTENDANCE_FLUSH_MS', 50)),
+    'write_behind_batch_size': int(os.getenv('ATTENDANCE_BATCH_SIZE', 200)),
+    'write_behind_max_unflushed': int(os.getenv('ATTENDANCE_MAX_UNFLUSHED', 1000)),
+    # Students below this attendance percentage are listed as defaulters
+    'defaulter_threshold': float(os.getenv('ATTENDANCE_DEFAULTER_THRESHOLD', 75)),
+    # GPS tolerance (meters) for geofences that do not set their own
+    'geofence_tolerance': float(os.getenv('ATTENDANCE_GEOFENCE_TOLERANCE', 5)),
+    # Proxy detection: taps within this many meters of another student's count as co-located
+    'proxy_colocated_m': float(os.getenv('ATTENDANCE_PROXY_COLOCATED_M', 1)),
+    'proxy_block_colocated': os.getenv('ATTENDANCE_PROXY_BLOCK_COLOCATED', '0') == '1',
+    'proxy_burst_seconds': float(os.getenv('ATTENDANCE_PROXY_BURST_SECONDS', 20)),
+    'proxy_flag_score': float(os.getenv('ATTENDANCE_PROXY_FLAG_SCORE', 0.8)),
 }
 
 # Class Format Validation
@@ -71,7 +100,82 @@ If you have any issues, please contact your instructor.
 
 Best regards,
 Academic System - Timely™
-        '''
+        ''',
+        # HTML version; literal braces in the CSS are doubled for str.format
+        'html': '''
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <style>
+        body {{ font-family: Arial, sans-serif; margin: 0; padding: 20px; background: #f5f5f5; }}
+        .container {{ max-width: 600px; margin: 0 auto; background: white; border-radius: 10px; overflow: hidden; box-shadow: 0 4px 15px rgba(0,0,0,0.1); }}
+        .header {{ background: linear-gradient(135deg, #667eea, #764ba2); padding: 30px; text-align: center; color: white; }}
+        .logo {{ display: flex; align-items: center; justify-content: center; gap: 15px; margin-bottom: 15px; }}
+        .logo img {{ height: 50px; }}
+        .content {{ padding: 30px; }}
+        .attendance-card {{ background: #f8f9ff; border-left: 4px solid #667eea; padding: 20px; margin: 20px 0; border-radius: 8px; }}
+        .btn {{ display: inline-block; background: linear-gradient(135deg, #38a169, #2f855a); color: white; padding: 15px 30px; text-decoration: none; border-radius: 25px; font-weight: bold; margin: 20px 0; }}
+        .footer {{ background: #f7fafc; padding: 20px; text-align: center; color: #718096; font-size: 12px; }}
+        .warning {{ background: #fff5f5; border: 1px solid #feb2b2; color: #742a2a; padding: 15px; border-radius: 8px; margin: 15px 0; }}
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <div class="logo">
+                <img src="https://lh3.googleusercontent.com/d/1LBhx-x_Si1-cmGqsRAVmheoz0tXvJ3UN" alt="HITK Logo">
+                <div>
+                    <h1 style="margin: 0; font-size: 24px;">Timely™</h1>
+                    <p style="margin: 5px 0 0 0; opacity: 0.9;">Smart Attendance System</p>
+                </div>
+                <img src="https://lh3.googleusercontent.com/d/1HfdfTfJKHXAsXbk06AroA-BLn8VcnqhA" alt="Timely Logo">
+            </div>
+        </div>
+        
+        <div class="content">
+            <h2 style="color: #2d3748; margin-bottom: 10px;">📍 Attendance Required</h2>
+            <p>Dear <strong>{student_name}</strong>,</p>
+            
+            <div class="attendance-card">
+                <h3 style="margin: 0 0 10px 0; color: #4a5568;">📚 {class_name}</h3>
+                <p style="margin: 5px 0;"><strong>🏫 Location:</strong> {room}</p>
+                <p style="margin: 5px 0;"><strong>⏰ Session:</strong> Active now (expires in 5 minutes)</p>
+            </div>
+            
+            <p>Your attendance is required for the above class session. Please mark your attendance by clicking the button below:</p>
+            
+            <div style="text-align: center;">
+                <a href="{attendance_url}" class="btn">📱 Mark My Attendance</a>
+            </div>
+            
+            <div class="warning">
+                <strong>⚠️ CRITICAL - READ CAREFULLY:</strong>
+                <ul style="margin: 10px 0; padding-left: 20px;">
+                    <li><strong>🚨 DISCONNECT FROM WIFI - Use Mobile Data Only</strong></li>
+                    <li>Multiple students on same WiFi will be flagged as proxy</li>
+                    <li>You must be physically present in the classroom</li>
+                    <li>Location verification is automatic</li>
+                    <li>Session expires in 5 minutes</li>
+                    <li>Enable location services on your device</li>
+                </ul>
+            </div>
+            
+            <p style="color: #718096; font-size: 14px; margin-top: 20px;">
+                If you're having trouble with the button, copy and paste this link:<br>
+                <span style="background: #f7fafc; padding: 5px; border-radius: 4px; word-break: break-all;">{attendance_url}</span>
+            </p>
+        </div>
+        
+        <div class="footer">
+            <p><strong>Heritage Institute of Technology, Kolkata</strong></p>
+            <p>Automated by Timely™ Smart Attendance System</p>
+            <p style="margin-top: 10px;">This is an automated message. Please do not reply to this email.</p>
+        </div>
+    </div>
+</body>
+</html>
+'''
     }
 }
 
@@ -83,6 +187,10 @@ def get_room_coordinates():
     """Get room coordinates configuration"""
     return ROOM_COORDINATES.copy()
 
+def get_room_geofences():
+    """Get room geofence configuration"""
+    return ROOM_GEOFENCES.copy()
+
 def get_attendance_settings():
     """Get attendance system settings"""
     return ATTENDANCE_SETTINGS.copy()
\ No newline at end of file
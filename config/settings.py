@@ -9,6 +9,7 @@ class Settings:
     LOG_LEVEL: str
     MAX_RETRIES: int
     CSP_MAX_TIME_SECONDS: int
+    CSP_DIVERSE_POOL: bool
     OUTPUT_DIR: str
     PDF_TITLE: str
     DAYS: list
@@ -22,6 +23,7 @@ def load_settings() -> Settings:
         LOG_LEVEL=os.getenv("LOG_LEVEL", "INFO"),
         MAX_RETRIES=int(os.getenv("MAX_RETRIES", "2")),
         CSP_MAX_TIME_SECONDS=int(os.getenv("CSP_MAX_TIME_SECONDS", "5")),
+        CSP_DIVERSE_POOL=os.getenv("CSP_DIVERSE_POOL", "0") == "1",
         OUTPUT_DIR=os.getenv("OUTPUT_DIR", "outputs"),
         PDF_TITLE=os.getenv("PDF_TITLE", "Automated Timetable"),
         DAYS=os.getenv("DAYS", "Mon,Tue,Wed").split(","),
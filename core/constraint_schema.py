@@ -14,6 +14,8 @@ class Subject(BaseModel):
     name: str
     teacher_id: str
     periods_per_week: int
+    # Size of the group taught; rooms with a smaller capacity are never considered
+    students: Optional[int] = None
 
 class Room(BaseModel):
     id: str
@@ -52,6 +54,7 @@ class AssignedCell(BaseModel):
     slot: SlotName
     subject_id: str
     teacher_id: str
+    room_id: Optional[str] = None
 
 class Timetable(BaseModel):
     class_name: str
@@ -72,6 +75,17 @@ class VerificationResult(BaseModel):
     errors: List[str] = Field(default_factory=list)
     warnings: List[str] = Field(default_factory=list)
 
+class ConstraintGroup(BaseModel):
+    """One switchable group of hard constraints, as reported in an infeasibility core"""
+    kind: Literal["availability", "periods", "max_periods_per_day", "room"]
+    description: str
+    teacher_id: Optional[str] = None
+    subject_id: Optional[str] = None
+
 class SolverResult(BaseModel):
     feasible_timetables: List[Timetable]
     status: Literal["FEASIBLE", "OPTIMAL", "INFEASIBLE", "UNKNOWN"]
+    # build_seconds, search_seconds, variables, constraints, wall_time, branches, conflicts, solutions
+    stats: Dict[str, float] = Field(default_factory=dict)
+    # INFEASIBLE only: a minimal set of groups that cannot all hold
+    core: List[ConstraintGroup] = Field(default_factory=list)
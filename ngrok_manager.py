@@ -3,6 +3,9 @@ import time
 import json
 import threading
 import os
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Callable, Optional
 from pyngrok import ngrok
 
 class NgrokManager:
@@ -59,27 +62,175 @@ class NgrokManager:
                 pass
             self.public_url = None
 
+# Public URL providers
+#
+# Attendance links must be reachable from students' phones, so each session
+# needs a public base URL. A URLProvider knows how to bring one up and down;
+# SharedTunnel keeps a single refcounted tunnel alive across overlapping
+# sessions and starts it in the background so callers only wait when they
+# actually need the URL.
+
+LOCAL_URL = "http://localhost:5000"
+TUNNEL_HOLD_SECONDS = 300      # each session keeps the tunnel for 5 minutes
+TUNNEL_START_TIMEOUT = 20      # how long a caller waits before falling back
+
+class URLProvider(ABC):
+    """Brings a public base URL up and down"""
+    name = "base"
+
+    @abstractmethod
+    def start(self) -> Optional[str]:
+        """Start the tunnel and return its public URL, or None on failure"""
+
+    @abstractmethod
+    def stop(self) -> None:
+        """Take the tunnel down"""
+
+class NgrokProvider(URLProvider):
+    name = "ngrok"
+
+    def __init__(self, manager: NgrokManager, port: int = 5000):
+        self.manager = manager
+        self.port = port
+
+    def start(self) -> Optional[str]:
+        return self.manager.start_ngrok(self.port)
+
+    def stop(self) -> None:
+        self.manager.stop_ngrok()
+
+class LocalURLProvider(URLProvider):
+    """Fixed URL with no tunnel; for offline use and tests"""
+    name = "local"
+
+    def __init__(self, url: str = LOCAL_URL, start_delay: float = 0.0, fail: bool = False):
+        self.url = url
+        self.start_delay = start_delay
+        self.fail = fail
+        self.starts = 0
+        self.stops = 0
+
+    def start(self) -> Optional[str]:
+        self.starts += 1
+        if self.start_delay:
+            time.sleep(self.start_delay)
+        if self.fail:
+            raise RuntimeError("local provider configured to fail")
+        return self.url
+
+    def stop(self) -> None:
+        self.stops += 1
+
+class TunnelLease:
+    """One user's hold on a SharedTunnel"""
+
+    def __init__(self, tunnel: "SharedTunnel", future: Future, on_release: Optional[Callable[[], None]] = None):
+        self._tunnel = tunnel
+        self._future = future
+        self._on_release = on_release
+        self._released = False
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+
+    def url(self, timeout: Optional[float] = TUNNEL_START_TIMEOUT) -> str:
+        """Public URL once the tunnel is up, or the fallback URL if it failed, is too slow or was released"""
+        if self._released:
+            # The tunnel may already be down; its URL no longer reaches this app
+            return self._tunnel.fallback_url
+        try:
+            return self._future.result(timeout) or self._tunnel.fallback_url
+        except FutureTimeout:
+            print(f"⚠️ Tunnel not ready after {timeout}s, falling back to {self._tunnel.fallback_url}")
+            return self._tunnel.fallback_url
+
+    @property
+    def is_public(self) -> bool:
+        return not self._released and self._future.done() and self._future.result() is not None
+
+    @property
+    def released(self) -> bool:
+        return self._released
+
+    def release(self) -> None:
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+            if self._timer is not None:
+                self._timer.cancel()
+        self._tunnel._release()
+        if self._on_release is not None:
+            self._on_release()
+
+class SharedTunnel:
+    def __init__(self, provider: URLProvider, fallback_url: str = LOCAL_URL):
+        self.provider = provider
+        self.fallback_url = fallback_url
+        self._lock = threading.Lock()
+        self._refs = 0
+        self._future: Optional[Future] = None
+        # One worker serialises start/stop so a restart never races a teardown
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tunnel")
+
+    @property
+    def refs(self) -> int:
+        return self._refs
+
+    def acquire(self, hold_seconds: Optional[float] = TUNNEL_HOLD_SECONDS,
+                on_release: Optional[Callable[[], None]] = None) -> TunnelLease:
+        """Take a hold on the tunnel, starting it in the background if it is not up.
+
+        The hold is released after hold_seconds, or earlier via lease.release();
+        on_release runs either way.
+        """
+        with self._lock:
+            self._refs += 1
+            future = self._future
+            failed = future is not None and future.done() and future.result() is None
+            if future is None or failed:
+                future = self._future = self._executor.submit(self._start)
+        lease = TunnelLease(self, future, on_release)
+        if hold_seconds:
+            lease._timer = threading.Timer(hold_seconds, lease.release)
+            lease._timer.daemon = True
+            lease._timer.start()
+        return lease
+
+    def _start(self) -> Optional[str]:
+        try:
+            return self.provider.start() or None
+        except Exception as e:
+            print(f"❌ Failed to start {self.provider.name} tunnel: {e}")
+            return None
+
+    def _release(self):
+        with self._lock:
+            self._refs -= 1
+            if self._refs > 0:
+                return
+            future, self._future = self._future, None
+        if future is not None:
+            self._executor.submit(self._stop, future)
+
+    def _stop(self, future: Future):
+        if future.result() is not None:
+            print(f"🛑 Closing {self.provider.name} tunnel, no active sessions left")
+            self.provider.stop()
+
 # Global ngrok manager instance
 ngrok_manager = NgrokManager()
 
+def _default_provider() -> URLProvider:
+    if os.getenv("PUBLIC_URL_PROVIDER", "ngrok") == "local":
+        return LocalURLProvider(os.getenv("PUBLIC_BASE_URL", LOCAL_URL))
+    return NgrokProvider(ngrok_manager)
+
+attendance_tunnel = SharedTunnel(_default_provider())
+
 def start_ngrok_for_attendance():
-    """Start ngrok for attendance session and auto-close after 5 minutes"""
-    import threading
-    import time
-    
-    # Start ngrok
-    ngrok_manager.start_ngrok()
-    
-    # Schedule auto-close after 5 minutes
-    def auto_close():
-        time.sleep(300)  # 5 minutes
-        print("⏰ Auto-closing ngrok tunnel after 5 minutes")
-        ngrok_manager.stop_ngrok()
-    
-    threading.Thread(target=auto_close, daemon=True).start()
-    
-    return ngrok_manager.public_url or "http://localhost:5000"
+    """Hold the shared tunnel for 5 minutes and return its URL (or localhost)"""
+    return attendance_tunnel.acquire(hold_seconds=TUNNEL_HOLD_SECONDS).url()
 
 def ensure_ngrok_running():
     """Get current ngrok URL or localhost"""
-    return ngrok_manager.public_url or "http://localhost:5000"
\ No newline at end of file
+    return ngrok_manager.public_url or LOCAL_URL
@@ -1,15 +1,50 @@
-from typing import List
+from typing import Dict, List
 from agents.constraint_parser import ConstraintParserAgent
 from agents.csp_solver import CSPSolverAgent
 from agents.timetable_optimizer import TimetableOptimizerAgent
 from agents.constraint_verifier import ConstraintVerifierAgent
 from agents.formatter import FormatterAgent
-from core.constraint_schema import ConstraintPackage, Timetable, SolverResult, VerificationResult
+from core.constraint_schema import ConstraintGroup, ConstraintPackage, Timetable, SolverResult, VerificationResult
 from utils.logging_utils import get_logger
+from utils.metrics import RunTrace
+from utils.profiling import profiled
 from config.settings import settings
 
 logger = get_logger("Orchestrator")
 
+class UnsatisfiableConstraints(RuntimeError):
+    """The hard constraints conflict; ``conflicts`` names the groups and the input lines behind them"""
+
+    def __init__(self, conflicts: List[Dict]):
+        self.conflicts = conflicts
+        lines = [line for c in conflicts for line in c["lines"]] or [c["constraint"] for c in conflicts]
+        detail = "; ".join(dict.fromkeys(lines))
+        super().__init__(f"Unsatisfiable hard constraints: {detail}" if detail else "Unsatisfiable hard constraints.")
+
+def _source_lines(group: ConstraintGroup, cp: ConstraintPackage, nl_constraints: List[str]) -> List[str]:
+    """The input lines a constraint group was parsed from (best effort: the parser keeps no provenance)"""
+    if group.kind == "availability":
+        teacher = next((t for t in cp.hard.teachers if t.id == group.teacher_id), None)
+        names = [teacher.name, teacher.name.replace("Prof. ", "")] if teacher else []
+        wanted = ("available", "availability")
+    elif group.kind == "periods":
+        subject = next((s for s in cp.hard.subjects if s.id == group.subject_id), None)
+        names = [group.subject_id] + ([subject.name] if subject else [])
+        wanted = ("period",)
+    elif group.kind == "room":
+        subject = next((s for s in cp.hard.subjects if s.id == group.subject_id), None)
+        names = [group.subject_id] + ([subject.name] if subject else [])
+        wanted = ("room", "student", "seat", "capacity")
+    else:
+        names = []
+        wanted = ("per day", "a day", "max")
+    lines = []
+    for line in nl_constraints:
+        text = line.lower()
+        if (not names or any(name.lower() in text for name in names)) and any(word in text for word in wanted):
+            lines.append(line)
+    return lines
+
 class Orchestrator:
     def __init__(self):
         self.parser = ConstraintParserAgent()
@@ -18,10 +53,31 @@ class Orchestrator:
         self.verifier = ConstraintVerifierAgent()
         self.formatter = FormatterAgent()
 
+    @profiled("orchestrator.run")
     def run(self, nl_constraints: List[str], max_solver_solutions: int = 6, allow_soft_relaxation: bool = True) -> dict:
+        """Parse, solve, score, verify and export; the result's "metrics" has per-stage timings"""
+        trace = RunTrace()
+        try:
+            result = self._run(trace, nl_constraints, max_solver_solutions, allow_soft_relaxation)
+        except Exception:
+            logger.warning(f"Pipeline failed; stages (s): {trace.finish('error')['stages']}")
+            raise
+        result["metrics"] = trace.finish("ok")
+        logger.info(f"Pipeline stages (s): {result['metrics']['stages']}")
+        return result
+
+    def _select(self, trace: RunTrace, candidates: List[Timetable], cp: ConstraintPackage):
+        with trace.span("score"):
+            best = self.optimizer.select_best(candidates, cp)
+        trace.count("optimizer_candidates_rescored", len(candidates))
+        return best
+
+    def _run(self, trace: RunTrace, nl_constraints: List[str], max_solver_solutions: int,
+             allow_soft_relaxation: bool) -> dict:
         for attempt in range(settings.MAX_RETRIES + 1):
             try:
-                cp: ConstraintPackage = self.parser.parse(nl_constraints)
+                with trace.span("parse", attempt + 1):
+                    cp: ConstraintPackage = self.parser.parse(nl_constraints)
                 logger.info("Constraints parsed and validated.")
                 break
             except Exception as e:
@@ -30,20 +86,32 @@ class Orchestrator:
                     raise
 
         for attempt in range(settings.MAX_RETRIES + 1):
-            sr: SolverResult = self.solver.solve(cp, max_solutions=max_solver_solutions)
+            with trace.span("solve", attempt + 1):
+                # CSP_DIVERSE_POOL=1 spends solve time on alternatives the verify fallback can use,
+                # rather than near-clones of the best
+                sr: SolverResult = self.solver.solve(cp, max_solutions=max_solver_solutions,
+                                                     diverse=settings.CSP_DIVERSE_POOL)
+            self._record_solver(trace, sr, attempt + 1)
             if sr.status in ("FEASIBLE", "OPTIMAL") and sr.feasible_timetables:
                 break
             logger.warning(f"CSP solve attempt {attempt+1} -> {sr.status}")
+            if sr.status == "INFEASIBLE":
+                # Proven infeasible: the same package would fail the same way on every retry
+                conflicts = [{"constraint": g.description, "kind": g.kind,
+                              "lines": _source_lines(g, cp, nl_constraints)} for g in sr.core]
+                logger.error(f"Hard constraints conflict: {conflicts}")
+                raise UnsatisfiableConstraints(conflicts)
             if attempt >= settings.MAX_RETRIES:
                 if allow_soft_relaxation:
-                    logger.error("Hard constraints unsatisfiable after retries. Aborting.")
-                raise RuntimeError("Unsatisfiable hard constraints.")
+                    logger.error("No timetable found within the solver time limit after retries. Aborting.")
+                raise RuntimeError(f"No feasible timetable found ({sr.status}) after {attempt+1} attempts.")
 
-        best_tt, score = self.optimizer.select_best(sr.feasible_timetables, cp)
+        best_tt, score = self._select(trace, sr.feasible_timetables, cp)
         logger.info(f"Best timetable soft score: {score:.3f}")
 
         for attempt in range(settings.MAX_RETRIES + 1):
-            vr: VerificationResult = self.verifier.verify(best_tt, cp)
+            with trace.span("verify", attempt + 1):
+                vr: VerificationResult = self.verifier.verify(best_tt, cp)
             if vr.passed and not vr.warnings:
                 logger.info("Verification passed with no warnings.")
                 break
@@ -54,7 +122,7 @@ class Orchestrator:
                 if not remaining:
                     logger.warning("No alternative timetables available, accepting with warnings.")
                     break
-                best_tt, score = self.optimizer.select_best(remaining, cp)
+                best_tt, score = self._select(trace, remaining, cp)
             else:
                 logger.error(f"Verification errors: {vr.errors}")
                 if attempt >= settings.MAX_RETRIES:
@@ -62,12 +130,27 @@ class Orchestrator:
                 remaining = [t for t in sr.feasible_timetables if t is not best_tt]
                 if not remaining:
                     raise RuntimeError("No alternative feasible timetable to try after verification failure.")
-                best_tt, score = self.optimizer.select_best(remaining, cp)
+                best_tt, score = self._select(trace, remaining, cp)
 
-        outputs = self.formatter.export(best_tt, base_filename="timetable")
+        with trace.span("export"):
+            outputs = self.formatter.export(best_tt, base_filename="timetable")
         return {
             "constraints": cp.model_dump(),
             "timetable": best_tt.model_dump(),
             "verification": vr.model_dump(),
             "outputs": outputs,
         }
+
+    @staticmethod
+    def _record_solver(trace: RunTrace, sr: SolverResult, attempt: int) -> None:
+        """The solve span's split into model build and CP-SAT search, and the search effort"""
+        stats = sr.stats
+        if not stats:
+            return
+        trace.registry.observe("timely_solver_build_seconds", stats["build_seconds"])
+        trace.registry.observe("timely_solver_search_seconds", stats["search_seconds"])
+        trace.registry.observe("timely_solver_wall_seconds", stats["wall_time"])
+        trace.count("solver_solutions", stats["solutions"])
+        trace.count("solver_branches", stats["branches"])
+        trace.count("solver_conflicts", stats["conflicts"])
+        trace.note("solver", {"attempt": attempt, "status": sr.status, **stats})
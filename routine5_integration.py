@@ -1,8 +1,8 @@
 import sqlite3
 import os
-import sys
 import shutil
 from datetime import datetime
+from Routine5_lab_advanced.engine import generate
 
 class Routine5Integration:
     def __init__(self):
@@ -57,40 +57,18 @@ class Routine5Integration:
         except Exception as e:
             return {'configured': False, 'error': str(e)}
     
-    def generate_timetables(self):
+    def generate_timetables(self, options=None):
         """Generate timetables using Routine5 exact logic"""
         try:
-            # Add Routine5 path to sys.path temporarily
-            if self.routine5_path not in sys.path:
-                sys.path.insert(0, self.routine5_path)
-            
-            # Import Routine5 modules
-            from app import generate_timetable, app
-            
             # Check database status
             status = self.check_database_status()
             if not status['configured']:
                 return {'success': False, 'error': status['error']}
             
-            dept_id = status['department_id']
-            
-            # Call Routine5 generation function
-            # Monkey patch the request to simulate POST data
-            import flask
-            with app.test_request_context('/api/generate_timetable', method='POST', json={'department_id': dept_id}):
-                response = generate_timetable()
-                result = response.get_json()
-            
-            # Clean up sys.path
-            if self.routine5_path in sys.path:
-                sys.path.remove(self.routine5_path)
-            
-            return result
+            result = generate(status['department_id'], self.db_path, options)
+            return result.to_dict()
             
         except Exception as e:
-            # Clean up sys.path on error
-            if self.routine5_path in sys.path:
-                sys.path.remove(self.routine5_path)
             return {'success': False, 'error': str(e)}
     
     def get_output_files(self):
@@ -6,37 +6,17 @@ Setup script for Notice Board functionality
 import sqlite3
 import json
 from datetime import datetime
+from utils.db_utils import get_db
+from attendance.migrations import migrate
 
 def setup_notice_board_tables():
     """Create notice board and room tables"""
+    # Tables come from the versioned attendance schema
+    migrate(get_db('attendance.db'))
+    
     conn = sqlite3.connect('attendance.db')
     cursor = conn.cursor()
     
-    # Create notice board table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS notice_board (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            content TEXT NOT NULL,
-            type TEXT DEFAULT 'timetable',
-            published_by TEXT NOT NULL,
-            published_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            is_active BOOLEAN DEFAULT 1,
-            timetable_data TEXT
-        )
-    ''')
-    
-    # Create rooms table with coordinates
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS rooms (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            room_number TEXT UNIQUE NOT NULL,
-            latitude REAL,
-            longitude REAL,
-            radius INTEGER DEFAULT 5
-        )
-    ''')
-    
     # Insert default rooms
     rooms = [
         ('303', 22.5184833, 88.4168668, 5),
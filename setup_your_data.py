@@ -1,7 +1,12 @@
 import sqlite3
+from utils.db_utils import get_db
+from attendance.migrations import migrate
 
 def setup_your_students():
     """Clean database and add your specific students"""
+    # Tables come from the versioned attendance schema
+    migrate(get_db('attendance.db'))
+    
     conn = sqlite3.connect('attendance.db')
     cursor = conn.cursor()
     
@@ -33,17 +38,6 @@ def setup_your_students():
         ('306', 22.5185400, 88.4169600, 5)
     ]
     
-    # Create rooms table if not exists
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS rooms (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            room_number TEXT UNIQUE NOT NULL,
-            latitude REAL,
-            longitude REAL,
-            radius INTEGER DEFAULT 5
-        )
-    ''')
-    
     for room in rooms:
         cursor.execute('''
             INSERT OR REPLACE INTO rooms (room_number, latitude, longitude, radius)
@@ -0,0 +1,50 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only the routes that need these import them
+DEFERRED = ('ortools', 'reportlab', 'pandas', 'openpyxl', 'google.generativeai', 'pyngrok', 'requests',
+            'numpy', 'attendance_system', 'orchestrator.orchestrator')
+
+# Cumulative `python -X importtime -c "import app"` for app, in microseconds (about 0.2 s
+# here, 0.9 s before the solver, agents and attendance system were deferred)
+IMPORT_BUDGET_US = 500_000
+
+def _import_app(cwd):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    script = ('import json, sys, app; '
+              f'print(json.dumps(sorted(m for m in {DEFERRED!r} if m in sys.modules)))')
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', script], cwd=cwd, env=env,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    cumulative = next(int(line.split('|')[1]) for line in result.stderr.splitlines()
+                      if line.startswith('import time:') and line.split('|')[2].strip() == 'app')
+    return json.loads(result.stdout.strip().splitlines()[-1]), cumulative
+
+def test_importing_app_is_cheap(tmp_path):
+    _import_app(tmp_path)  # warm the bytecode cache
+    loaded, cumulative = _import_app(tmp_path)
+    assert loaded == []
+    assert not (tmp_path / 'attendance.db').exists()
+    assert cumulative < IMPORT_BUDGET_US, f'import app took {cumulative / 1000:.0f} ms'
+
+def test_attendance_system_is_built_on_first_use(tmp_path, monkeypatch):
+    import app as webapp
+    from utils.lazy import Lazy
+
+    monkeypatch.setattr(webapp, 'ATTENDANCE_DB', str(tmp_path / 'attendance.db'))
+    monkeypatch.setattr(webapp, 'attendance_system', Lazy(webapp._attendance_system))
+    monkeypatch.setattr(webapp, 'db', Lazy(lambda: webapp.attendance_system.db))
+    assert not webapp.attendance_system.ready
+
+    client = webapp.create_app().test_client()
+    assert client.get('/').status_code == 200
+    assert not webapp.attendance_system.ready and not (tmp_path / 'attendance.db').exists()
+
+    with client.session_transaction() as s:
+        s['user'] = s['role'] = 'faculty'
+    assert '303' in client.get('/api/rooms').get_json()
+    assert webapp.attendance_system.ready and webapp.db.get() is webapp.attendance_system.db
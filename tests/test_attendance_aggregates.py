@@ -0,0 +1,39 @@
+from tests.test_attendance_marking import LAT, LNG, _system
+
+def _run_session(system, marks):
+    session_id = system.create_attendance_session('cse-cse-b', 'Algorithms', 'Room 101', LAT, LNG)
+    for student_id, lat in marks:
+        system.mark_attendance(session_id, student_id, lat, LNG, f'10.0.0.{student_id}')
+    assert system.end_session(session_id)
+    return session_id
+
+def test_ended_sessions_are_counted_once(tmp_path):
+    system, first = _system(tmp_path)
+    system.mark_attendance(first, 101, LAT, LNG, '10.0.0.1')
+    system.end_session(first)
+    _run_session(system, [(101, LAT), (102, LAT + 0.01)])
+    _run_session(system, [(101, LAT)])
+    _run_session(system, [(102, LAT)])
+
+    assert not system.aggregates.apply_session(first)
+    assert system.aggregates.backfill() == 0
+
+    totals = {row['student_id']: row for row in system.aggregates.class_percentages('cse-cse-b')}
+    assert (totals[101]['sessions'], totals[101]['present'], totals[101]['percentage']) == (4, 3, 75.0)
+    assert (totals[102]['present'], totals[102]['absent'], totals[102]['not_clicked']) == (1, 1, 2)
+    assert [row['student_id'] for row in system.aggregates.defaulters('cse-cse-b')] == [102]
+    assert system.aggregates.defaulters('cse-cse-b', threshold=75.0001)[-1]['student_id'] == 101
+    assert system.aggregates.student(101)[0]['percentage'] == 75.0
+
+    day, = system.aggregates.trend('cse-cse-b')
+    assert (day['sessions'], day['present'], day['absent'], day['not_clicked']) == (4, 4, 1, 3)
+
+def test_backfill_picks_up_sessions_ended_elsewhere(tmp_path):
+    system, session_id = _system(tmp_path)
+    system.mark_attendance(session_id, 101, LAT, LNG, '10.0.0.1')
+    with system.db.transaction() as cursor:
+        cursor.execute('UPDATE attendance_sessions SET is_active = 0 WHERE id = ?', (session_id,))
+
+    assert system.aggregates.backfill() == 1
+    assert system.aggregates.backfill() == 0
+    assert [row['present'] for row in system.aggregates.class_percentages('cse-cse-b')] == [0, 1]
@@ -0,0 +1,52 @@
+from attendance.geofence import GeofenceIndex, RoomGeometry
+from tests.test_attendance_marking import LAT, LNG, _system
+
+# About 11 m north-south and 10 m east-west around the teacher's position
+BOUNDS = [LAT - 0.00005, LNG - 0.00005, LAT + 0.00005, LNG + 0.00005]
+
+def test_polygon_distance_and_locate():
+    room = RoomGeometry.from_json('Room 101', {'bounds': BOUNDS, 'tolerance': 2})
+    outside = room.outside_distance([LAT, LAT + 0.00005, LAT + 0.0001], [LNG, LNG, LNG])
+    assert outside[0] == 0 and outside[1] < 0.01
+    assert 5.4 < outside[2] < 5.7
+    assert list(room.contains([LAT, LAT + 0.00006, LAT + 0.0001], [LNG] * 3)) == [True, True, False]
+
+    triangle = RoomGeometry.from_json('T', {'polygon': [[LAT, LNG], [LAT + 0.001, LNG], [LAT, LNG + 0.001]]})
+    assert list(triangle.contains([LAT + 0.0002, LAT + 0.0008], [LNG + 0.0002, LNG + 0.0008])) == [True, False]
+
+    # Adjacent rooms sharing a wall, plus a radius room far away
+    west = RoomGeometry.rectangle('West', LAT, LNG, LAT + 0.0001, LNG + 0.0001, tolerance=1)
+    east = RoomGeometry.rectangle('East', LAT, LNG + 0.0001, LAT + 0.0001, LNG + 0.0002, tolerance=1)
+    far = RoomGeometry.circle('Far', LAT + 0.01, LNG, 30)
+    index = GeofenceIndex([west, east, far])
+    lats = [LAT + 0.00005, LAT + 0.00005, LAT + 0.00005, LAT + 0.0101, LAT - 0.001]
+    lngs = [LNG + 0.00002, LNG + 0.00018, LNG + 0.000099, LNG, LNG]
+    assert index.locate(lats, lngs) == ['West', 'East', 'West', 'Far', None]
+
+def test_marking_and_recheck_with_room_polygon(tmp_path):
+    system, _ = _system(tmp_path)
+    system.set_room_geofence('Room 101', {'bounds': BOUNDS, 'tolerance': 0})
+    session_id = system.create_attendance_session('cse-cse-b', 'Algorithms', 'Room 101', LAT, LNG)
+
+    # 8 m north is inside the 50 m radius but outside the room
+    assert system.mark_attendance(session_id, 101, LAT, LNG, '10.0.0.1')['status'] == 'present'
+    result = system.mark_attendance(session_id, 102, LAT + 0.00008, LNG, '10.0.0.2')
+    assert result['status'] == 'absent' and result['required_distance'] == 0
+    assert system.end_session(session_id)
+    assert [row['present'] for row in system.aggregates.class_percentages('cse-cse-b')] == [0, 1]
+
+    # The room turns out to be deeper than first surveyed
+    south, west, north, east = BOUNDS
+    system.set_room_geofence('Room 101', {'bounds': [south, west, north + 0.0001, east], 'tolerance': 0})
+    report, = system.recheck_attendance(session_id=session_id)
+    assert report['checked'] == 2 and not report['applied']
+    change, = report['changed']
+    assert (change['student_id'], change['old_status'], change['new_status']) == (102, 'absent', 'present')
+    assert change['located_room'] == 'Room 101'
+
+    report, = system.recheck_attendance(session_id=session_id, apply=True)
+    assert report['applied']
+    assert system.recheck_attendance(session_id=session_id)[0]['changed'] == []
+    assert [row['present'] for row in system.aggregates.class_percentages('cse-cse-b')] == [1, 1]
+    day, = system.aggregates.trend('cse-cse-b')
+    assert (day['present'], day['absent']) == (2, 0)
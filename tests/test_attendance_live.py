@@ -0,0 +1,55 @@
+import json
+import threading
+from attendance.live import SessionCounters, event_stream
+from tests.test_attendance_marking import LAT, LNG, _system
+
+def _events(chunks):
+    events = []
+    for chunk in chunks:
+        if chunk.startswith('event: '):
+            name, data = chunk.split('\n')[:2]
+            events.append((name[len('event: '):], json.loads(data[len('data: '):])))
+    return events
+
+def test_counters_follow_marks(tmp_path):
+    system, session_id = _system(tmp_path)
+    counters = system.marking.counters(session_id)
+    assert counters.snapshot()['not_clicked'] == 2
+
+    system.mark_attendance(session_id, 101, LAT, LNG, '10.0.0.1')
+    system.mark_attendance(session_id, 101, LAT, LNG, '10.0.0.1')   # duplicate: no change
+    system.mark_attendance(session_id, 102, LAT + 0.01, LNG, '10.0.0.2')
+    snapshot = counters.snapshot()
+    assert (snapshot['present'], snapshot['absent'], snapshot['not_clicked'], snapshot['total']) == (1, 1, 0, 2)
+    assert counters.wait(0, 0) == [{'present': 1, 'not_clicked': -1, 'version': 1},
+                                   {'absent': 1, 'not_clicked': -1, 'version': 2}]
+
+    # A fresh engine rebuilds the counters from the stored records
+    system.marking._sessions.clear()
+    rebuilt = system.marking.counters(session_id).snapshot()
+    assert (rebuilt['present'], rebuilt['absent']) == (1, 1)
+
+def test_stream_pushes_deltas_until_session_ends(tmp_path):
+    system, session_id = _system(tmp_path)
+    stream = event_stream(system.marking.counters(session_id), keepalive=0.05)
+    chunks = [next(stream)]
+
+    reader = threading.Thread(target=lambda: chunks.extend(stream))
+    reader.start()
+    system.mark_attendance(session_id, 101, LAT, LNG, '10.0.0.1')
+    system.end_session(session_id)
+    reader.join(5)
+    assert not reader.is_alive()
+
+    events = _events(chunks)
+    assert events[0] == ('snapshot', {'version': 0, 'present': 0, 'absent': 0, 'not_clicked': 2,
+                                      'total': 2, 'ended': False})
+    assert events[1] == ('delta', {'present': 1, 'not_clicked': -1, 'version': 1})
+    assert events[-1][0] == 'end'
+
+def test_reader_too_far_behind_gets_snapshot():
+    counters = SessionCounters(total=500, history=4)
+    for _ in range(10):
+        counters.record('present')
+    assert counters.wait(2, 0) is None
+    assert counters.wait(7, 0) == [{'present': 1, 'not_clicked': -1, 'version': v} for v in (8, 9, 10)]
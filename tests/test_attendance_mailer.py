@@ -0,0 +1,179 @@
+import smtplib
+import socket
+import threading
+from email.mime.text import MIMEText
+import pytest
+
+pytest.importorskip("aiosmtpd")
+from aiosmtpd.controller import Controller
+
+from attendance.mailer import SMTPDispatcher
+
+class _Sink:
+    def __init__(self):
+        self.received = []
+        self.lock = threading.Lock()
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("refused@"):
+            return "550 no such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        with self.lock:
+            self.received.extend(envelope.rcpt_tos)
+        return "250 Message accepted"
+
+@pytest.fixture
+def smtp_server():
+    sink = _Sink()
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    controller = Controller(sink, hostname="127.0.0.1", port=port)
+    controller.start()
+    yield sink, {"smtp_server": "127.0.0.1", "smtp_port": controller.port,
+                 "email": "noreply@example.edu", "use_tls": False}
+    controller.stop()
+
+def _messages(n, domain="example.edu"):
+    out = []
+    for i in range(n):
+        msg = MIMEText(f"Hello {i}")
+        msg["From"] = "noreply@example.edu"
+        msg["To"] = f"s{i}@{domain}"
+        msg["Subject"] = "Attendance Required"
+        out.append((msg["To"], msg))
+    return out
+
+def test_parallel_delivery_with_connection_cap(smtp_server):
+    sink, config = smtp_server
+    connections = []
+
+    def factory(*args, **kwargs):
+        connections.append(1)
+        return smtplib.SMTP(*args, **kwargs)
+
+    with SMTPDispatcher(config, pool_size=3, max_messages_per_connection=5, smtp_factory=factory) as dispatcher:
+        results = dispatcher.send(_messages(25))
+
+    assert [r.recipient for r in results] == [f"s{i}@example.edu" for i in range(25)]
+    assert all(r.success for r in results)
+    assert sorted(sink.received) == sorted(r.recipient for r in results)
+    assert len(connections) >= 5
+
+def test_reconnects_after_failure_and_reports_refused(smtp_server):
+    sink, config = smtp_server
+    failed = []
+
+    class Flaky(smtplib.SMTP):
+        def send_message(self, *args, **kwargs):
+            if not failed:
+                failed.append(1)
+                raise smtplib.SMTPServerDisconnected("connection dropped")
+            return super().send_message(*args, **kwargs)
+
+    messages = _messages(3) + [("refused@example.edu", _messages(1)[0][1])]
+    with SMTPDispatcher(config, pool_size=1, smtp_factory=Flaky) as dispatcher:
+        results = dispatcher.send(messages)
+
+    assert [r.success for r in results] == [True, True, True, False]
+    assert results[0].attempts == 2
+    assert "refused" in results[3].error
+    assert len(sink.received) == 3
+
+def _outbox(tmp_path, config, **kwargs):
+    from attendance.outbox import Outbox
+    from utils.db_utils import ConnectionManager
+    return Outbox(ConnectionManager(str(tmp_path / "attendance.db")), config, base_backoff=0, **kwargs)
+
+def test_outbox_delivers_queued_rows(smtp_server, tmp_path):
+    sink, config = smtp_server
+    outbox = _outbox(tmp_path, config)
+    rows = [(f"s{i}@example.edu", "Attendance Required", f"<p>{i}</p>", None) for i in range(5)]
+
+    assert outbox.enqueue("session-1", rows) == 5
+    assert outbox.enqueue("session-1", rows[:2]) == 0
+    assert outbox.status("session-1")["queued"] == 5
+
+    assert outbox.drain_once() == 5
+    assert outbox.drain_once() == 0
+    assert outbox.status("session-1") == {"queued": 0, "sending": 0, "sent": 5, "failed": 0, "total": 5}
+    assert len(sink.received) == 5
+    outbox.stop()
+
+def test_outbox_retries_then_fails(smtp_server, tmp_path):
+    sink, config = smtp_server
+    outbox = _outbox(tmp_path, config, max_attempts=2)
+    outbox.enqueue("session-1", [("refused@example.edu", "Attendance Required", "<p>x</p>", "x"),
+                                 ("ok@example.edu", "Attendance Required", "<p>x</p>", "x")])
+
+    outbox.drain_once()
+    assert outbox.status("session-1")["queued"] == 1
+    outbox.drain_once()
+    assert outbox.status("session-1") == {"queued": 0, "sending": 0, "sent": 1, "failed": 1, "total": 2}
+    assert outbox.failures("session-1")[0]["recipient"] == "refused@example.edu"
+    outbox.stop()
+
+def test_outbox_background_sender(smtp_server, tmp_path):
+    import time
+    sink, config = smtp_server
+    outbox = _outbox(tmp_path, config)
+    outbox.start()
+    outbox.enqueue("session-1", [("a@example.edu", "Attendance Required", "<p>x</p>", None)])
+    deadline = time.time() + 5
+    while outbox.status("session-1")["sent"] != 1 and time.time() < deadline:
+        time.sleep(0.02)
+    outbox.stop()
+    assert sink.received == ["a@example.edu"]
+
+class _Recorder:
+    """Dispatcher stand-in that keeps the messages it is asked to send"""
+    def __init__(self):
+        self.sent = []
+
+    def send(self, messages):
+        from attendance.mailer import DeliveryResult
+        messages = list(messages)
+        self.sent.extend(messages)
+        return [DeliveryResult(recipient, True) for recipient, _ in messages]
+
+    def close(self):
+        pass
+
+def test_queueing_does_not_wait_for_the_tunnel(tmp_path, monkeypatch):
+    import time
+    import ngrok_manager
+    from attendance.outbox import Outbox
+    from tests.test_attendance_marking import LAT, LNG, _system
+
+    provider = ngrok_manager.LocalURLProvider("https://tunnel.example", start_delay=0.5)
+    monkeypatch.setattr(ngrok_manager, "attendance_tunnel", ngrok_manager.SharedTunnel(provider))
+    system, session_id = _system(tmp_path)
+    recorder = _Recorder()
+    system.outbox = Outbox(system.db, {"email": "noreply@example.edu"}, dispatcher=recorder,
+                           base_url=system._session_base_url)
+
+    started = time.perf_counter()
+    students = system.get_students_by_class("cse-cse-b")
+    assert system.queue_attendance_emails(students, session_id, "Algorithms", "Room 101",
+                                          {"email": "noreply@example.edu"}) == 2
+    assert time.perf_counter() - started < 0.3
+
+    deadline = time.time() + 5
+    while system.get_email_status(session_id)["sent"] != 2 and time.time() < deadline:
+        time.sleep(0.02)
+    system.outbox.stop()
+    from email import message_from_bytes
+    bodies = ["".join(part.get_payload(decode=True).decode() for part in message_from_bytes(message).walk()
+                      if not part.is_multipart())
+              for _, message in recorder.sent]
+    assert len(bodies) == 2 and all("https://tunnel.example/mark-attendance/" in body for body in bodies)
+    assert not any("{base_url}" in body for body in bodies)
+
+    # When the hold runs out the lease is forgotten and retries get the fallback URL
+    system._tunnel_leases[session_id].release()
+    assert session_id not in system._tunnel_leases
+    assert system._session_base_url(session_id) == ngrok_manager.attendance_tunnel.fallback_url
+    system.end_session(session_id)
@@ -0,0 +1,124 @@
+import sqlite3
+import time
+from attendance_system import LocationBasedAttendanceSystem
+from attendance import marking
+from attendance.marking import MarkingEngine
+from attendance.write_behind import WriteBehindQueue
+from utils.db_utils import ConnectionManager
+
+SCHEMA = '''
+    CREATE TABLE students (id INTEGER PRIMARY KEY, name TEXT NOT NULL, email TEXT NOT NULL,
+                           roll_number TEXT UNIQUE NOT NULL, class_id TEXT NOT NULL, semester INTEGER NOT NULL);
+    CREATE TABLE attendance_sessions (id TEXT PRIMARY KEY, class_id TEXT NOT NULL, class_name TEXT NOT NULL,
+                                      room TEXT NOT NULL, teacher_lat REAL NOT NULL, teacher_lng REAL NOT NULL,
+                                      radius INTEGER NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                                      ended_at TIMESTAMP, is_active BOOLEAN DEFAULT 1);
+    CREATE TABLE attendance_records (id INTEGER PRIMARY KEY, session_id TEXT NOT NULL, student_id INTEGER NOT NULL,
+                                     marked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, student_lat REAL, student_lng REAL,
+                                     distance REAL, status TEXT DEFAULT 'present', client_ip TEXT);
+'''
+
+LAT, LNG = 22.5184833, 88.4168668
+
+def _system(tmp_path):
+    db_path = str(tmp_path / "attendance.db")
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+    conn.executemany("INSERT INTO students VALUES (?, ?, ?, ?, 'cse-cse-b', 3)",
+                     [(101, 'Chhanda', 'a@example.edu', 'CIV101'), (102, 'Mondal', 'b@example.edu', 'CIV102')])
+    conn.commit()
+    conn.close()
+    system = LocationBasedAttendanceSystem(db_path)
+    session_id = system.create_attendance_session('cse-cse-b', 'Algorithms', 'Room 101', LAT, LNG)
+    return system, session_id
+
+def test_mark_rules(tmp_path):
+    system, session_id = _system(tmp_path)
+
+    result = system.mark_attendance(session_id, 101, LAT, LNG, '10.0.0.1')
+    assert result['success'] and result['status'] == 'present'
+    assert system.mark_attendance(session_id, 101, LAT, LNG, '10.0.0.9')['message'] == 'Attendance already marked'
+    assert system.mark_attendance(session_id, 102, LAT, LNG, '10.0.0.1')['message'].startswith('Proxy detected')
+    assert system.mark_attendance(session_id, 102, LAT + 0.01, LNG, '10.0.0.2')['status'] == 'absent'
+    assert system.mark_attendance('missing', 101, LAT, LNG, '10.0.0.3')['message'] == 'Invalid session'
+    assert system.get_attendance_stats(session_id) == {'total_marked': 2, 'present': 1, 'absent': 1}
+
+    assert system.end_session(session_id)
+    assert system.mark_attendance(session_id, 103, LAT, LNG, '10.0.0.4')['message'] == 'Session has ended'
+
+def test_roster_lookup(tmp_path):
+    system, session_id = _system(tmp_path)
+    assert system.marking.student_id_for_email(session_id, 'b@example.edu') == 102
+    assert system.marking.student_id_for_email(session_id, 'nobody@example.edu') is None
+
+def test_database_enforces_uniqueness_across_processes(tmp_path):
+    system, session_id = _system(tmp_path)
+    assert system.mark_attendance(session_id, 101, LAT, LNG, '10.0.0.1')['success']
+
+    # A second engine with its own (stale) cache stands in for another worker process
+    other = MarkingEngine(ConnectionManager(system.db_path))
+    other.get_session(session_id).students.clear()
+    other.get_session(session_id).ips.clear()
+    assert other.mark(session_id, 101, LAT, LNG, '10.0.0.5')['message'] == 'Attendance already marked'
+    assert other.mark(session_id, 102, LAT, LNG, '10.0.0.1')['message'].startswith('Proxy detected')
+    assert system.get_attendance_stats(session_id)['total_marked'] == 1
+
+def _count(system, session_id):
+    return system.db.connection().execute(
+        'SELECT COUNT(*) FROM attendance_records WHERE session_id = ?', (session_id,)).fetchone()[0]
+
+def test_write_behind_flushes_on_session_end(tmp_path):
+    system, _ = _system(tmp_path)
+    system.marking.writer = WriteBehindQueue(system.db, flush_interval_ms=60000, batch_size=1000)
+    session_id = system.create_attendance_session('cse-cse-b', 'Algorithms', 'Room 101', LAT, LNG)
+
+    assert system.mark_attendance(session_id, 101, LAT, LNG, '10.0.0.1')['success']
+    assert system.mark_attendance(session_id, 101, LAT, LNG, '10.0.0.1')['message'] == 'Attendance already marked'
+    assert system.mark_attendance(session_id, 102, LAT, LNG, '10.0.0.1')['message'].startswith('Proxy detected')
+    assert _count(system, session_id) == 0 and system.marking.writer.unflushed == 1
+
+    assert system.end_session(session_id)
+    assert _count(system, session_id) == 1 and system.marking.writer.unflushed == 0
+    system.marking.writer.close()
+
+def test_write_behind_window_is_bounded(tmp_path):
+    system, session_id = _system(tmp_path)
+    system.marking.writer = WriteBehindQueue(system.db, flush_interval_ms=60000, batch_size=1000, max_unflushed=1)
+
+    assert system.mark_attendance(session_id, 101, LAT, LNG, '10.0.0.1')['success']
+    assert system.mark_attendance(session_id, 102, LAT, LNG, '10.0.0.2')['success']
+    # The second submit had to commit the first before it was acknowledged
+    assert _count(system, session_id) == 1 and system.marking.writer.unflushed == 1
+    system.marking.writer.close()
+    assert _count(system, session_id) == 2
+
+def test_taps_between_end_and_the_database_update_are_rejected(tmp_path, monkeypatch):
+    system, session_id = _system(tmp_path)
+    system.marking.writer = WriteBehindQueue(system.db, flush_interval_ms=60000, batch_size=1000)
+    assert system.mark_attendance(session_id, 101, LAT, LNG, '10.0.0.1')['success']
+
+    # end() has run but attendance_sessions still says is_active=1
+    system.marking.end(session_id)
+    assert system.mark_attendance(session_id, 102, LAT, LNG, '10.0.0.2')['message'] == 'Session has ended'
+    assert system.marking.writer.unflushed == 0 and _count(system, session_id) == 1
+    assert system.end_session(session_id)
+    assert system.marking.counters(session_id).snapshot()['present'] == 1
+
+    # Another worker that never cached the session ends it the same way
+    other = MarkingEngine(ConnectionManager(system.db_path))
+    live = system.create_attendance_session('cse-cse-b', 'Algorithms', 'Room 101', LAT, LNG)
+    other.end(live)
+    assert other.mark(live, 101, LAT, LNG, '10.0.0.3')['message'] == 'Session has ended'
+
+    # Ended sessions loaded from the database are not cached
+    fresh = MarkingEngine(ConnectionManager(system.db_path))
+    assert fresh.counters(session_id) is not None and session_id not in fresh._sessions
+
+    # Tombstones expire: a later end() drops the ones older than tombstone_seconds
+    assert session_id in system.marking._sessions
+    later = time.monotonic() + marking.TOMBSTONE_SECONDS
+    monkeypatch.setattr(marking.time, 'monotonic', lambda: later)
+    system.end_session(system.create_attendance_session('cse-cse-b', 'Algorithms', 'Room 101', LAT, LNG))
+    assert session_id not in system.marking._sessions
+    assert system.marking.counters(session_id).snapshot()['present'] == 1
+    system.marking.writer.close()
@@ -0,0 +1,60 @@
+import sqlite3
+from attendance.migrations import LATEST_VERSION, migrate, schema_version
+from utils.db_utils import ConnectionManager
+
+LEGACY_RECORDS = '''
+    CREATE TABLE attendance_records (id INTEGER PRIMARY KEY, session_id TEXT NOT NULL, student_id INTEGER NOT NULL,
+                                     marked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, student_lat REAL, student_lng REAL,
+                                     distance REAL, status TEXT DEFAULT 'present', client_ip TEXT);
+'''
+
+def _indexes(db):
+    return {row[0] for row in db.connection().execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND name NOT LIKE 'sqlite_%'")}
+
+def test_fresh_database_migrates_to_latest(tmp_path):
+    db = ConnectionManager(str(tmp_path / "attendance.db"))
+    assert schema_version(db) == 0
+    assert migrate(db) == LATEST_VERSION
+    assert {'ux_attendance_records_session_student', 'ux_attendance_records_session_ip',
+            'ix_students_class', 'ix_email_outbox_due'} <= _indexes(db)
+
+    # Already current: nothing to do
+    assert migrate(db) == LATEST_VERSION
+    db.close_all()
+
+def test_legacy_duplicates_are_set_aside_before_unique_indexes(tmp_path):
+    db_path = str(tmp_path / "attendance.db")
+    conn = sqlite3.connect(db_path)
+    conn.executescript(LEGACY_RECORDS)
+    conn.executemany("INSERT INTO attendance_records (id, session_id, student_id, client_ip) VALUES (?, ?, ?, ?)", [
+        (1, 's1', 101, '10.0.0.1'),
+        (2, 's1', 101, '10.0.0.2'),   # same student marked twice
+        (3, 's1', 102, '10.0.0.1'),   # proxy from the same IP
+        (4, 's1', 103, None),
+        (5, 's1', 104, None),
+    ])
+    conn.commit()
+    conn.close()
+
+    db = ConnectionManager(db_path)
+    assert migrate(db) == LATEST_VERSION
+    rows = db.connection().execute("SELECT id, client_ip FROM attendance_records ORDER BY id").fetchall()
+    assert rows == [(1, '10.0.0.1'), (3, None), (4, None), (5, None)]
+    # Nothing is deleted outright: the duplicate and the shared IP are kept for review
+    aside = db.connection().execute(
+        "SELECT id, student_id, client_ip, reason FROM attendance_records_set_aside ORDER BY id").fetchall()
+    assert aside == [(2, 101, '10.0.0.2', 'duplicate mark'), (3, 102, '10.0.0.1', 'shared ip')]
+
+    plan = db.connection().execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM attendance_records WHERE session_id = ? AND student_id = ?",
+        ('s1', 101)).fetchall()
+    assert 'ux_attendance_records_session_student' in plan[0][-1]
+    db.close_all()
+
+def test_migrate_to_target_version(tmp_path):
+    db = ConnectionManager(str(tmp_path / "attendance.db"))
+    assert migrate(db, target=1) == 1
+    assert 'ux_attendance_records_session_student' not in _indexes(db)
+    assert migrate(db) == LATEST_VERSION
+    db.close_all()
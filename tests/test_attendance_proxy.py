@@ -0,0 +1,53 @@
+from attendance.marking import MarkingEngine
+from attendance.proxy import flag_session
+from tests.test_attendance_marking import LAT, LNG, _system
+
+# 1e-6 degrees of latitude is about 11 cm
+CM_11 = 0.000001
+
+def _add_students(system, *ids):
+    with system.db.transaction() as cursor:
+        cursor.executemany("INSERT INTO students VALUES (?, ?, ?, ?, 'cse-cse-b', 3)",
+                           [(i, f'Student {i}', f'{i}@example.edu', f'CIV{i}') for i in ids])
+
+def test_device_and_location_checks(tmp_path):
+    system, session_id = _system(tmp_path)
+    assert system.mark_attendance(session_id, 101, LAT, LNG, '10.0.0.1', 'phone-a')['success']
+    result = system.mark_attendance(session_id, 102, LAT, LNG, '10.0.0.2', 'phone-a')
+    assert result['message'].startswith('Proxy detected! This device')
+
+    # Another worker's cache is rebuilt from the stored marks, devices included
+    other = MarkingEngine(system.db, block_colocated=True)
+    assert other.get_session(session_id).proxy.devices == {'phone-a': 101}
+    result = other.mark(session_id, 102, LAT + CM_11, LNG, '10.0.0.2', 'phone-b')
+    assert result['message'].startswith('Proxy detected! Another student')
+    assert other.mark(session_id, 102, LAT + 50 * CM_11, LNG, '10.0.0.2', 'phone-b')['success']
+
+def test_session_end_flags_colocated_marks(tmp_path):
+    system, session_id = _system(tmp_path)
+    _add_students(system, 103, 104)
+    system.mark_attendance(session_id, 101, LAT, LNG, '10.0.0.1', 'phone-a')
+    system.mark_attendance(session_id, 102, LAT + CM_11, LNG, '10.0.0.2', 'phone-b')
+    system.mark_attendance(session_id, 103, LAT + 6 * CM_11, LNG, '10.0.0.3', 'phone-c')
+    system.mark_attendance(session_id, 104, LAT + 0.0002, LNG, '10.0.0.4', 'phone-d')
+    assert system.end_session(session_id)
+
+    # 103 sits in the same cluster, but colocated + burst stays below the threshold
+    flags = {f['student_id']: f for f in system.get_proxy_flags(session_id)}
+    assert sorted(flags) == [101, 102]
+    assert flags[101]['reasons'] == ['colocated', 'same_spot', 'burst'] and flags[101]['score'] == 1.0
+    assert flags[101]['cluster_size'] == 3 and flags[101]['name'] == 'Chhanda'
+
+    # Lowering the threshold brings the neighbour back
+    flags = flag_session(system.db, session_id, threshold=0.6)
+    assert [(f['student_id'], f['reasons']) for f in flags][2] == (103, ['colocated', 'burst'])
+    assert len(system.get_proxy_flags(session_id)) == 3
+
+def test_adjacent_students_tapping_together_are_not_flagged(tmp_path):
+    system, session_id = _system(tmp_path)
+    _add_students(system, 103)
+    # Three students half a metre apart on one bench, tapping within seconds of each other
+    for n, student_id in enumerate((101, 102, 103)):
+        system.mark_attendance(session_id, student_id, LAT + 5 * n * CM_11, LNG, f'10.0.0.{n + 1}', f'phone-{n}')
+    assert system.end_session(session_id)
+    assert system.get_proxy_flags(session_id) == []
@@ -0,0 +1,65 @@
+import csv
+import io
+import os
+from openpyxl import load_workbook
+from attendance import reports as reports_module
+from attendance.reports import ReportEngine
+from tests.test_attendance_marking import LAT, LNG, _system
+
+def _engine(tmp_path, monkeypatch):
+    monkeypatch.setattr(reports_module, '_logo', lambda url: None)
+    system, session_id = _system(tmp_path)
+    system.mark_attendance(session_id, 101, LAT, LNG, '10.0.0.1')
+    return system, session_id, ReportEngine(system.db, str(tmp_path / 'reports'))
+
+def test_exports_share_one_row_source(tmp_path, monkeypatch):
+    system, session_id, engine = _engine(tmp_path, monkeypatch)
+    report = engine.session(session_id)
+
+    rows = list(csv.reader(io.StringIO(b''.join(engine.csv_stream(report, chunk_rows=1)).decode())))
+    assert rows[0][:4] == ['Name', 'Roll Number', 'Email', 'Status']
+    assert [(r[0], r[3]) for r in rows[1:]] == [('Chhanda', 'Present'), ('Mondal', 'Not Clicked')]
+
+    out = io.BytesIO()
+    engine.write(report, 'xlsx', out)
+    workbook = load_workbook(io.BytesIO(out.getvalue()), read_only=True)
+    sheet = [row for row in workbook['Attendance'].iter_rows(values_only=True)]
+    assert [(r[0], r[3]) for r in sheet[1:]] == [('Chhanda', 'Present'), ('Mondal', 'Not Clicked')]
+    summary = dict(row for row in workbook['Summary'].iter_rows(values_only=True) if row and row[0])
+    assert summary['Total Students'] == 2 and summary['Present'] == 1
+
+    out = io.BytesIO()
+    engine.write(report, 'pdf', out)
+    assert out.getvalue().startswith(b'%PDF')
+
+def test_only_ended_sessions_are_cached(tmp_path, monkeypatch):
+    system, session_id, engine = _engine(tmp_path, monkeypatch)
+    assert engine.cached(engine.session(session_id), 'csv') is None
+
+    system.end_session(session_id)
+    path = engine.cached(engine.session(session_id), 'csv')
+    assert path == os.path.join(engine.cache_dir, f'{session_id}.csv')
+    first = os.stat(path).st_mtime_ns
+    assert engine.cached(engine.session(session_id), 'csv') == path
+    assert os.stat(path).st_mtime_ns == first
+    assert os.listdir(engine.cache_dir) == [f'{session_id}.csv']
+
+def test_recheck_invalidates_cached_exports_and_counters(tmp_path, monkeypatch):
+    system, session_id, _ = _engine(tmp_path, monkeypatch)
+    system.reports.cache_dir = str(tmp_path / 'reports')
+    system.mark_attendance(session_id, 102, LAT + 0.01, LNG, '10.0.0.2')
+    system.end_session(session_id)
+
+    def statuses():
+        with open(system.reports.cached(system.reports.session(session_id), 'csv'), encoding='utf-8') as f:
+            return [row[3] for row in list(csv.reader(f))[1:]]
+
+    assert statuses() == ['Present', 'Absent']
+    assert system.marking.counters(session_id).snapshot()['absent'] == 1
+
+    # The room was measured wrong; a wider radius puts the second mark inside it
+    with system.db.transaction() as cursor:
+        cursor.execute('UPDATE attendance_sessions SET radius = 5000 WHERE id = ?', (session_id,))
+    assert system.recheck_attendance(session_id, apply=True)[0]['applied']
+    assert statuses() == ['Present', 'Present']
+    assert system.marking.counters(session_id).snapshot()['present'] == 2
@@ -0,0 +1,53 @@
+import sqlite3
+
+from attendance.migrations import LATEST_VERSION, migrate
+from attendance.rooms import Room, RoomRegistry
+from tests.test_attendance_marking import LAT, LNG, _system
+from utils.db_utils import ConnectionManager
+
+def test_legacy_rooms_table_is_folded_into_room_coordinates(tmp_path):
+    db_path = str(tmp_path / "attendance.db")
+    db = ConnectionManager(db_path)
+    migrate(db, target=7)
+    with db.transaction() as cursor:
+        cursor.execute("INSERT INTO room_coordinates VALUES ('Room 101', 22.5185485, 88.4167369, 30)")
+        cursor.executemany("INSERT INTO rooms (room_number, latitude, longitude, radius) VALUES (?, ?, ?, 5)",
+                           [('Room 101', 1.0, 1.0), ('303', LAT, LNG)])
+    assert migrate(db) == LATEST_VERSION
+
+    registry = RoomRegistry(db)
+    assert registry.names() == ['303', 'Room 101']
+    assert registry.get('Room 101') == Room('Room 101', 22.5185485, 88.4167369, 30)
+    assert registry.get('303').radius == 50
+
+    # The setup scripts' writes to "rooms" land in the registry table
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT OR REPLACE INTO rooms (room_number, latitude, longitude, radius) VALUES ('304', 1.5, 2.5, 5)")
+    conn.execute("INSERT INTO rooms (room_number, latitude, longitude) VALUES ('Room 101', 3.5, 4.5)")
+    conn.execute("INSERT INTO rooms (room_number, latitude, longitude) VALUES ('305', 5.5, 6.5)")
+    conn.commit()
+    conn.close()
+    registry.reload()
+    assert registry.get('304') == Room('304', 1.5, 2.5, 5)
+    # No radius given: the room keeps its own, new rooms get the default
+    assert registry.get('Room 101').radius == 30 and registry.get('305').radius == 50
+    db.close_all()
+
+def test_sessions_use_the_registry_without_queries(tmp_path):
+    system, _ = _system(tmp_path)
+    assert 'Room 101' in system.rooms and '303' in system.rooms
+    assert system.rooms.seed({'Room 101': {'lat': 0, 'lng': 0, 'radius': 99}}) == 0
+
+    statements = []
+    system.db.connection().set_trace_callback(statements.append)
+    system.create_attendance_session('cse-cse-b', 'Algorithms', 'Room 101', LAT, LNG)
+    assert not any('room_coordinates' in sql for sql in statements)
+    system.db.connection().set_trace_callback(None)
+
+    version = system.rooms.version
+    moved = system.save_room('Room 101', LAT, LNG + 0.001)
+    assert moved.radius == 30 and system.rooms.version > version
+    assert system.geofences.get('Room 101').center == (LAT, LNG + 0.001)
+    assert system.rooms.get('Lab 9') is None
+    system.save_room('Lab 9', LAT, LNG, 20)
+    assert RoomRegistry(system.db).get('Lab 9') == Room('Lab 9', LAT, LNG, 20)
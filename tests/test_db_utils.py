@@ -0,0 +1,92 @@
+import sqlite3
+import threading
+import pytest
+from utils.db_utils import ConnectionManager, ReadReplica, publish_replica, replica_path_for
+
+def _manager(tmp_path):
+    manager = ConnectionManager(str(tmp_path / "test.db"))
+    with manager.transaction() as cursor:
+        cursor.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT)")
+    return manager
+
+def test_connection_is_reused_per_thread(tmp_path):
+    manager = _manager(tmp_path)
+    assert manager.connection() is manager.connection()
+
+    other = []
+    t = threading.Thread(target=lambda: other.append(manager.connection()))
+    t.start()
+    t.join()
+    assert other[0] is not manager.connection()
+    assert manager.connection().execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    manager.close_all()
+
+def test_transaction_rolls_back_on_error(tmp_path):
+    manager = _manager(tmp_path)
+    with pytest.raises(RuntimeError):
+        with manager.transaction() as cursor:
+            cursor.execute("INSERT INTO t (v) VALUES ('a')")
+            raise RuntimeError("boom")
+    assert manager.connection().execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+    manager.close_all()
+
+def test_nested_transaction_joins_outer(tmp_path):
+    manager = _manager(tmp_path)
+    with pytest.raises(RuntimeError):
+        with manager.transaction() as outer:
+            outer.execute("INSERT INTO t (v) VALUES ('a')")
+            with manager.transaction() as inner:
+                inner.execute("INSERT INTO t (v) VALUES ('b')")
+            raise RuntimeError("boom")
+    assert manager.connection().execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+    manager.close_all()
+
+def test_failed_commit_rolls_back(tmp_path):
+    manager = _manager(tmp_path)
+    conn = manager.connection()
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("CREATE TABLE child (id INTEGER PRIMARY KEY, "
+                 "t_id INTEGER REFERENCES t (id) DEFERRABLE INITIALLY DEFERRED)")
+
+    # The deferred foreign key is only checked at COMMIT, which fails and keeps the transaction open
+    with pytest.raises(sqlite3.IntegrityError):
+        with manager.transaction() as cursor:
+            cursor.execute("INSERT INTO child (t_id) VALUES (42)")
+    assert not conn.in_transaction
+
+    with manager.transaction() as cursor:
+        cursor.execute("INSERT INTO t (v) VALUES ('a')")
+    assert not conn.in_transaction
+    other = ConnectionManager(manager.db_path)
+    assert other.connection().execute("SELECT COUNT(*) FROM t").fetchone()[0] == 1
+    assert other.connection().execute("SELECT COUNT(*) FROM child").fetchone()[0] == 0
+    other.close_all()
+    manager.close_all()
+
+def test_replica_is_consistent_and_never_blocks(tmp_path):
+    manager = _manager(tmp_path)
+    with manager.transaction() as cursor:
+        cursor.execute("INSERT INTO t (v) VALUES ('published')")
+    replica = ReadReplica(publish_replica(manager.connection(), replica_path_for(manager.db_path)))
+    assert replica.db_path.endswith("test.replica.db")
+
+    # A writer holds the write lock with uncommitted rows: the replica still reads instantly
+    writer = ConnectionManager(manager.db_path, busy_timeout_ms=0)
+    writer.connection().execute("BEGIN EXCLUSIVE")
+    writer.connection().execute("INSERT INTO t (v) VALUES ('pending')")
+    assert replica.connection().execute("SELECT v FROM t").fetchall() == [("published",)]
+    with pytest.raises(sqlite3.OperationalError):
+        replica.connection().execute("INSERT INTO t (v) VALUES ('x')")
+    with pytest.raises(sqlite3.OperationalError):
+        with replica.transaction():
+            pass
+    writer.connection().execute("COMMIT")
+
+    # Republishing swaps the file; readers reopen on their next call
+    version = replica.version()
+    publish_replica(manager.connection(), replica.db_path)
+    assert replica.version() != version
+    assert replica.connection().execute("SELECT COUNT(*) FROM t").fetchone()[0] == 2
+    assert replica.connection().execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    for db in (manager, writer, replica):
+        db.close_all()
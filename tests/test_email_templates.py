@@ -0,0 +1,33 @@
+import email
+import html
+from attendance.email_templates import CompiledTemplate, attendance_renderer, build_message
+from config.email_config import EMAIL_TEMPLATES
+
+def test_compiled_template_matches_str_format():
+    source = EMAIL_TEMPLATES["attendance_notification"]["html"]
+    fields = {"student_name": "Chhanda", "attendance_url": "http://x/mark-attendance/s?email=a@b.c",
+              "class_name": "CSE Semester 3 - Section B", "room": "Room 303"}
+    compiled = CompiledTemplate(source).partial(class_name=fields["class_name"], room=fields["room"])
+    assert compiled.fields == ["student_name", "attendance_url", "attendance_url"]
+    assert compiled.render(**fields) == source.format(**fields)
+
+def test_html_fields_are_escaped():
+    template = CompiledTemplate("<p>{student_name}</p>", escape=True)
+    assert template.render(student_name="<b>A & B</b>") == "<p>" + html.escape("<b>A & B</b>") + "</p>"
+
+def test_rendered_message_parses():
+    renderer = attendance_renderer("sync.timely@gmail.com", "CSE Semester 3 - Section B", "Room 303")
+    raw = renderer.render("a@example.edu", student_name="Chhanda", attendance_url="http://x/m?email=a@example.edu")
+    msg = email.message_from_bytes(raw)
+
+    assert msg["To"] == "a@example.edu"
+    assert msg["From"] == "sync.timely@gmail.com"
+    assert msg["Subject"] == "Attendance Required - CSE Semester 3 - Section B"
+    text, body = [part.get_payload(decode=True).decode() for part in msg.get_payload()]
+    assert "Dear Chhanda," in text and "Room 303" in text
+    assert "<strong>Chhanda</strong>" in body and 'href="http://x/m?email=a@example.edu"' in body
+
+def test_html_only_message():
+    msg = email.message_from_bytes(build_message("a@x.y", "b@x.y", "Hi", "<p>é</p>"))
+    assert msg.get_content_type() == "text/html"
+    assert msg.get_payload(decode=True).decode() == "<p>é</p>"
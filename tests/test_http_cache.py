@@ -0,0 +1,44 @@
+from flask import Flask, request
+
+from utils.http_cache import ResponseCache
+
+def _app(cache, data, version):
+    app = Flask(__name__)
+    builds = []
+
+    @app.route('/notices')
+    def notices():
+        def build():
+            builds.append(1)
+            return list(data)
+        return cache.respond('notices', build, request, version=lambda: version[0])
+
+    return app.test_client(), builds
+
+def test_etag_revalidation_and_invalidation():
+    cache, data, version = ResponseCache(), ['first'], [1]
+    client, builds = _app(cache, data, version)
+
+    first = client.get('/notices')
+    etag = first.headers['ETag']
+    assert first.status_code == 200 and first.get_json() == ['first']
+    assert 'no-cache' in first.headers['Cache-Control'] and 'private' in first.headers['Cache-Control']
+
+    revalidated = client.get('/notices', headers={'If-None-Match': etag})
+    assert revalidated.status_code == 304 and revalidated.data == b''
+    assert client.get('/notices').get_json() == ['first']
+    assert len(builds) == 1
+
+    # A writer bumps the key: rebuilt once, with a new ETag
+    data.append('second')
+    cache.bump('notices')
+    changed = client.get('/notices', headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.get_json() == ['first', 'second']
+    assert changed.headers['ETag'] != etag
+    assert client.get('/notices', headers={'If-None-Match': changed.headers['ETag']}).status_code == 304
+    assert len(builds) == 2
+
+    # An external version change (e.g. another process wrote the database) also rebuilds
+    version[0] = 2
+    assert client.get('/notices', headers={'If-None-Match': changed.headers['ETag']}).status_code == 304
+    assert len(builds) == 3
@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+from agents.constraint_parser import _fallback_rule_based_parser
+from config.settings import settings
+from orchestrator.orchestrator import Orchestrator
+from utils.metrics import MetricsRegistry, RunTrace, metrics
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    registry.describe('jobs_total', 'counter', 'Jobs run')
+    registry.inc('jobs_total', result='ok')
+    registry.inc('jobs_total', 2, result='ok')
+    registry.observe('step_seconds', 0.25, stage='a"b')
+
+    trace = RunTrace(registry)
+    trace.record('parse', 0.5, ok=False)
+    trace.count('widgets', 3)
+    try:
+        with trace.span('solve', attempt=2):
+            raise ValueError
+    except ValueError:
+        pass
+    assert trace.spans[1]['stage'] == 'solve' and trace.spans[1]['attempt'] == 2 and not trace.spans[1]['ok']
+
+    lines = registry.render().splitlines()
+    assert lines[:9] == [
+        '# HELP jobs_total Jobs run',
+        '# TYPE jobs_total counter',
+        'jobs_total{result="ok"} 3',
+        '# TYPE step_seconds summary',
+        'step_seconds_sum{stage="a\\"b"} 0.25',
+        'step_seconds_count{stage="a\\"b"} 1',
+        '# TYPE timely_pipeline_stage_seconds summary',
+        'timely_pipeline_stage_seconds_sum{stage="parse"} 0.5',
+        'timely_pipeline_stage_seconds_count{stage="parse"} 1',
+    ]
+    assert {'timely_pipeline_stage_seconds_count{stage="solve"} 1',
+            'timely_pipeline_stage_failures_total{stage="parse"} 1',
+            'timely_pipeline_stage_failures_total{stage="solve"} 1',
+            'timely_widgets_total 3'} <= set(lines)
+
+def test_orchestrator_run_reports_stage_timings(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'OUTPUT_DIR', str(tmp_path))
+    monkeypatch.setattr(settings, 'GEMINI_API_KEY', None)
+    cp = _fallback_rule_based_parser(["Math taught by Prof. Sharma needs 2 periods"])
+    orch = Orchestrator()
+    orch.parser = SimpleNamespace(parse=lambda nl: cp)
+    runs = metrics.value('timely_pipeline_runs_total', result='ok')
+
+    result = orch.run(["Math taught by Prof. Sharma needs 2 periods"], max_solver_solutions=3)
+    trace = result['metrics']
+    assert {'parse', 'solve', 'score', 'verify', 'export'} <= set(trace['stages'])
+    assert all(span['ok'] and span['seconds'] >= 0 for span in trace['spans'])
+    solve, = trace['solver']
+    assert solve['solutions'] == 3 and solve['branches'] > 0
+    assert set(solve) >= {'build_seconds', 'search_seconds', 'wall_time', 'conflicts', 'status'}
+    assert trace['counters']['solver_solutions'] == 3
+    assert trace['counters']['optimizer_candidates_rescored'] >= 3
+
+    assert metrics.value('timely_pipeline_runs_total', result='ok') == runs + 1
+    assert 'timely_pipeline_stage_seconds_count{stage="solve"}' in metrics.render()
@@ -0,0 +1,60 @@
+import os
+
+from flask import Flask
+
+from Routine5_lab_advanced.engine import GenerationOptions, generate
+from tests.test_routine5_engine import _seed_department
+from utils import profiling
+
+def _busy(n):
+    return sum(i * i for i in range(n))
+
+@profiling.profiled('test.inner')
+def inner(n):
+    return _busy(n)
+
+@profiling.profiled('test.outer')
+def outer(n):
+    return inner(n) + inner(n)
+
+def test_profiles_only_when_asked(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, 'PROFILE_DIR', str(tmp_path))
+    assert outer(1000) == 2 * _busy(1000)
+    assert os.listdir(tmp_path) == []
+
+    with profiling.requested('req-1'):
+        outer(1000)
+    # The nested call is part of the outer profile
+    assert sorted(os.listdir(tmp_path)) == ['req-1-test.outer.prof', 'req-1-test.outer.txt']
+    summary = (tmp_path / 'req-1-test.outer.txt').read_text()
+    assert 'Top 25 functions by cumulative time' in summary and '_busy' in summary
+
+    monkeypatch.setattr(profiling, '_enabled', profiling._targets('test.inner'))
+    inner(10)
+    assert len([name for name in os.listdir(tmp_path) if name.endswith('-test.inner.prof')]) == 1
+    monkeypatch.setattr(profiling, '_enabled', frozenset())
+
+def test_request_header_profiles_routine5_generation(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, 'PROFILE_DIR', str(tmp_path / 'profiles'))
+    db_path = str(tmp_path / 'timetable.db')
+    _seed_department(db_path)
+
+    app = Flask(__name__)
+    profiling.flask_hooks(app)
+
+    @app.route('/generate')
+    def run_generation():
+        return {'success': generate(1, db_path, GenerationOptions(generate_pdf=False, seed=7)).success}
+
+    client = app.test_client()
+    assert client.get('/generate').get_json() == {'success': True}
+    assert not (tmp_path / 'profiles').exists()
+
+    response = client.get('/generate', headers={'X-Profile': '1', 'X-Request-ID': '../etc'})
+    profile_id = response.headers['X-Profile-Id']
+    assert response.get_json() == {'success': True} and '/' not in profile_id
+    assert (tmp_path / 'profiles' / f'{profile_id}-routine5.generate.prof').exists()
+
+    response = client.get('/generate?profile=1', headers={'X-Request-ID': 'dept-1'})
+    assert response.headers['X-Profile-Id'] == 'dept-1'
+    assert (tmp_path / 'profiles' / 'dept-1-routine5.generate.txt').exists()
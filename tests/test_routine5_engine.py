@@ -0,0 +1,49 @@
+import sqlite3
+import subprocess
+import sys
+from Routine5_lab_advanced.engine import init_db, generate, GenerationOptions
+
+def _seed_department(db_path):
+    init_db(db_path)
+    conn = sqlite3.connect(db_path)
+    cur = conn.cursor()
+    cur.execute("INSERT INTO departments (name, code, program_duration) VALUES ('Computer Science', 'CSE', 4)")
+    cur.execute("INSERT INTO years (department_id, year_number, section_count) VALUES (1, 2, 2)")
+    cur.execute("INSERT INTO sections (year_id, section_label) VALUES (1, 'A'), (1, 'B')")
+    cur.execute("INSERT INTO semesters (year_id, semester_number, semester_type, is_active) VALUES (1, 3, 'odd', 1)")
+    cur.execute("INSERT INTO theory_rooms (name) VALUES ('301'), ('302')")
+    cur.execute("INSERT INTO lab_rooms (name) VALUES ('Lab 1')")
+    cur.execute("INSERT INTO subjects (semester_id, name, type, credits) VALUES (1, 'Algorithms', 'theory', 3)")
+    cur.execute("INSERT INTO subjects (semester_id, name, type, credits, lab_duration) VALUES (1, 'Algorithms Lab', 'practical', 2, 2)")
+    cur.execute("INSERT INTO subject_teachers (subject_id, teacher_name, unavailable_day) VALUES (1, 'Prof. Rao', 'friday')")
+    cur.execute("INSERT INTO subject_teachers (subject_id, teacher_name, unavailable_day) VALUES (2, 'Prof. Iyer', 'monday')")
+    for section_id in (1, 2):
+        cur.execute("INSERT INTO primary_assignments (subject_id, section_id, teacher_id, assignment_type) VALUES (1, ?, 1, 'theory_primary')", (section_id,))
+        cur.execute("INSERT INTO primary_assignments (subject_id, section_id, teacher_id, assignment_type) VALUES (2, ?, 2, 'lab_primary')", (section_id,))
+    conn.commit()
+    conn.close()
+
+def test_generate_without_pdf(tmp_path):
+    db_path = str(tmp_path / "timetable.db")
+    _seed_department(db_path)
+
+    result = generate(1, db_path, GenerationOptions(generate_pdf=False, seed=7))
+
+    assert result.success, result.error
+    assert result.total_sections == 2
+    assert result.pdf_files == []
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT section_id, COUNT(*) FROM generated_schedules GROUP BY section_id").fetchall()
+    conn.close()
+    # 3 theory periods + one 2-hour lab per section
+    assert dict(rows) == {1: 5, 2: 5}
+
+def test_generate_reports_errors(tmp_path):
+    result = generate(1, str(tmp_path / "missing.db"), GenerationOptions(generate_pdf=False))
+    assert not result.success
+    assert result.to_dict() == {'success': False, 'error': result.error}
+
+def test_engine_import_does_not_load_web_stack():
+    code = "import sys, Routine5_lab_advanced.engine; print('flask' in sys.modules or 'reportlab' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "False"
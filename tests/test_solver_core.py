@@ -0,0 +1,107 @@
+from types import SimpleNamespace
+
+import pytest
+
+from agents.constraint_parser import _fallback_rule_based_parser
+from agents.constraint_verifier import ConstraintVerifierAgent
+from config.settings import settings
+from agents.csp_solver import CSPSolverAgent
+from core.constraint_schema import Room
+from orchestrator.orchestrator import Orchestrator, UnsatisfiableConstraints
+
+CONFLICTING = [
+    "Prof. Sharma is only available on Mon S1",
+    "Math taught by Prof. Sharma needs 2 periods",
+    "Sci taught by Prof. Rao needs 2 periods",
+    "Prof. Rao is only available on Mon S2, Tue S1, Wed S1",
+    "Eng taught by Prof. Iyer needs 2 periods",
+]
+
+def test_infeasible_model_reports_minimal_core():
+    cp = _fallback_rule_based_parser(CONFLICTING)
+    result = CSPSolverAgent().solve(cp, max_solutions=3)
+    assert result.status == "INFEASIBLE" and not result.feasible_timetables
+    assert {(g.kind, g.teacher_id, g.subject_id) for g in result.core} == {
+        ("availability", "T1", None), ("periods", "T1", "Math")}
+
+    cp.hard.max_periods_per_day = 1
+    cp.hard.teachers[0].availability = {d: ["S1", "S2", "S3"] for d in cp.hard.days}
+    core = CSPSolverAgent().solve(cp).core
+    # 6 periods fit 3 days x 3 slots, but not at one per day
+    assert "max_periods_per_day" in {g.kind for g in core} and len(core) >= 2
+
+def test_orchestrator_does_not_retry_proven_infeasibility(monkeypatch):
+    cp = _fallback_rule_based_parser(CONFLICTING)
+    orch = Orchestrator()
+    orch.parser = SimpleNamespace(parse=lambda nl: cp)
+    calls = []
+    solve = orch.solver.solve
+    monkeypatch.setattr(orch.solver, 'solve', lambda *a, **kw: calls.append(1) or solve(*a, **kw))
+
+    with pytest.raises(UnsatisfiableConstraints) as raised:
+        orch.run(CONFLICTING)
+    assert len(calls) == 1
+    assert sorted(line for c in raised.value.conflicts for line in c["lines"]) == [
+        "Math taught by Prof. Sharma needs 2 periods", "Prof. Sharma is only available on Mon S1"]
+    assert "Prof. Sharma is only available on Mon S1" in str(raised.value)
+
+def test_diverse_pool_is_opt_in(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'OUTPUT_DIR', str(tmp_path))
+    lines = ["Math taught by Prof. Sharma needs 2 periods"]
+    cp = _fallback_rule_based_parser(lines)
+    orch = Orchestrator()
+    orch.parser = SimpleNamespace(parse=lambda nl: cp)
+    modes = []
+    solve = orch.solver.solve
+    monkeypatch.setattr(orch.solver, 'solve', lambda *a, **kw: modes.append(kw['diverse']) or solve(*a, **kw))
+
+    assert not settings.CSP_DIVERSE_POOL
+    orch.run(lines, max_solver_solutions=2)
+    monkeypatch.setattr(settings, 'CSP_DIVERSE_POOL', True)
+    orch.run(lines, max_solver_solutions=2)
+    assert modes == [False, True]
+
+def _distances(timetables):
+    cells = [{(a.day, a.slot, a.subject_id) for a in tt.assignments} for tt in timetables]
+    return [len(a ^ b) for i, a in enumerate(cells) for b in cells[i + 1:]]
+
+def test_diverse_pool_spreads_solutions_apart():
+    cp = _fallback_rule_based_parser([
+        "Math taught by Prof. Sharma needs 2 periods",
+        "Sci taught by Prof. Rao needs 2 periods",
+        "Eng taught by Prof. Iyer needs 2 periods",
+    ])
+    enumerated = CSPSolverAgent().solve(cp, max_solutions=4)
+    pool = CSPSolverAgent().solve(cp, max_solutions=4, diverse=True)
+    assert len(pool.feasible_timetables) == 4
+    assert min(_distances(pool.feasible_timetables)) > min(_distances(enumerated.feasible_timetables))
+    assert pool.stats["min_distance"] == min(_distances(pool.feasible_timetables))
+
+    # Math fits in exactly one way: the pool stops there rather than repeating it
+    cp.hard.teachers[0].availability = {"Mon": ["S1", "S2"]}
+    cp.hard.subjects = cp.hard.subjects[:1]
+    pool = CSPSolverAgent().solve(cp, max_solutions=4, diverse=True)
+    assert pool.status == "OPTIMAL" and len(pool.feasible_timetables) == 1
+
+def test_rooms_are_assigned_by_capacity():
+    cp = _fallback_rule_based_parser(CONFLICTING[1:3] + ["Eng taught by Prof. Iyer needs 2 periods"])
+    cp.hard.rooms = [Room(id="R1", name="Hall", capacity=120), Room(id="R2", name="Lab", capacity=30),
+                     Room(id="R3", name="Annex"), Room(id="R4", name="Seminar", capacity=40)]
+    cp.hard.subjects[0].students = 35
+    result = CSPSolverAgent().solve(cp, max_solutions=3)
+    rooms = {(a.subject_id, a.room_id) for tt in result.feasible_timetables for a in tt.assignments}
+    assert rooms == {("Math", "R4"), ("Sci", "R2"), ("Eng", "R2")}
+    assert len(_distances(result.feasible_timetables)) == 3 and min(_distances(result.feasible_timetables)) > 0
+    # Room choices alone never make a new timetable, and distance still comes before room fit
+    pool = CSPSolverAgent().solve(cp, max_solutions=3, diverse=True)
+    assert {(a.subject_id, a.room_id) for tt in pool.feasible_timetables for a in tt.assignments} == rooms
+    assert min(_distances(pool.feasible_timetables)) >= min(_distances(result.feasible_timetables))
+
+    cp.hard.subjects[0].students = 200
+    cp.hard.rooms.pop(2)
+    result = CSPSolverAgent().solve(cp)
+    assert {(g.kind, g.subject_id) for g in result.core} == {("room", "Math"), ("periods", "Math")}
+
+    tt = CSPSolverAgent().solve(cp.model_copy(update={"hard": cp.hard.model_copy(update={"rooms": None})})).feasible_timetables[0]
+    next(a for a in tt.assignments if a.subject_id == "Math").room_id = "R2"
+    assert any("seats 30" in e for e in ConstraintVerifierAgent().verify(tt, cp).errors)
@@ -0,0 +1,48 @@
+import gzip
+import json
+import os
+import sqlite3
+
+from Routine5_lab_advanced.engine import GenerationOptions, generate
+from tests.test_routine5_engine import _seed_department
+from utils.timetable_snapshots import INDEX, TIMETABLE, SnapshotStore, load_sections, publish
+
+def _read(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    return json.loads(gzip.decompress(data) if path.endswith('.gz') else data)
+
+def test_generation_publishes_snapshots(tmp_path):
+    db_path = str(tmp_path / "timetable.db")
+    _seed_department(db_path)
+    result = generate(1, db_path, GenerationOptions(generate_pdf=False, seed=7))
+    assert result.success and result.snapshot
+
+    store = SnapshotStore(str(tmp_path / "snapshots"))
+    assert store.generation() == result.snapshot
+    conn = sqlite3.connect(db_path)
+    sections = load_sections(conn)
+    conn.close()
+
+    path, encoding, etag = store.path(TIMETABLE, gzip_ok=True)
+    assert encoding == 'gzip' and etag.endswith(':gz')
+    assert _read(path) == {'success': True, 'sections': sections}
+    assert sum(len(slots) for slots in sections[0]['schedule'].values()) == 5
+
+    index = _read(store.path(INDEX)[0])
+    department, = index['departments']
+    assert department['dept_code'] == 'CSE'
+    assert [s['key'] for s in department['sections']] == ['cse-y2-s3-a', 'cse-y2-s3-b']
+    assert _read(store.path('sections/cse-y2-s3-b.json')[0]) == sections[1]
+    assert store.path('sections/missing.json') is None
+    assert store.path('../timetable.db') is None
+
+def test_publish_swaps_and_prunes_generations(tmp_path):
+    root = str(tmp_path / "snapshots")
+    store = SnapshotStore(root)
+    assert store.path(TIMETABLE) is None
+
+    names = [publish([{'section_label': str(n), 'schedule': {}}], root, keep=2) for n in range(4)]
+    assert store.generation() == names[-1]
+    assert _read(store.path(TIMETABLE)[0])['sections'][0]['section_label'] == '3'
+    assert sorted(name for name in os.listdir(root) if name != 'CURRENT') == sorted(names[-2:])
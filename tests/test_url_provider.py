@@ -0,0 +1,75 @@
+import time
+import pytest
+from ngrok_manager import SharedTunnel, LocalURLProvider, URLProvider
+
+def _wait(predicate, timeout=2):
+    deadline = time.time() + timeout
+    while not predicate() and time.time() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+def test_overlapping_sessions_share_one_tunnel():
+    provider = LocalURLProvider("https://tunnel.example")
+    tunnel = SharedTunnel(provider)
+
+    first = tunnel.acquire(hold_seconds=None)
+    second = tunnel.acquire(hold_seconds=None)
+    assert first.url() == second.url() == "https://tunnel.example"
+    assert provider.starts == 1
+
+    first.release()
+    first.release()
+    assert tunnel.refs == 1 and provider.stops == 0
+
+    second.release()
+    assert _wait(lambda: provider.stops == 1)
+
+    assert tunnel.acquire(hold_seconds=None).url() == "https://tunnel.example"
+    assert provider.starts == 2
+
+def test_hold_expires():
+    provider = LocalURLProvider("https://tunnel.example")
+    tunnel = SharedTunnel(provider)
+    tunnel.acquire(hold_seconds=0.05).url()
+    assert _wait(lambda: provider.stops == 1)
+    assert tunnel.refs == 0
+
+def test_released_lease_falls_back():
+    provider = LocalURLProvider("https://tunnel.example")
+    tunnel = SharedTunnel(provider, fallback_url="http://localhost:5000")
+    released = []
+    lease = tunnel.acquire(hold_seconds=0.05, on_release=lambda: released.append(1))
+    assert lease.url() == "https://tunnel.example" and lease.is_public
+
+    assert _wait(lambda: provider.stops == 1)
+    assert released == [1] and lease.released
+    # A retried email must not get the URL of a tunnel that is down
+    assert lease.url() == "http://localhost:5000" and not lease.is_public
+
+def test_failed_start_falls_back_and_retries():
+    provider = LocalURLProvider(fail=True)
+    tunnel = SharedTunnel(provider, fallback_url="http://localhost:5000")
+    lease = tunnel.acquire(hold_seconds=None)
+    assert lease.url() == "http://localhost:5000" and not lease.is_public
+
+    provider.fail = False
+    assert tunnel.acquire(hold_seconds=None).url() == provider.url
+    assert provider.starts == 2
+
+def test_slow_start_does_not_block_caller():
+    provider = LocalURLProvider("https://tunnel.example", start_delay=0.3)
+    tunnel = SharedTunnel(provider, fallback_url="http://localhost:5000")
+
+    started = time.perf_counter()
+    lease = tunnel.acquire(hold_seconds=None)
+    assert time.perf_counter() - started < 0.1
+    assert lease.url(timeout=0.01) == "http://localhost:5000"
+    assert lease.url() == "https://tunnel.example"
+
+def test_provider_must_implement_start_and_stop():
+    class StartOnly(URLProvider):
+        def start(self):
+            return "https://tunnel.example"
+
+    with pytest.raises(TypeError):
+        StartOnly()
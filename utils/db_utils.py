@@ -0,0 +1,206 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import weakref
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+from urllib.parse import quote
+
+DEFAULT_BUSY_TIMEOUT_MS = 5000
+DEFAULT_CACHED_STATEMENTS = 256
+
+class _ThreadConnection:
+    # sqlite3.Connection cannot be weak-referenced, so each thread's connection is
+    # held through this wrapper. When the thread exits its threading.local slot is
+    # dropped, the wrapper is collected and the connection closes with it.
+    __slots__ = ("conn", "__weakref__")
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+class ConnectionManager:
+    """Per-thread cached SQLite connections for a single database file.
+
+    Each thread gets one connection, opened on first use with the pragmas applied
+    once. Connections run in autocommit mode; group writes with ``transaction()``.
+    """
+
+    def __init__(self, db_path: str, busy_timeout_ms: int = DEFAULT_BUSY_TIMEOUT_MS,
+                 cached_statements: int = DEFAULT_CACHED_STATEMENTS,
+                 journal_mode: Optional[str] = "WAL", synchronous: str = "NORMAL"):
+        self.db_path = db_path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cached_statements = cached_statements
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self._local = threading.local()
+        self._holders = weakref.WeakSet()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            cached_statements=self.cached_statements,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        if self.journal_mode:
+            conn.execute(f"PRAGMA journal_mode={self.journal_mode}")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use"""
+        holder = getattr(self._local, "holder", None)
+        if holder is None or holder.conn is None:
+            holder = _ThreadConnection(self._connect())
+            self._local.holder = holder
+            self._holders.add(holder)
+        return holder.conn
+
+    @contextmanager
+    def transaction(self, immediate: bool = True):
+        """Run the block in one transaction and yield a cursor.
+
+        Commits on success and rolls back on any exception. ``BEGIN IMMEDIATE``
+        takes the write lock up front so read-then-write blocks wait on
+        busy_timeout instead of failing when they upgrade. A nested call joins
+        the transaction that is already open.
+        """
+        conn = self.connection()
+        cursor = conn.cursor()
+        if conn.in_transaction:
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+            return
+        conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        try:
+            yield cursor
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            try:
+                conn.execute("COMMIT")
+            except BaseException:
+                # A failed COMMIT (SQLITE_BUSY, a deferred constraint) leaves the transaction
+                # open; every later call on this thread would join it and never commit
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+        finally:
+            cursor.close()
+
+    def close_thread(self) -> None:
+        """Close the calling thread's connection, if it has one"""
+        holder = getattr(self._local, "holder", None)
+        if holder is not None and holder.conn is not None:
+            holder.conn.close()
+            holder.conn = None
+
+    def close_all(self) -> None:
+        """Close every connection opened by this manager (e.g. at shutdown)"""
+        for holder in list(self._holders):
+            conn, holder.conn = holder.conn, None
+            if conn is not None:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+
+class ReadReplica(ConnectionManager):
+    """Per-thread read-only connections to a replica written by ``publish_replica``.
+
+    The replica is opened with ``mode=ro&immutable=1``: SQLite takes no locks
+    and never looks for a journal, so reads neither wait for nor block the
+    writers of the primary database. A published replica is never modified,
+    only replaced; each thread reopens its connection when the file changes.
+    """
+
+    def __init__(self, replica_path: str, cached_statements: int = DEFAULT_CACHED_STATEMENTS):
+        super().__init__(replica_path, cached_statements=cached_statements, journal_mode=None)
+
+    def _connect(self) -> sqlite3.Connection:
+        uri = f"file:{quote(os.path.abspath(self.db_path))}?mode=ro&immutable=1"
+        return sqlite3.connect(uri, uri=True, cached_statements=self.cached_statements,
+                               isolation_level=None, check_same_thread=False)
+
+    def version(self) -> Optional[Tuple[int, int]]:
+        """Identity of the current replica file, or None before the first publish"""
+        try:
+            stat = os.stat(self.db_path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def exists(self) -> bool:
+        return self.version() is not None
+
+    def connection(self) -> sqlite3.Connection:
+        """This thread's connection to the latest published replica"""
+        version = self.version()
+        if getattr(self._local, "version", None) != version:
+            self.close_thread()
+            self._local.version = version
+        return super().connection()
+
+    @contextmanager
+    def transaction(self, immediate: bool = True):
+        raise sqlite3.OperationalError(f"{self.db_path} is a read-only replica")
+        yield
+
+def replica_path_for(db_path: str) -> str:
+    """Default replica location: timetable.db -> timetable.replica.db"""
+    root, ext = os.path.splitext(db_path)
+    return f"{root}.replica{ext or '.db'}"
+
+def publish_replica(source: sqlite3.Connection, replica_path: str) -> str:
+    """Copy a consistent snapshot of source to replica_path using the online backup API.
+
+    The copy is made in one backup step (a single read transaction, which in
+    WAL mode does not block writers), switched to a rollback journal so it is
+    a self-contained file, and renamed over the old replica.
+    """
+    directory = os.path.dirname(os.path.abspath(replica_path))
+    fd, staging = tempfile.mkstemp(prefix=".replica-", suffix=".db", dir=directory)
+    os.close(fd)
+    try:
+        target = sqlite3.connect(staging)
+        try:
+            source.backup(target)
+            target.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            target.close()
+        os.replace(staging, replica_path)
+    except BaseException:
+        if os.path.exists(staging):
+            os.unlink(staging)
+        raise
+    return replica_path
+
+_managers: Dict[str, ConnectionManager] = {}
+_managers_lock = threading.Lock()
+
+def get_db(db_path: str, **kwargs) -> ConnectionManager:
+    """Return the shared ConnectionManager for db_path, creating it on first use.
+
+    Keyword arguments only apply when the manager is first created.
+    """
+    key = os.path.abspath(db_path)
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = ConnectionManager(db_path, **kwargs)
+            _managers[key] = manager
+        return manager
+
+def close_all() -> None:
+    """Close the connections of every shared manager"""
+    with _managers_lock:
+        managers = list(_managers.values())
+    for manager in managers:
+        manager.close_all()
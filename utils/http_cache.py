@@ -0,0 +1,67 @@
+import hashlib
+import json
+import threading
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from flask import Request, Response
+
+class ResponseCache:
+    """Serialized JSON responses cached per key until the key's generation changes.
+
+    Writers call ``bump(key)`` after changing the data behind a key; readers call
+    ``respond(key, build, request)``. The body is built and hashed once per
+    generation, and the hash is sent as a strong ETag, so a client that sends it
+    back in ``If-None-Match`` gets an empty ``304 Not Modified`` without the data
+    being queried or serialized again. ``version`` adds an external part to the
+    generation (e.g. the mtime of a database written by another process).
+    """
+
+    def __init__(self, max_age: int = 0):
+        self.max_age = max_age
+        self._generations: Dict[Hashable, int] = {}
+        self._entries: Dict[Hashable, Tuple[Tuple, bytes, str]] = {}
+        self._lock = threading.Lock()
+
+    def generation(self, key: Hashable) -> int:
+        return self._generations.get(key, 0)
+
+    def bump(self, key: Hashable) -> int:
+        """Invalidate a key; the next request rebuilds it"""
+        with self._lock:
+            self._generations[key] = self._generations.get(key, 0) + 1
+            self._entries.pop(key, None)
+            return self._generations[key]
+
+    def get(self, key: Hashable, build: Callable[[], object],
+            version: Optional[Callable[[], Hashable]] = None) -> Tuple[bytes, str]:
+        """(JSON body, ETag) for the current generation, building it if needed"""
+        stamp = (self.generation(key), version() if version is not None else None)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == stamp:
+            return entry[1], entry[2]
+
+        body = json.dumps(build(), separators=(',', ':'), sort_keys=True).encode()  # as jsonify
+        etag = hashlib.sha1(body).hexdigest()[:20]
+        with self._lock:
+            # Keep it only if no writer bumped the key while we were building
+            if self.generation(key) == stamp[0]:
+                self._entries[key] = (stamp, body, etag)
+        return body, etag
+
+    def respond(self, key: Hashable, build: Callable[[], object], request: Request,
+                version: Optional[Callable[[], Hashable]] = None) -> Response:
+        """Cached JSON response, or 304 when the request's If-None-Match still matches"""
+        body, etag = self.get(key, build, version)
+        if etag in request.if_none_match:
+            # Revalidation: no body to copy or hash
+            response = Response(status=304)
+        else:
+            response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+        # Behind a login, so only the browser may keep it, and it must revalidate
+        response.cache_control.private = True
+        if self.max_age:
+            response.cache_control.max_age = self.max_age
+        else:
+            response.cache_control.no_cache = True
+        return response
@@ -0,0 +1,37 @@
+import threading
+from typing import Callable, Generic, TypeVar
+
+T = TypeVar('T')
+
+_UNSET = object()
+
+class Lazy(Generic[T]):
+    """Stands in for an object that is only built on first use.
+
+    Attribute access is forwarded to ``factory()``, which runs once (the first
+    caller builds it while concurrent callers wait), so module-level subsystems
+    cost nothing until a request actually needs them.
+    """
+
+    def __init__(self, factory: Callable[[], T], name: str = ''):
+        self._factory = factory
+        self._name = name or getattr(factory, '__name__', 'lazy')
+        self._value = _UNSET
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._value is not _UNSET
+
+    def get(self) -> T:
+        if self._value is _UNSET:
+            with self._lock:
+                if self._value is _UNSET:
+                    self._value = self._factory()
+        return self._value
+
+    def __getattr__(self, name: str):
+        return getattr(self.get(), name)
+
+    def __repr__(self) -> str:
+        return f"<Lazy {self._name}{'' if self.ready else ' (not built)'}>"
@@ -0,0 +1,142 @@
+"""
+In-process metrics with Prometheus text exposition, and per-run stage timing.
+
+``metrics`` is the process-wide registry served at ``/metrics``. A
+``RunTrace`` times the stages of one pipeline run with ``time.monotonic``
+(``with trace.span("solve", attempt=2): ...``), keeps the spans and counters
+for the run's result, and adds them to the registry:
+
+    timely_pipeline_stage_seconds{stage="..."}        summary (_sum / _count)
+    timely_pipeline_stage_failures_total{stage="..."} counter
+    timely_<name>_total                               counters from RunTrace.count
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+Labels = Tuple[Tuple[str, str], ...]
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format(name: str, labels: Labels, value: float) -> str:
+    rendered = ','.join(f'{key}="{_escape(val)}"' for key, val in labels)
+    number = repr(float(value)) if not float(value).is_integer() else str(int(value))
+    return f'{name}{{{rendered}}} {number}' if rendered else f'{name} {number}'
+
+class MetricsRegistry:
+    """Counters and summaries keyed by name and labels"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta: Dict[str, Tuple[str, str]] = {}  # name -> (type, help), in registration order
+        self._values: Dict[str, Dict[Labels, List[float]]] = {}
+
+    def describe(self, name: str, kind: str, help_text: str = '') -> None:
+        with self._lock:
+            self._meta[name] = (kind, help_text)
+            self._values.setdefault(name, {})
+
+    def _series(self, name: str, kind: str, labels: Dict[str, object]) -> List[float]:
+        if name not in self._meta:
+            self._meta[name] = (kind, '')
+        series = self._values.setdefault(name, {})
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        return series.setdefault(key, [0.0, 0.0])
+
+    def inc(self, name: str, value: float = 1.0, **labels) -> None:
+        with self._lock:
+            self._series(name, 'counter', labels)[0] += value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """One observation of a summary: adds to <name>_sum and <name>_count"""
+        with self._lock:
+            series = self._series(name, 'summary', labels)
+            series[0] += value
+            series[1] += 1
+
+    def value(self, name: str, **labels) -> float:
+        """Current counter value (the sum, for a summary)"""
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        return self._values.get(name, {}).get(key, [0.0, 0.0])[0]
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name, (kind, help_text) in self._meta.items():
+                if help_text:
+                    lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, (total, count) in sorted(self._values.get(name, {}).items()):
+                    if kind == 'summary':
+                        lines.append(_format(f'{name}_sum', labels, total))
+                        lines.append(_format(f'{name}_count', labels, count))
+                    else:
+                        lines.append(_format(name, labels, total))
+        return '\n'.join(lines) + '\n'
+
+metrics = MetricsRegistry()
+metrics.describe('timely_pipeline_stage_seconds', 'summary', 'Wall time of timetable pipeline stages')
+metrics.describe('timely_pipeline_stage_failures_total', 'counter', 'Pipeline stage attempts that raised')
+metrics.describe('timely_pipeline_runs_total', 'counter', 'Timetable pipeline runs by result')
+metrics.describe('timely_solver_solutions_total', 'counter', 'Feasible timetables found by CP-SAT')
+metrics.describe('timely_solver_branches_total', 'counter', 'CP-SAT search branches')
+metrics.describe('timely_solver_conflicts_total', 'counter', 'CP-SAT search conflicts')
+metrics.describe('timely_solver_build_seconds', 'summary', 'CP model construction time per solve')
+metrics.describe('timely_solver_search_seconds', 'summary', 'CP-SAT search time per solve')
+metrics.describe('timely_solver_wall_seconds', 'summary', 'CP-SAT wall time as reported by the solver')
+metrics.describe('timely_optimizer_candidates_rescored_total', 'counter', 'Timetables scored by the optimizer')
+
+class RunTrace:
+    """Stage spans and counters of one pipeline run"""
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None):
+        self.registry = registry if registry is not None else metrics
+        self.started = time.monotonic()
+        self.spans: List[Dict] = []
+        self.counters: Dict[str, float] = {}
+        self.details: Dict[str, List] = {}
+
+    @contextmanager
+    def span(self, stage: str, attempt: int = 1) -> Iterator[None]:
+        start = time.monotonic()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self.record(stage, time.monotonic() - start, attempt, ok)
+
+    def record(self, stage: str, seconds: float, attempt: int = 1, ok: bool = True) -> None:
+        """A stage timed elsewhere, e.g. the solver's own build / search split"""
+        self.spans.append({'stage': stage, 'attempt': attempt, 'seconds': round(seconds, 6), 'ok': ok})
+        self.registry.observe('timely_pipeline_stage_seconds', seconds, stage=stage)
+        if not ok:
+            self.registry.inc('timely_pipeline_stage_failures_total', stage=stage)
+
+    def count(self, name: str, value: float = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + value
+        self.registry.inc(f'timely_{name}_total', value)
+
+    def note(self, key: str, value) -> None:
+        """Per-run detail kept in the result only, e.g. each solve attempt's statistics"""
+        self.details.setdefault(key, []).append(value)
+
+    def finish(self, result: str) -> Dict:
+        """Count the run and return its trace for the result dict"""
+        self.registry.inc('timely_pipeline_runs_total', result=result)
+        stages: Dict[str, float] = {}
+        for span in self.spans:
+            stages[span['stage']] = round(stages.get(span['stage'], 0) + span['seconds'], 6)
+        return {
+            'total_seconds': round(time.monotonic() - self.started, 6),
+            'stages': stages,
+            'spans': self.spans,
+            'counters': self.counters,
+            **self.details,
+        }
@@ -0,0 +1,139 @@
+"""
+Opt-in cProfile hooks for the slow pipeline entry points.
+
+Functions decorated with ``@profiled("name")`` run unprofiled unless profiling
+was asked for, either
+
+* for the whole process: ``TIMELY_PROFILE=all`` (or a comma-separated list of
+  names, e.g. ``TIMELY_PROFILE=routine5.generate,solver.solve``), or
+* for one HTTP request: an ``X-Profile: 1`` header or ``?profile=1`` on a route
+  of an app or blueprint passed to ``flask_hooks``.
+
+Each profiled call writes ``<request id>-<name>.prof`` (load it with pstats or
+snakeviz) and ``<request id>-<name>.txt`` (the top ``TIMELY_PROFILE_TOP``
+functions by cumulative and by own time) to ``TIMELY_PROFILE_DIR``, by default
+``outputs/profiles``. Calls nested in a profiled call are part of its profile.
+When profiling is off a wrapped call costs one global read and one context
+variable lookup.
+"""
+
+import functools
+import os
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, FrozenSet, Iterator, Optional
+
+from utils.logging_utils import get_logger
+
+logger = get_logger("Profiling")
+
+PROFILE_DIR = os.getenv('TIMELY_PROFILE_DIR', os.path.join('outputs', 'profiles'))
+TOP_N = int(os.getenv('TIMELY_PROFILE_TOP', 25))
+
+def _targets(value: str) -> FrozenSet[str]:
+    names = frozenset(name.strip() for name in value.split(',') if name.strip())
+    return frozenset({'all'}) if names & {'1', 'true', 'all', '*'} else names
+
+_enabled: FrozenSet[str] = _targets(os.getenv('TIMELY_PROFILE', ''))
+_requested: ContextVar[Optional[str]] = ContextVar('timely_profile_request', default=None)
+_active = threading.local()
+
+def new_request_id() -> str:
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+def enable(targets: str = 'all') -> None:
+    """Profile these names (comma-separated, or "all") in every request; "" switches it off"""
+    global _enabled
+    _enabled = _targets(targets)
+
+@contextmanager
+def requested(request_id: Optional[str] = None) -> Iterator[str]:
+    """Profile every wrapped call made inside the block (e.g. one HTTP request)"""
+    request_id = request_id or new_request_id()
+    token = _requested.set(request_id)
+    try:
+        yield request_id
+    finally:
+        _requested.reset(token)
+
+def profiled(name: str) -> Callable:
+    def decorate(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            request_id = _requested.get()
+            if request_id is None and not _enabled:
+                return fn(*args, **kwargs)
+            if request_id is None and 'all' not in _enabled and name not in _enabled:
+                return fn(*args, **kwargs)
+            if getattr(_active, 'name', None):
+                # Already inside a profiled call; it covers this one
+                return fn(*args, **kwargs)
+            return _profile(name, request_id or new_request_id(), fn, args, kwargs)
+        return wrapper
+    return decorate
+
+def _profile(name: str, request_id: str, fn: Callable, args, kwargs):
+    import cProfile
+
+    profiler = cProfile.Profile()
+    _active.name = name
+    start = time.perf_counter()
+    try:
+        return profiler.runcall(fn, *args, **kwargs)
+    finally:
+        _active.name = None
+        try:
+            path = write(profiler, f'{request_id}-{name}')
+            logger.info(f"Profiled {name} ({time.perf_counter() - start:.3f}s) -> {path}")
+        except OSError as e:
+            logger.warning(f"Could not write profile for {name}: {e}")
+
+def write(profiler, stem: str, directory: Optional[str] = None, top: int = TOP_N) -> str:
+    """Dump a profile and its top-N summary; returns the .prof path"""
+    import io
+    import pstats
+
+    directory = directory or PROFILE_DIR
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{stem}.prof')
+    profiler.dump_stats(path)
+
+    summary = io.StringIO()
+    stats = pstats.Stats(profiler, stream=summary).strip_dirs()
+    for order in ('cumulative', 'tottime'):
+        summary.write(f'Top {top} functions by {order} time\n')
+        stats.sort_stats(order).print_stats(top)
+    with open(os.path.join(directory, f'{stem}.txt'), 'w', encoding='utf-8') as f:
+        f.write(summary.getvalue())
+    return path
+
+def flask_hooks(scaffold, allowed: Optional[Callable[[], bool]] = None) -> None:
+    """Profile requests to a Flask app or blueprint that send X-Profile: 1 or ?profile=1"""
+    from flask import g, request
+
+    @scaffold.before_request
+    def _start_profiling():
+        if request.headers.get('X-Profile', request.args.get('profile', '')).lower() not in ('1', 'true', 'yes'):
+            return
+        if allowed is not None and not allowed():
+            return
+        request_id = request.headers.get('X-Request-ID', '')
+        # Becomes part of a file name
+        g.profile_id = request_id if re.fullmatch(r'[A-Za-z0-9._-]{1,64}', request_id) else new_request_id()
+        g.profile_token = _requested.set(g.profile_id)
+
+    @scaffold.after_request
+    def _profile_header(response):
+        if g.get('profile_id'):
+            response.headers['X-Profile-Id'] = g.profile_id
+        return response
+
+    @scaffold.teardown_request
+    def _stop_profiling(exc):
+        token = g.pop('profile_token', None)
+        if token is not None:
+            _requested.reset(token)
@@ -0,0 +1,163 @@
+"""
+Immutable JSON snapshots of generated timetables.
+
+Students only ever read finished timetables, so the generation pipeline
+publishes them as files and the web app serves those files without touching
+SQLite. Each publish writes a new generation directory::
+
+    <root>/<generation>/timetable.json       all sections (the /api/student-timetable payload)
+    <root>/<generation>/index.json           departments and their sections
+    <root>/<generation>/sections/<key>.json  one section
+    ... and a gzip-compressed .json.gz next to every file
+
+and then atomically replaces ``<root>/CURRENT`` with the generation's name, so
+readers see either the old snapshot or the new one, never a mix. Files are
+never modified after they are written; the oldest generations are pruned.
+"""
+
+import gzip
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+CURRENT = 'CURRENT'
+TIMETABLE = 'timetable.json'
+INDEX = 'index.json'
+DAY_ORDER = {'monday': 1, 'tuesday': 2, 'wednesday': 3, 'thursday': 4, 'friday': 5}
+
+def load_sections(conn) -> List[Dict]:
+    """Every section of an active semester with its generated schedule (Routine5 timetable.db)"""
+    sections = conn.execute('''
+        SELECT sec.id, sec.section_label, y.year_number, s.semester_number, d.name, d.code
+        FROM sections sec
+        JOIN years y ON sec.year_id = y.id
+        JOIN semesters s ON s.year_id = y.id
+        JOIN departments d ON y.department_id = d.id
+        WHERE s.is_active = 1
+        ORDER BY y.year_number, s.semester_number, sec.section_label
+    ''').fetchall()
+
+    # Every section's slots in one query instead of one per section
+    rows = conn.execute('''
+        SELECT gs.section_id, gs.day, gs.time_slot, s.name, st.teacher_name,
+               CASE WHEN tr.name IS NOT NULL THEN tr.name ELSE lr.name END as room_name
+        FROM generated_schedules gs
+        JOIN subjects s ON gs.subject_id = s.id
+        JOIN subject_teachers st ON gs.teacher_id = st.id
+        LEFT JOIN theory_rooms tr ON gs.room_id = tr.id AND gs.room_type = 'theory'
+        LEFT JOIN lab_rooms lr ON gs.room_id = lr.id AND gs.room_type = 'lab'
+    ''').fetchall()
+    rows.sort(key=lambda row: (DAY_ORDER.get(row[1], 6), row[2]))
+    schedules: Dict[int, Dict] = {}
+    for section_id, day, time_slot, subject, teacher, room in rows:
+        schedules.setdefault(section_id, {}).setdefault(day, {})[time_slot] = {
+            'subject': subject,
+            'teacher': teacher,
+            'room': room
+        }
+
+    return [{
+        'section_label': section_label,
+        'year_number': year_number,
+        'semester_number': semester_number,
+        'dept_name': dept_name,
+        'dept_code': dept_code,
+        'schedule': schedules.get(section_id, {})
+    } for section_id, section_label, year_number, semester_number, dept_name, dept_code in sections]
+
+def section_key(section: Dict) -> str:
+    """File-safe name of a section, e.g. cse-y2-s3-a"""
+    key = (f"{section.get('dept_code') or 'class'}-y{section.get('year_number')}-"
+           f"s{section.get('semester_number')}-{section.get('section_label')}")
+    return re.sub(r'[^a-z0-9]+', '-', key.lower()).strip('-')
+
+def _write(directory: str, name: str, payload) -> None:
+    body = json.dumps(payload, separators=(',', ':'), sort_keys=True).encode()
+    path = os.path.join(directory, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(body)
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(body, compresslevel=9, mtime=0))
+
+def publish(sections: List[Dict], root: str, keep: int = 3) -> str:
+    """Write a new snapshot generation, make it current and return its name"""
+    os.makedirs(root, exist_ok=True)
+    generation = f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    staging = tempfile.mkdtemp(prefix='.staging-', dir=root)
+    published_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+
+    departments: Dict[str, Dict] = {}
+    for section in sections:
+        key = section_key(section)
+        _write(staging, f'sections/{key}.json', section)
+        department = departments.setdefault(section.get('dept_code') or '', {
+            'dept_code': section.get('dept_code'),
+            'dept_name': section.get('dept_name'),
+            'sections': []
+        })
+        department['sections'].append({
+            'key': key,
+            'section_label': section.get('section_label'),
+            'year_number': section.get('year_number'),
+            'semester_number': section.get('semester_number'),
+            'file': f'sections/{key}.json'
+        })
+    _write(staging, TIMETABLE, {'success': True, 'sections': sections})
+    _write(staging, INDEX, {
+        'generation': generation,
+        'published_at': published_at,
+        'departments': list(departments.values())
+    })
+    os.rename(staging, os.path.join(root, generation))
+
+    # Swap the pointer last: readers switch to the complete new generation at once
+    fd, pointer = tempfile.mkstemp(prefix='.current-', dir=root)
+    with os.fdopen(fd, 'w') as f:
+        f.write(generation)
+    os.replace(pointer, os.path.join(root, CURRENT))
+
+    generations = sorted((os.stat(os.path.join(root, name)).st_mtime_ns, name) for name in os.listdir(root)
+                         if not name.startswith('.') and os.path.isdir(os.path.join(root, name)))
+    for _, old in generations[:-keep]:
+        if old != generation:
+            shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+    return generation
+
+class SnapshotStore:
+    """Read side: resolves snapshot files of the current generation without any query"""
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self._pointer: Tuple[Optional[Tuple[int, int]], Optional[str]] = (None, None)
+
+    def generation(self) -> Optional[str]:
+        """Name of the current generation, re-read only when CURRENT changes"""
+        path = os.path.join(self.root, CURRENT)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        # os.replace gives CURRENT a new inode, even within one mtime tick
+        stamp = (stat.st_ino, stat.st_mtime_ns)
+        if self._pointer[0] != stamp:
+            with open(path) as f:
+                self._pointer = (stamp, f.read().strip() or None)
+        return self._pointer[1]
+
+    def path(self, name: str, gzip_ok: bool = False) -> Optional[Tuple[str, Optional[str], str]]:
+        """(file path, content encoding, ETag) of a snapshot file, or None if it is not published"""
+        generation = self.generation()
+        if generation is None or '..' in name.split('/'):
+            return None
+        path = os.path.join(self.root, generation, name)
+        if gzip_ok and os.path.exists(path + '.gz'):
+            return path + '.gz', 'gzip', f'{generation}:{name}:gz'
+        if os.path.exists(path):
+            return path, None, f'{generation}:{name}'
+        return None